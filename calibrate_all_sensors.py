@@ -28,8 +28,8 @@ except ImportError:
 class ICM20948_Calibration:
     """Complete calibration suite for ICM20948"""
     
-    def __init__(self):
-        self.imu = None
+    def __init__(self, imu=None):
+        self.imu = imu  # Pre-configured ICM20948_NED_Corrected, or None to create one
         self.calibration_data = {
             'timestamp': datetime.now().isoformat(),
             'accelerometer': {},
@@ -42,7 +42,8 @@ class ICM20948_Calibration:
         """Initialize the sensor"""
         print("🔧 Initializing ICM20948...")
         try:
-            self.imu = ICM20948_NED_Corrected()
+            if self.imu is None:
+                self.imu = ICM20948_NED_Corrected()
             print("✅ Sensor initialized successfully")
             return True
         except Exception as e:
@@ -76,7 +77,7 @@ class ICM20948_Calibration:
             bar = "█" * progress + "░" * (20 - progress)
             print(f"\r[{bar}] {elapsed:.1f}s", end="")
             
-            time.sleep(0.05)  # 20Hz sampling
+            self.imu.wait_for_data(0.05)  # DATA_RDY interrupt, or 20Hz polling
         
         print("\n✅ Data collection complete")
         return np.array(accel_data), np.array(gyro_data), np.array(mag_data)
@@ -106,7 +107,7 @@ class ICM20948_Calibration:
             bar = "█" * progress + "░" * (20 - progress)
             print(f"\r[{bar}] {elapsed:.1f}s", end="")
             
-            time.sleep(0.05)
+            self.imu.wait_for_data(0.05)
         
         print("\n✅ Rotation data collection complete")
         return np.array(accel_data), np.array(gyro_data), np.array(mag_data)
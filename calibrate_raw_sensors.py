@@ -18,11 +18,17 @@ except ImportError:
     print("Make sure icm20948_ned_corrected.py is in the same directory")
     sys.exit(1)
 
+# Smallest warm-up temperature range that gives a usable bias slope (°C)
+MIN_TEMPERATURE_SPAN_C = 2.0
+
 class ICM20948_RawCalibration:
     """Raw sensor calibration suite for ICM20948 (before NED transformation)"""
     
-    def __init__(self):
-        self.imu = None
+    def __init__(self, use_fifo=True, imu=None):
+        self.imu = imu  # Pre-configured ICM20948_NED_Corrected, or None to create one
+        self.use_fifo = use_fifo  # Collect every accel/gyro sample through the FIFO
+        self.collection_temperature_c = None  # Mean die temperature of the last collection
+        self.collection_rate_hz = None        # Accel/gyro samples per second in the last collection
         self.calibration_data = {
             'timestamp': datetime.now().isoformat(),
             'coordinate_system': 'raw_sensor_coordinates',
@@ -37,7 +43,8 @@ class ICM20948_RawCalibration:
         """Initialize the sensor"""
         print("🔧 Initializing ICM20948...")
         try:
-            self.imu = ICM20948_NED_Corrected()
+            if self.imu is None:
+                self.imu = ICM20948_NED_Corrected()
             print("✅ Sensor initialized successfully")
             print("📋 NOTE: Calibrating RAW sensor coordinates (before NED transformation)")
             return True
@@ -55,6 +62,19 @@ class ICM20948_RawCalibration:
         gyro_raw = self.imu.read_gyroscope_raw()
         return [x * self.imu.gyro_scale for x in gyro_raw]
     
+    def read_raw_sample(self):
+        """Read raw accelerometer, gyroscope, magnetometer and temperature in one burst
+        
+        Returns (accel_g, gyro_dps, mag_ut, mag_valid, temperature_c).
+        """
+        sample = self.imu.read_all_raw()
+        accel_g = [x * self.imu.accel_scale for x in sample.accel]
+        gyro_dps = [x * self.imu.gyro_scale for x in sample.gyro]
+        temperature_c = self.imu.temperature_to_celsius(sample.temperature)
+        if sample.mag_valid:
+            return accel_g, gyro_dps, [x * self.imu.mag_scale for x in sample.mag], True, temperature_c
+        return accel_g, gyro_dps, [0, 0, 0], False, temperature_c
+    
     def read_raw_magnetometer(self):
         """Read raw magnetometer data in physical units"""
         mag_raw_x, mag_raw_y, mag_raw_z, mag_valid = self.imu.read_magnetometer_raw()
@@ -69,19 +89,22 @@ class ICM20948_RawCalibration:
         print(f"📊 Collecting RAW {description} data for {duration} seconds...")
         print("⚠️  Keep sensor completely still!")
         
+        if self.use_fifo:
+            return self.collect_raw_fifo_data(duration)
+        
         accel_data = []
         gyro_data = []
         mag_data = []
+        temperatures = []
         
         start_time = time.time()
         while time.time() - start_time < duration:
             # Read RAW sensor data (before NED transformation)
-            accel_g = self.read_raw_accelerometer()
-            gyro_dps = self.read_raw_gyroscope()
-            mag_ut, mag_valid = self.read_raw_magnetometer()
+            accel_g, gyro_dps, mag_ut, mag_valid, temperature_c = self.read_raw_sample()
             
             accel_data.append(accel_g)
             gyro_data.append(gyro_dps)
+            temperatures.append(temperature_c)
             if mag_valid:
                 mag_data.append(mag_ut)
             
@@ -91,11 +114,100 @@ class ICM20948_RawCalibration:
             bar = "█" * progress + "░" * (20 - progress)
             print(f"\r[{bar}] {elapsed:.1f}s", end="")
             
-            time.sleep(0.05)  # 20Hz sampling
+            self.imu.wait_for_data(0.05)  # DATA_RDY interrupt, or 20Hz polling
         
+        self.collection_temperature_c = float(np.mean(temperatures)) if temperatures else None
+        self.collection_rate_hz = len(gyro_data) / (time.time() - start_time)
         print("\n✅ RAW data collection complete")
         return np.array(accel_data), np.array(gyro_data), np.array(mag_data)
     
+    def collect_raw_fifo_data(self, duration):
+        """Collect every accel/gyro sample from the FIFO, magnetometer and temperature from the burst block"""
+        accel_chunks = []
+        gyro_chunks = []
+        mag_data = []
+        temperatures = []
+        
+        self.imu.enable_fifo()
+        try:
+            start_time = time.time()
+            while time.time() - start_time < duration:
+                samples = self.imu.read_fifo_raw()
+                if len(samples):
+                    physical = self.imu.samples_to_physical(samples)
+                    accel_chunks.append(physical[:, 0:3])
+                    gyro_chunks.append(physical[:, 3:6])
+                
+                burst = self.imu.read_all_raw()
+                temperatures.append(self.imu.temperature_to_celsius(burst.temperature))
+                if burst.mag_valid:
+                    mag_data.append([x * self.imu.mag_scale for x in burst.mag])
+                
+                # Progress indicator
+                elapsed = time.time() - start_time
+                progress = int((elapsed / duration) * 20)
+                bar = "█" * progress + "░" * (20 - progress)
+                print(f"\r[{bar}] {elapsed:.1f}s", end="")
+                
+                time.sleep(0.02)  # Drain well before the FIFO fills
+        finally:
+            self.imu.disable_fifo()
+        
+        if self.imu.fifo_overflows:
+            print(f"\n⚠️  FIFO overflowed {self.imu.fifo_overflows} times (samples lost)")
+        
+        accel_data = np.concatenate(accel_chunks) if accel_chunks else np.empty((0, 3))
+        gyro_data = np.concatenate(gyro_chunks) if gyro_chunks else np.empty((0, 3))
+        self.collection_temperature_c = float(np.mean(temperatures)) if temperatures else None
+        self.collection_rate_hz = self.imu.sample_rate_hz
+        
+        print(f"\n✅ RAW data collection complete ({len(accel_data)} FIFO samples)")
+        return accel_data, gyro_data, np.array(mag_data)
+    
+    def collect_gyro_warmup_data(self, duration):
+        """Collect gyroscope rate and die temperature while the sensor warms up
+        
+        Returns (gyro (M, 3) in °/s, temperature (M,) in °C), one point per
+        second: the mean of every gyro sample in that second and the
+        temperature at its end.
+        """
+        gyro_points = []
+        temperature_points = []
+        
+        if self.use_fifo:
+            self.imu.enable_fifo()
+        try:
+            start_time = time.time()
+            window = []
+            window_start = start_time
+            while time.time() - start_time < duration:
+                if self.use_fifo:
+                    samples = self.imu.read_fifo_raw()
+                    if len(samples):
+                        window.append(self.imu.samples_to_physical(samples)[:, 3:6])
+                    time.sleep(0.02)  # Drain well before the FIFO fills
+                else:
+                    _, gyro_dps, _, _, _ = self.read_raw_sample()
+                    window.append(np.array([gyro_dps]))
+                    self.imu.wait_for_data(0.05)
+                
+                if time.time() - window_start >= 1.0 and window:
+                    gyro_points.append(np.concatenate(window).mean(axis=0))
+                    temperature_points.append(self.imu.read_temperature())
+                    window = []
+                    window_start = time.time()
+                    
+                    elapsed = time.time() - start_time
+                    progress = int((elapsed / duration) * 20)
+                    bar = "█" * progress + "░" * (20 - progress)
+                    print(f"\r[{bar}] {elapsed:.0f}s  {temperature_points[-1]:.2f}°C", end="")
+        finally:
+            if self.use_fifo:
+                self.imu.disable_fifo()
+        
+        print(f"\n✅ Warm-up collection complete ({len(gyro_points)} points)")
+        return np.array(gyro_points).reshape(-1, 3), np.array(temperature_points)
+    
     def calibrate_raw_accelerometer(self):
         """Calibrate RAW accelerometer bias and scale factors"""
         print("\n🎯 RAW ACCELEROMETER CALIBRATION")
@@ -216,6 +328,49 @@ class ICM20948_RawCalibration:
         # Analyze RAW gyroscope data
         self.analyze_raw_gyroscope_data(gyro_static)
     
+    def calibrate_gyro_temperature(self, duration=600):
+        """Fit the RAW gyroscope bias-versus-temperature model from a cold start"""
+        print("\n🎯 GYROSCOPE TEMPERATURE CALIBRATION")
+        print("=" * 50)
+        print("📋 Start with the sensor cold (unpowered for 10+ minutes) and keep it")
+        print("   completely still while it warms up; the bias drift is recorded")
+        print("   against the die temperature")
+        
+        input("Keep sensor completely still during warm-up. Press Enter...")
+        gyro_data, temperatures = self.collect_gyro_warmup_data(duration)
+        
+        self.analyze_gyro_temperature_data(gyro_data, temperatures)
+    
+    def analyze_gyro_temperature_data(self, gyro_data, temperatures):
+        """Fit a per-axis linear gyroscope bias slope (°/s per °C)"""
+        print("\n📊 Analyzing gyroscope bias versus temperature...")
+        
+        if len(temperatures) < 10:
+            print("  ⚠️  Not enough warm-up data - temperature model skipped")
+            return
+        
+        span = float(np.max(temperatures) - np.min(temperatures))
+        if span < MIN_TEMPERATURE_SPAN_C:
+            print(f"  ⚠️  Temperature only changed {span:.1f}°C (need {MIN_TEMPERATURE_SPAN_C:.1f}°C) - "
+                  "temperature model skipped")
+            print("     Start from a colder sensor or extend the warm-up")
+            return
+        
+        # Least-squares line per axis; the offset comes from the bias calibration
+        slopes, offsets = np.polyfit(temperatures, gyro_data, 1)
+        residual = gyro_data - (temperatures[:, None] * slopes + offsets)
+        
+        self.calibration_data['gyroscope'].update({
+            'temperature_coefficients': slopes.tolist(),
+            'temperature_range_c': [float(np.min(temperatures)), float(np.max(temperatures))],
+            'temperature_fit_residual': np.std(residual, axis=0).tolist()
+        })
+        
+        print(f"  Temperature range:    {np.min(temperatures):.1f} → {np.max(temperatures):.1f}°C")
+        print(f"  Bias slope (°/s/°C):  X={slopes[0]:+.4f}, Y={slopes[1]:+.4f}, Z={slopes[2]:+.4f}")
+        print(f"  Drift over range:     X={slopes[0] * span:+.2f}, Y={slopes[1] * span:+.2f}, "
+              f"Z={slopes[2] * span:+.2f} °/s")
+    
     def analyze_raw_gyroscope_data(self, static_data):
         """Analyze RAW gyroscope calibration data"""
         print("\n📊 Analyzing RAW gyroscope data...")
@@ -226,15 +381,21 @@ class ICM20948_RawCalibration:
         # Calculate noise and stability
         noise = np.std(static_data, axis=0)
         
-        # Allan variance calculation (simplified)
+        # Allan variance calculation (simplified): lag-1, so at tau = one sample
+        # period; noise_std and allan_deviation are only comparable at the same rate
         allan_dev = self.calculate_allan_deviation(static_data)
+        allan_tau_s = 1.0 / self.collection_rate_hz if self.collection_rate_hz else None
         
-        # Store calibration results
-        self.calibration_data['gyroscope'] = {
+        # Store calibration results (keeps a temperature model fitted earlier);
+        # temperature_c is where bias_raw holds, the reference for that model
+        self.calibration_data['gyroscope'].update({
             'bias_raw': bias.tolist(),
+            'temperature_c': self.collection_temperature_c,
             'noise_std': noise.tolist(),
-            'allan_deviation': allan_dev.tolist()
-        }
+            'allan_deviation': allan_dev.tolist(),
+            'allan_tau_s': allan_tau_s,
+            'sample_rate_hz': self.collection_rate_hz
+        })
         
         # Check for abnormalities
         abnormalities = []
@@ -251,6 +412,10 @@ class ICM20948_RawCalibration:
         print(f"  RAW Bias (°/s):       X={bias[0]:+.2f}, Y={bias[1]:+.2f}, Z={bias[2]:+.2f}")
         print(f"  RAW Noise (°/s):      X={noise[0]:.2f}, Y={noise[1]:.2f}, Z={noise[2]:.2f}")
         print(f"  Allan deviation:      X={allan_dev[0]:.2f}, Y={allan_dev[1]:.2f}, Z={allan_dev[2]:.2f}")
+        if allan_tau_s is not None:
+            print(f"  Sample rate:          {self.collection_rate_hz:.1f} Hz (Allan τ = {allan_tau_s * 1000:.2f} ms)")
+        if self.collection_temperature_c is not None:
+            print(f"  Temperature:          {self.collection_temperature_c:.1f}°C")
         
         if abnormalities:
             print("  ⚠️  Abnormalities detected:")
@@ -438,7 +603,11 @@ def main():
         if not calibrator.initialize_sensor():
             return
         
-        # Run RAW calibration sequence
+        # Run RAW calibration sequence (warm-up first, while the sensor is still cold)
+        answer = input("Record gyroscope warm-up drift for temperature compensation? "
+                       "Needs a cold sensor, ~10 min (y/N): ")
+        if answer.strip().lower() == 'y':
+            calibrator.calibrate_gyro_temperature()
         calibrator.calibrate_raw_accelerometer()
         calibrator.calibrate_raw_gyroscope()
         calibrator.calibrate_raw_magnetometer()
@@ -5,13 +5,10 @@ Diagnose and fix magnetometer initialization issues
 """
 
 import time
-import sys
 
-try:
-    import smbus
-except ImportError:
-    print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
-    sys.exit(1)
+from icm20948_registers import ICM20948_RegisterBus
+from icm20948_ned_corrected import ICM20948_NED_Corrected, MAG_TRANSACTION_DELAY
+from icm20948_decode import decode_mag_data
 
 class ICM20948_MagDebug:
     """Debug ICM20948 magnetometer initialization"""
@@ -19,27 +16,21 @@ class ICM20948_MagDebug:
     def __init__(self, address=0x69, bus=1):
         self.address = address
         self.bus_num = bus
-        self.bus = smbus.SMBus(bus)
+        self.bus = ICM20948_NED_Corrected._open_bus(bus, False)
+        self.registers = ICM20948_RegisterBus(self.bus, address)  # Shared bank-cached access
         self.mag_initialized = False
     
     def _write_register(self, bank, register, value):
         """Write to a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)  # Increased delay
-        self.bus.write_byte_data(self.address, register, value)
-        time.sleep(0.005)  # Increased delay
+        self.registers.write_register(bank, register, value)
     
     def _read_register(self, bank, register):
         """Read from a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)  # Increased delay
-        return self.bus.read_byte_data(self.address, register)
+        return self.registers.read_register(bank, register)
     
     def _read_registers(self, bank, start_register, length):
         """Read multiple registers in sequence"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)  # Increased delay
-        return self.bus.read_i2c_block_data(self.address, start_register, length)
+        return self.registers.read_registers(bank, start_register, length)
     
     def initialize_basic(self):
         """Initialize basic ICM20948 (accelerometer and gyroscope)"""
@@ -48,6 +39,7 @@ class ICM20948_MagDebug:
         try:
             # Reset device
             self._write_register(0, 0x06, 0x80)  # PWR_MGMT_1: Reset
+            self.registers.invalidate_bank()      # Reset returns to bank 0
             time.sleep(0.1)
             
             # Wake up and set clock source
@@ -106,7 +98,7 @@ class ICM20948_MagDebug:
                 self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Read mode
                 self._write_register(3, 0x04, 0x01)         # I2C_SLV0_REG: WHO_AM_I
                 self._write_register(3, 0x05, 0x81)         # I2C_SLV0_CTRL: Enable read, 1 byte
-                time.sleep(0.1)  # Wait for read
+                time.sleep(MAG_TRANSACTION_DELAY)  # Wait for read
                 
                 # Read the result
                 mag_who_am_i = self._read_register(0, 0x3B)  # EXT_SLV_SENS_DATA_00
@@ -157,7 +149,7 @@ class ICM20948_MagDebug:
                     self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Read mode
                     self._write_register(3, 0x04, 0x01)         # I2C_SLV0_REG: WHO_AM_I
                     self._write_register(3, 0x05, 0x81)         # I2C_SLV0_CTRL: Enable read, 1 byte
-                    time.sleep(0.1)
+                    time.sleep(MAG_TRANSACTION_DELAY)
                     
                     mag_who_am_i = self._read_register(0, 0x3B)
                     print(f"  Alternative method - WHO_AM_I: 0x{mag_who_am_i:02X}")
@@ -185,14 +177,14 @@ class ICM20948_MagDebug:
         self._write_register(3, 0x04, register)  # I2C_SLV0_REG
         self._write_register(3, 0x06, value)     # I2C_SLV0_DO
         self._write_register(3, 0x05, 0x81)      # I2C_SLV0_CTRL: Enable write, 1 byte
-        time.sleep(0.05)  # Increased delay
+        time.sleep(MAG_TRANSACTION_DELAY)
     
     def _read_mag_register(self, register, length):
         """Read from magnetometer register via I2C master"""
         self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Read mode
         self._write_register(3, 0x04, register)     # I2C_SLV0_REG
         self._write_register(3, 0x05, 0x80 | length)  # I2C_SLV0_CTRL: Enable read
-        time.sleep(0.05)  # Increased delay
+        time.sleep(MAG_TRANSACTION_DELAY)
         return self._read_registers(0, 0x3B, length)  # EXT_SLV_SENS_DATA_00
     
     def test_magnetometer_reading(self):
@@ -210,14 +202,7 @@ class ICM20948_MagDebug:
                 
                 if len(data) >= 7:
                     st1 = data[0]
-                    mag_x = (data[2] << 8) | data[1]  # Little endian
-                    mag_y = (data[4] << 8) | data[3]
-                    mag_z = (data[6] << 8) | data[5]
-                    
-                    # Convert to signed
-                    if mag_x > 32767: mag_x -= 65536
-                    if mag_y > 32767: mag_y -= 65536
-                    if mag_z > 32767: mag_z -= 65536
+                    mag_x, mag_y, mag_z = decode_mag_data(data, 1)  # Little endian
                     
                     print(f"  Reading {i+1}: ST1=0x{st1:02X} X={mag_x:+6d} Y={mag_y:+6d} Z={mag_z:+6d}")
                     
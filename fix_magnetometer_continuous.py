@@ -5,13 +5,10 @@ Fix the magnetometer to properly work in continuous measurement mode
 """
 
 import time
-import sys
 
-try:
-    import smbus
-except ImportError:
-    print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
-    sys.exit(1)
+from icm20948_registers import ICM20948_RegisterBus
+from icm20948_ned_corrected import ICM20948_NED_Corrected, MAG_TRANSACTION_DELAY
+from icm20948_decode import decode_mag_data
 
 class ICM20948_MagFix:
     """Fix ICM20948 magnetometer continuous mode"""
@@ -19,27 +16,21 @@ class ICM20948_MagFix:
     def __init__(self, address=0x69, bus=1):
         self.address = address
         self.bus_num = bus
-        self.bus = smbus.SMBus(bus)
+        self.bus = ICM20948_NED_Corrected._open_bus(bus, False)
+        self.registers = ICM20948_RegisterBus(self.bus, address)  # Shared bank-cached access
         self.mag_initialized = False
     
     def _write_register(self, bank, register, value):
         """Write to a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)
-        self.bus.write_byte_data(self.address, register, value)
-        time.sleep(0.005)
+        self.registers.write_register(bank, register, value)
     
     def _read_register(self, bank, register):
         """Read from a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)
-        return self.bus.read_byte_data(self.address, register)
+        return self.registers.read_register(bank, register)
     
     def _read_registers(self, bank, start_register, length):
         """Read multiple registers in sequence"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.005)
-        return self.bus.read_i2c_block_data(self.address, start_register, length)
+        return self.registers.read_registers(bank, start_register, length)
     
     def initialize_basic(self):
         """Initialize basic ICM20948"""
@@ -47,6 +38,7 @@ class ICM20948_MagFix:
         
         # Reset device
         self._write_register(0, 0x06, 0x80)  # PWR_MGMT_1: Reset
+        self.registers.invalidate_bank()      # Reset returns to bank 0
         time.sleep(0.1)
         
         # Wake up and set clock source
@@ -84,14 +76,14 @@ class ICM20948_MagFix:
         self._write_register(3, 0x04, register)  # I2C_SLV0_REG
         self._write_register(3, 0x06, value)     # I2C_SLV0_DO: Data to write
         self._write_register(3, 0x05, 0x81)      # I2C_SLV0_CTRL: Enable write, 1 byte
-        time.sleep(0.1)  # Wait for write to complete
+        time.sleep(MAG_TRANSACTION_DELAY)  # Wait for write to complete
     
     def _read_mag_register(self, register):
         """Read from magnetometer register via I2C master"""
         self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Mag read address
         self._write_register(3, 0x04, register)     # I2C_SLV0_REG
         self._write_register(3, 0x05, 0x81)         # I2C_SLV0_CTRL: Enable read, 1 byte
-        time.sleep(0.1)  # Wait for read to complete
+        time.sleep(MAG_TRANSACTION_DELAY)  # Wait for read to complete
         return self._read_register(0, 0x3B)  # Read result from EXT_SLV_SENS_DATA_00
     
     def _read_mag_data_block(self, register, length):
@@ -99,7 +91,7 @@ class ICM20948_MagFix:
         self._write_register(3, 0x03, 0x0C | 0x80)        # I2C_SLV0_ADDR: Mag read address
         self._write_register(3, 0x04, register)           # I2C_SLV0_REG
         self._write_register(3, 0x05, 0x80 | length)      # I2C_SLV0_CTRL: Enable read, multiple bytes
-        time.sleep(0.1)  # Wait for read to complete
+        time.sleep(MAG_TRANSACTION_DELAY)  # Wait for read to complete
         return self._read_registers(0, 0x3B, length)  # Read results
     
     def initialize_magnetometer_continuous(self):
@@ -163,15 +155,8 @@ class ICM20948_MagFix:
             data = self._read_mag_data_block(0x11, 6)  # HXL to HZH
             
             if len(data) >= 6:
-                # Convert to signed 16-bit (little-endian)
-                x = (data[1] << 8) | data[0]
-                y = (data[3] << 8) | data[2]
-                z = (data[5] << 8) | data[4]
-                
-                # Convert to signed
-                if x > 32767: x -= 65536
-                if y > 32767: y -= 65536
-                if z > 32767: z -= 65536
+                # Signed 16-bit little-endian
+                x, y, z = decode_mag_data(data)
                 
                 # Check data ready bit
                 data_ready = (st1 & 0x01) != 0
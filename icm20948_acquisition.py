@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Acquisition Thread and Sample Ring Buffer
+A producer thread owns the bus and writes timestamped raw samples into a
+preallocated structured numpy ring buffer; consumers (EKF, display, logger)
+each read batches at their own pace through an independent cursor
+
+Nothing downstream can delay the next sensor read: a slow print or filter
+step only makes its own consumer fall behind, and a consumer lapped by the
+producer is told how many samples it lost. Samples are written in place and
+read into per-reader preallocated arrays, so there are no per-sample
+allocations once running.
+
+Usage:
+    ring = SampleRingBuffer()
+    producer = AcquisitionThread(imu, ring, use_fifo=True)
+    reader = ring.reader()
+    producer.start()
+    batch = reader.read()     # structured array with SAMPLE_DTYPE fields
+"""
+
+import json
+import time
+import threading
+import numpy as np
+
+from icm20948_recovery import FaultRecovery
+
+# One raw sample (sensor frame, raw counts). FIFO batches carry the magnetometer
+# and temperature from one burst per drain, on the newest sample only.
+SAMPLE_DTYPE = np.dtype([
+    ('timestamp_ns', np.int64),       # time.monotonic_ns (sensor clock in FIFO mode)
+    ('accel', np.int16, (3,)),
+    ('gyro', np.int16, (3,)),
+    ('temperature', np.int16),
+    ('mag', np.int16, (3,)),
+    ('mag_valid', np.bool_),
+])
+
+class SampleRingBuffer:
+    """Fixed-size ring of SAMPLE_DTYPE records with one writer and any number of readers"""
+
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self.written = 0                  # Total samples ever written
+        self._condition = threading.Condition()
+
+    def push_sample(self, timestamp_ns, sample):
+        """Append one RawSample from a burst read"""
+        with self._condition:
+            self.buffer[self.written % self.capacity] = (timestamp_ns, sample.accel, sample.gyro,
+                                                         sample.temperature, sample.mag,
+                                                         sample.mag_valid)
+            self.written += 1
+            self._condition.notify_all()
+
+    def push_batch(self, timestamps, samples, temperature=0, mag=(0, 0, 0), mag_valid=False):
+        """Append a FIFO drain: timestamps (N,), samples (N, 6) accel/gyro counts
+
+        temperature, mag and mag_valid come from one burst read per drain and
+        are attached to the newest sample (mag_valid is False on the others).
+        """
+        count = len(samples)
+        if count == 0:
+            return
+        if count > self.capacity:
+            timestamps = timestamps[-self.capacity:]
+            samples = samples[-self.capacity:]
+            count = self.capacity
+
+        with self._condition:
+            start = self.written % self.capacity
+            first = min(count, self.capacity - start)
+            for dst, src in ((slice(start, start + first), slice(0, first)),
+                             (slice(0, count - first), slice(first, count))):
+                if dst.start == dst.stop:
+                    continue
+                block = self.buffer[dst]
+                block['timestamp_ns'] = timestamps[src]
+                block['accel'] = samples[src, 0:3]
+                block['gyro'] = samples[src, 3:6]
+                block['temperature'] = temperature
+                block['mag_valid'] = False
+
+            newest = self.buffer[(self.written + count - 1) % self.capacity]
+            newest['mag'] = mag
+            newest['mag_valid'] = mag_valid
+
+            self.written += count
+            self._condition.notify_all()
+
+    def reader(self, from_oldest=False):
+        """New consumer cursor, starting at the newest sample (or the oldest still held)"""
+        with self._condition:
+            position = max(0, self.written - self.capacity) if from_oldest else self.written
+        return RingReader(self, position)
+
+class RingReader:
+    """One consumer's cursor into a SampleRingBuffer"""
+
+    def __init__(self, ring, position):
+        self.ring = ring
+        self.position = position
+        self.dropped = 0                  # Samples overwritten before this reader got them
+        self._out = np.empty(ring.capacity, dtype=SAMPLE_DTYPE)
+
+    def available(self):
+        """Samples waiting for this reader"""
+        return min(self.ring.written - self.position, self.ring.capacity)
+
+    def wait(self, timeout=None):
+        """Block until at least one new sample is available; False on timeout"""
+        with self.ring._condition:
+            return self.ring._condition.wait_for(lambda: self.ring.written > self.position, timeout)
+
+    def read(self, max_samples=None):
+        """Copy out the samples since the last read (oldest first)
+
+        Returns a view into this reader's preallocated array, valid until
+        its next read().
+        """
+        ring = self.ring
+        with ring._condition:
+            lag = ring.written - self.position
+            if lag > ring.capacity:
+                self.dropped += lag - ring.capacity
+                self.position = ring.written - ring.capacity
+                lag = ring.capacity
+            count = lag if max_samples is None else min(lag, max_samples)
+
+            start = self.position % ring.capacity
+            first = min(count, ring.capacity - start)
+            self._out[:first] = ring.buffer[start:start + first]
+            self._out[first:count] = ring.buffer[:count - first]
+            self.position += count
+
+        return self._out[:count]
+
+class AcquisitionThread(threading.Thread):
+    """Producer: reads the sensor and fills a SampleRingBuffer
+
+    - use_fifo=True: drains the FIFO every drain_interval (every sensor sample,
+      sensor-clock timestamps) plus one burst for magnetometer and temperature
+    - use_fifo=False: one burst read per DATA_RDY, or every period seconds
+    
+    Bus faults go through a FaultRecovery (retry, re-initialize with backoff);
+    while the sensor is down nothing is pushed and recovery.in_outage is set.
+    """
+
+    def __init__(self, imu, ring, use_fifo=False, drain_interval=0.01, period=None):
+        super().__init__(name="icm20948-acquisition", daemon=True)
+        self.imu = imu
+        self.ring = ring
+        self.use_fifo = use_fifo
+        self.drain_interval = drain_interval
+        self.period = period if period is not None else 1.0 / imu.sample_rate_hz
+        self.recovery = FaultRecovery(imu)
+        self._stop_event = threading.Event()
+
+    @property
+    def read_errors(self):
+        """Bus errors seen, including the ones recovered by a retry"""
+        return self.recovery.stats['errors']
+
+    def run(self):
+        if self.use_fifo:
+            while self.recovery.call(self._enable_fifo) is None and not self._stop_event.is_set():
+                time.sleep(self.drain_interval)
+        try:
+            while not self._stop_event.is_set():
+                self.imu.wait_for_data(self.drain_interval if self.use_fifo else self.period)
+                mag_valid = self.recovery.call(self._read_fifo if self.use_fifo else self._read_burst)
+                if mag_valid is not None:
+                    self.recovery.check_magnetometer(mag_valid)
+        finally:
+            if self.use_fifo:
+                try:
+                    self.imu.disable_fifo()
+                except OSError:
+                    pass
+
+    def _enable_fifo(self):
+        self.imu.enable_fifo()
+        return True
+
+    def _read_fifo(self):
+        """Drain the FIFO plus one burst for magnetometer and temperature"""
+        timestamps, samples = self.imu.read_fifo_timestamped()
+        if len(samples) == 0:
+            return False
+        burst = self.imu.read_all_raw()
+        self.ring.push_batch(timestamps, samples, burst.temperature, burst.mag, burst.mag_valid)
+        return burst.mag_valid
+
+    def _read_burst(self):
+        """One burst read"""
+        sample = self.imu.read_all_raw()
+        self.ring.push_sample(time.monotonic_ns(), sample)
+        return sample.mag_valid
+
+    def stop(self):
+        """Stop acquiring and wait for the thread to finish"""
+        self._stop_event.set()
+        self.join(timeout=1.0)
+
+class SampleLogger(threading.Thread):
+    """Consumer: appends raw SAMPLE_DTYPE records to a binary log file
+
+    Scale factors and ODR go to a JSON sidecar (<path>.json) so the log can
+    be replayed later with load_sample_log().
+    """
+
+    def __init__(self, ring, path, imu=None, flush_interval=0.5):
+        super().__init__(name="icm20948-logger", daemon=True)
+        self.reader = ring.reader()
+        self.path = path
+        self.flush_interval = flush_interval
+        self.samples_written = 0
+        self._stop_event = threading.Event()
+
+        if imu is not None:
+            metadata = {
+                'dtype': SAMPLE_DTYPE.descr,
+                'accel_scale': imu.accel_scale,
+                'gyro_scale': imu.gyro_scale,
+                'mag_scale': imu.mag_scale,
+                'sample_rate_hz': imu.sample_rate_hz,
+            }
+            with open(path + '.json', 'w') as f:
+                json.dump(metadata, f, indent=2)
+
+    def run(self):
+        with open(self.path, 'ab') as f:
+            while not self._stop_event.is_set():
+                self.reader.wait(self.flush_interval)
+                self._write(f)
+            self._write(f)
+
+    def _write(self, f):
+        batch = self.reader.read()
+        if len(batch):
+            batch.tofile(f)
+            f.flush()
+            self.samples_written += len(batch)
+
+    def stop(self):
+        """Write what is left and close the log"""
+        self._stop_event.set()
+        self.join(timeout=2.0)
+
+def load_sample_log(path):
+    """Memory-map a SampleLogger file: (records, metadata or None)"""
+    try:
+        with open(path + '.json') as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        metadata = None
+    return np.memmap(path, dtype=SAMPLE_DTYPE, mode='r'), metadata
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Asyncio Driver
+Awaitable front end for ICM20948_NED_Corrected so one event loop can serve
+several sensors, network clients and the filter without a thread per device
+
+Bus calls are blocking, so they run on a bounded ThreadPoolExecutor that can
+be shared by all sensors (max_workers bounds the threads however many IMUs
+are open). Calls to one device are serialized with an asyncio.Lock, so the
+driver's bank cache and FIFO state never see two bus calls at once.
+
+Usage:
+    async with await AsyncICM20948.open(address=0x69, bus=1) as imu:
+        sample = await imu.read_all()
+        async for sample in imu.stream(rate_hz=100):
+            ...
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from icm20948_ned_corrected import ICM20948_NED_Corrected
+
+def make_bus_executor(max_workers=2):
+    """Bounded thread pool for blocking bus calls, shareable by several AsyncICM20948s"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="icm20948-bus")
+
+class AsyncICM20948:
+    """Asyncio counterpart to ICM20948_NED_Corrected"""
+
+    def __init__(self, imu, executor=None):
+        self.imu = imu                      # Initialized ICM20948_NED_Corrected
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else make_bus_executor(1)
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, executor=None, **kwargs):
+        """Create and initialize the driver off the event loop
+
+        kwargs go to ICM20948_NED_Corrected (address, bus, config, ...).
+        """
+        own_executor = executor is None
+        if own_executor:
+            executor = make_bus_executor(1)
+        loop = asyncio.get_running_loop()
+        try:
+            imu = await loop.run_in_executor(executor, lambda: ICM20948_NED_Corrected(**kwargs))
+        except Exception:
+            if own_executor:
+                executor.shutdown(wait=False)
+            raise
+
+        device = cls(imu, executor)
+        device._own_executor = own_executor
+        return device
+
+    async def _call(self, function, *args):
+        """Run one blocking driver call on the executor, one at a time per device"""
+        async with self._lock:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def read_all(self):
+        """Accel, gyro, temperature and magnetometer in one burst (RawSample)"""
+        return await self._call(self.imu.read_all_raw)
+
+    async def read_all_ned(self):
+        """All sensors in NED coordinates (see read_all_sensors_ned)"""
+        return await self._call(self.imu.read_all_sensors_ned)
+
+    async def read_fifo(self, max_samples=None):
+        """Drain the FIFO: (timestamps, (N, 6) raw samples)"""
+        return await self._call(self.imu.read_fifo_timestamped, max_samples)
+
+    async def wait_for_data(self):
+        """Wait for DATA_RDY (needs an interrupt source on the driver)"""
+        return await self._call(self.imu.interrupt.wait, self.imu.interrupt_timeout)
+
+    async def stream(self, rate_hz=None, fifo=False, drain_interval=0.02):
+        """Yield samples until the consumer stops iterating
+
+        - fifo=False: one RawSample per period (rate_hz, default the sensor
+          ODR), or per DATA_RDY if the driver has an interrupt source
+        - fifo=True: (timestamps, samples) batches every drain_interval seconds,
+          covering every sensor sample
+        """
+        if fifo:
+            await self._call(self.imu.enable_fifo)
+            period = drain_interval
+        else:
+            period = 1.0 / (rate_hz or self.imu.sample_rate_hz)
+
+        next_time = time.monotonic()
+        try:
+            while True:
+                if not fifo and self.imu.interrupt is not None:
+                    await self.wait_for_data()
+                else:
+                    # Deadline pacing: read time does not accumulate into the period
+                    next_time += period
+                    delay = next_time - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        next_time = time.monotonic()
+
+                if fifo:
+                    timestamps, samples = await self.read_fifo()
+                    if len(samples):
+                        yield timestamps, samples
+                else:
+                    yield await self.read_all()
+        finally:
+            if fifo:
+                await self._call(self.imu.disable_fifo)
+
+    async def close(self):
+        """Close the driver and, if owned, the executor"""
+        await self._call(self.imu.close)
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+async def _print_samples(imu, label, count):
+    """Print a few samples from one sensor"""
+    n = 0
+    async for sample in imu.stream(rate_hz=10):
+        accel = imu.imu.accel_raw_to_ned(sample.accel)
+        print(f"{label}: Accel NED [{accel[0]:+.3f}, {accel[1]:+.3f}, {accel[2]:+.3f}] g")
+        n += 1
+        if n >= count:
+            break
+
+async def _demo(addresses):
+    executor = make_bus_executor(len(addresses))
+    imus = []
+    try:
+        for address in addresses:
+            try:
+                imus.append(await AsyncICM20948.open(executor=executor, address=address))
+            except Exception as e:
+                print(f"⚠️  No ICM20948 at 0x{address:02X}: {e}")
+        await asyncio.gather(*(_print_samples(imu, f"0x{imu.imu.address:02X}", 20) for imu in imus))
+    finally:
+        for imu in imus:
+            await imu.close()
+        executor.shutdown()
+
+def main():
+    """Read every ICM20948 on bus 1 concurrently from one event loop"""
+    print("⚡ ICM20948 Asyncio Driver")
+    print("=" * 50)
+    try:
+        asyncio.run(_demo([0x68, 0x69]))
+    except KeyboardInterrupt:
+        print("\n👋 Stopped by user")
+
+if __name__ == "__main__":
+    main()
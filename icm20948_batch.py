@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Batched EKF Engine
+N independent copies of the ICM20948_EKF filter stepped together with array
+operations, for replaying many recordings or sweeping many tunings at once
+
+State: (N, 6) [roll, pitch, yaw, bias_x, bias_y, bias_z], covariance (N, 6, 6)
+- Same process model, Jacobian, accelerometer and magnetometer updates,
+  angle normalization and Euler unwrapping as ICM20948_EKF, so filter i
+  tracks a single ICM20948_EKF fed the same data
+- P, Q, R_accel, R_mag, magnetic_declination and sample_rate_hz are per
+  filter; set bank.Q[i] etc. to give each filter its own tuning
+- Each step is a fixed number of numpy calls whatever N is, so the cost per
+  filter falls with N instead of paying the Python overhead N times
+
+Usage:
+    bank = BatchedEKF(64)
+    bank.Q[:, 0:3, 0:3] *= np.linspace(0.1, 10, 64)[:, None, None]
+    bank.initialize_state(accel_ned, mag_ned, mag_valid)   # (N, 3), (N, 3), (N,)
+    bank.predict(gyro_ned, dt)                              # (N, 3), scalar or (N,)
+    bank.update_accelerometer(accel_ned)
+    bank.update_magnetometer(mag_ned, mag_valid)
+"""
+
+import math
+import sys
+import time
+import numpy as np
+
+try:
+    from icm20948_ekf import ICM20948_EKF, invert_symmetric_3x3
+    from icm20948_config import BASE_ODR_HZ
+except ImportError:
+    print("ERROR: Could not import ICM20948_EKF")
+    print("Make sure icm20948_ekf.py is in the same directory")
+    sys.exit(1)
+
+# last_sample_ns entry of a filter that has not seen a sample yet
+NO_TIMESTAMP_NS = np.iinfo(np.int64).min
+
+def normalize_angles(angles):
+    """Elementwise normalize to [-pi, pi]"""
+    return np.where(np.abs(angles) > math.pi, np.mod(angles + math.pi, 2 * math.pi) - math.pi, angles)
+
+class BatchedEKF:
+    """N Euler-angle EKFs as (N, 6) state and (N, 6, 6) covariance arrays"""
+
+    def __init__(self, n, template=None):
+        """N copies of template's noise parameters (a default ICM20948_EKF if None)"""
+        if template is None:
+            template = ICM20948_EKF(imu=None, checkpoint_file=None)
+        self.n = n
+        self.state = np.tile(template.state, (n, 1))
+        self.P = np.tile(template.P, (n, 1, 1))
+        self.Q = np.tile(template.Q, (n, 1, 1))
+        self.R_accel = np.tile(template.R_accel, (n, 1, 1))
+        self.R_mag = np.tile(template.R_mag, (n, 1, 1))
+        self.magnetic_declination = np.full(n, float(template.magnetic_declination))  # degrees
+        sample_rate_hz = template.imu.sample_rate_hz if template.imu is not None else BASE_ODR_HZ
+        self.sample_rate_hz = np.full(n, float(sample_rate_hz))   # Seeds the first dt in process_batch()
+
+        self.initialized = False
+        self.last_sample_ns = None         # (N,) for process_batch(), NO_TIMESTAMP_NS where unknown
+        self.unwrap_count = np.zeros(n, dtype=np.int64)
+
+        # Work buffers: F keeps its [0 | I] bias rows, only the attitude rows change
+        self._F = np.tile(np.eye(6), (n, 1, 1))
+        self._P_work = np.zeros((n, 6, 6))
+        self._Q_dt = np.zeros((n, 6, 6))
+
+    @classmethod
+    def from_filters(cls, filters):
+        """Stack configured ICM20948_EKF objects (state, P and tuning) into one bank"""
+        bank = cls(len(filters), filters[0])
+        for i, ekf in enumerate(filters):
+            bank.state[i] = ekf.state
+            bank.P[i] = ekf.P
+            bank.Q[i] = ekf.Q
+            bank.R_accel[i] = ekf.R_accel
+            bank.R_mag[i] = ekf.R_mag
+            bank.magnetic_declination[i] = ekf.magnetic_declination
+            if ekf.imu is not None:
+                bank.sample_rate_hz[i] = ekf.imu.sample_rate_hz
+        bank.initialized = all(ekf.initialized for ekf in filters)
+        if any(ekf.last_sample_ns is not None for ekf in filters):
+            bank.last_sample_ns = np.array([NO_TIMESTAMP_NS if ekf.last_sample_ns is None else ekf.last_sample_ns
+                                            for ekf in filters], dtype=np.int64)
+        return bank
+
+    def initialize_state(self, accel_ned, mag_ned, mag_valid):
+        """Orientation from (N, 3) accelerometer and magnetometer, zero biases"""
+        ax, ay, az = accel_ned[:, 0], accel_ned[:, 1], accel_ned[:, 2]
+        roll = np.arctan2(ay, np.sqrt(ax**2 + az**2))
+        pitch = np.arctan2(-ax, np.sqrt(ay**2 + az**2))
+
+        # Tilt-compensated heading where the magnetometer is valid, north otherwise
+        mx, my, mz = mag_ned[:, 0], mag_ned[:, 1], mag_ned[:, 2]
+        cos_roll, sin_roll = np.cos(roll), np.sin(roll)
+        cos_pitch, sin_pitch = np.cos(pitch), np.sin(pitch)
+        mag_x_comp = mx * cos_pitch + mz * sin_pitch
+        mag_y_comp = mx * sin_roll * sin_pitch + my * cos_roll - mz * sin_roll * cos_pitch
+        valid = np.asarray(mag_valid, dtype=bool) & (np.linalg.norm(mag_ned, axis=1) > 1.0)
+        yaw = np.where(valid, np.arctan2(mag_y_comp, mag_x_comp) + np.radians(self.magnetic_declination), 0.0)
+
+        self.state[:, 0] = roll
+        self.state[:, 1] = pitch
+        self.state[:, 2] = yaw
+        self.state[:, 3:6] = 0.0
+        self.initialized = True
+
+    def predict(self, gyro_ned, dt):
+        """Prediction step for all filters: (N, 3) rates in rad/s, dt scalar or (N,)"""
+        dt = np.broadcast_to(np.asarray(dt, dtype=float), (self.n,))
+        active = dt > 0
+        if not active.all():
+            previous_state, previous_P = self.state.copy(), self.P.copy()
+
+        state = self.state
+        roll, pitch, yaw = state[:, 0], state[:, 1], state[:, 2]
+        omega = gyro_ned - state[:, 3:6]
+        omega_x, omega_y, omega_z = omega[:, 0], omega[:, 1], omega[:, 2]
+
+        # Euler angle kinematics
+        sin_roll, cos_roll = np.sin(roll), np.cos(roll)
+        tan_pitch = np.tan(pitch)
+        sec_pitch = 1.0 / np.cos(pitch)
+        roll_dot = omega_x + omega_y * sin_roll * tan_pitch + omega_z * cos_roll * tan_pitch
+        pitch_dot = omega_y * cos_roll - omega_z * sin_roll
+        yaw_dot = omega_y * sin_roll * sec_pitch + omega_z * cos_roll * sec_pitch
+
+        state[:, 0:3] = normalize_angles(state[:, 0:3] + np.stack((roll_dot, pitch_dot, yaw_dot), axis=1) * dt[:, None])
+        self.unwrap_euler_angles()
+
+        self.compute_process_jacobian(omega_x, omega_y, omega_z, dt)
+        np.matmul(np.matmul(self._F, self.P, out=self._P_work), self._F.transpose(0, 2, 1), out=self.P)
+        self.P += np.multiply(self.Q, dt[:, None, None], out=self._Q_dt)
+
+        if not active.all():
+            self.state[~active] = previous_state[~active]
+            self.P[~active] = previous_P[~active]
+
+    def compute_process_jacobian(self, omega_x, omega_y, omega_z, dt):
+        """Fill the attitude rows of the (N, 6, 6) F at the predicted state"""
+        roll, pitch = self.state[:, 0], self.state[:, 1]
+        sin_roll, cos_roll = np.sin(roll), np.cos(roll)
+        tan_pitch = np.tan(pitch)
+        sec_pitch = 1.0 / np.cos(pitch)
+        sec2_pitch = sec_pitch**2
+
+        F = self._F
+        F[:, 0, 0] = 1 + dt * (omega_y * cos_roll * tan_pitch - omega_z * sin_roll * tan_pitch)
+        F[:, 0, 1] = dt * (omega_y * sin_roll * sec2_pitch + omega_z * cos_roll * sec2_pitch)
+        F[:, 0, 3] = -dt
+        F[:, 0, 4] = -dt * sin_roll * tan_pitch
+        F[:, 0, 5] = -dt * cos_roll * tan_pitch
+        F[:, 1, 0] = dt * (-omega_y * sin_roll - omega_z * cos_roll)
+        F[:, 1, 4] = -dt * cos_roll
+        F[:, 1, 5] = dt * sin_roll
+        F[:, 2, 0] = dt * (omega_y * cos_roll * sec_pitch - omega_z * sin_roll * sec_pitch)
+        F[:, 2, 1] = dt * (omega_y * sin_roll * sec_pitch * tan_pitch + omega_z * cos_roll * sec_pitch * tan_pitch)
+        F[:, 2, 4] = -dt * sin_roll * sec_pitch
+        F[:, 2, 5] = -dt * cos_roll * sec_pitch
+        return F
+
+    def update_accelerometer(self, accel_ned):
+        """Gravity update for all filters from (N, 3) accelerometer data in g"""
+        roll, pitch = self.state[:, 0], self.state[:, 1]
+        g = 9.81
+        sin_roll, cos_roll = np.sin(roll), np.cos(roll)
+        sin_pitch, cos_pitch = np.sin(pitch), np.cos(pitch)
+
+        # Residual z - h and the nonzero (roll, pitch) columns of H, as in ICM20948_EKF
+        y = accel_ned * g - g * np.stack((-sin_pitch, sin_roll * cos_pitch, cos_roll * cos_pitch), axis=1)
+        H = np.empty((self.n, 3, 2))
+        H[:, 0, 0] = 0.0
+        H[:, 0, 1] = -g * cos_pitch
+        H[:, 1, 0] = g * cos_roll * cos_pitch
+        H[:, 1, 1] = -g * sin_roll * sin_pitch
+        H[:, 2, 0] = -g * sin_roll * cos_pitch
+        H[:, 2, 1] = -g * cos_roll * sin_pitch
+
+        # S = H P₂ Hᵀ + R, inverted in closed form elementwise
+        C = self.P[:, :, 0:2]
+        S = H @ C[:, 0:2, :] @ H.transpose(0, 2, 1) + self.R_accel
+        i00, i01, i02, i11, i12, i22 = invert_symmetric_3x3(S[:, 0, 0], S[:, 0, 1], S[:, 0, 2],
+                                                            S[:, 1, 1], S[:, 1, 2], S[:, 2, 2])
+        S_inv = np.stack((np.stack((i00, i01, i02), axis=1),
+                          np.stack((i01, i11, i12), axis=1),
+                          np.stack((i02, i12, i22), axis=1)), axis=1)
+
+        # K = C W with W = Hᵀ S⁻¹: state += C (W y), P -= C (W H) Cᵀ
+        W = H.transpose(0, 2, 1) @ S_inv
+        self.state += (C @ (W @ y[:, :, None]))[:, :, 0]
+        self.P -= C @ (W @ H) @ C.transpose(0, 2, 1)
+
+        self.state[:, 0:3] = normalize_angles(self.state[:, 0:3])
+        self.unwrap_euler_angles()
+
+    def update_magnetometer(self, mag_ned, mag_valid=None):
+        """Yaw update from (N, 3) magnetometer data (µT) where mag_valid and |mag| >= 1"""
+        valid = np.linalg.norm(mag_ned, axis=1) >= 1.0
+        if mag_valid is not None:
+            valid &= np.asarray(mag_valid, dtype=bool)
+        if not valid.any():
+            return
+
+        yaw_measured = np.arctan2(mag_ned[:, 1], mag_ned[:, 0]) + np.radians(self.magnetic_declination)
+        y_yaw = np.where(valid, normalize_angles(yaw_measured - self.state[:, 2]), 0.0)
+
+        # Scalar update of state 2: K = P[:, 2] / S, P -= K P[2, :]
+        S_yaw = self.P[:, 2, 2] + self.R_mag[:, 0, 0]
+        K = self.P[:, :, 2] * (valid / S_yaw)[:, None]
+        self.state += K * y_yaw[:, None]
+        self.P -= K[:, :, None] * self.P[:, None, 2, :]
+
+        self.state[:, 0:3] = normalize_angles(self.state[:, 0:3])
+        self.unwrap_euler_angles()
+
+    def unwrap_euler_angles(self):
+        """Fix flipped Euler representations (roll and pitch both near ±180°)"""
+        roll, pitch, yaw = self.state[:, 0], self.state[:, 1], self.state[:, 2]
+        limit = math.radians(30)
+        flipped = (np.abs(np.abs(roll) - math.pi) < limit) & (np.abs(np.abs(pitch) - math.pi) < limit)
+        if not flipped.any():
+            return flipped
+
+        # +179° → -1°, -179° → +1°; yaw changes by 180°
+        flipped_state = np.stack((np.where(roll > 0, roll - math.pi, roll + math.pi),
+                                  np.where(pitch > 0, pitch - math.pi, pitch + math.pi),
+                                  normalize_angles(yaw + math.pi)), axis=1)
+        self.state[flipped, 0:3] = normalize_angles(flipped_state[flipped])
+        self.unwrap_count += flipped
+        return flipped
+
+    def process_batch(self, timestamps, accel_ned, gyro_ned, mag_ned, mag_valid):
+        """ICM20948_EKF.process_batch for all filters
+
+        timestamps (N, T) in ns, accel_ned and gyro_ned (N, T, 3), mag_ned
+        (N, 3) and mag_valid (N,): predict on every sample, then update once
+        with the mean acceleration and, where valid, the magnetometer.
+        """
+        if not self.initialized:
+            self.initialize_state(accel_ned.mean(axis=1), mag_ned, mag_valid)
+            self.last_sample_ns = np.asarray(timestamps[:, -1], dtype=np.int64)
+            return
+
+        # State initialized elsewhere: the first sample gets one nominal period
+        if self.last_sample_ns is None:
+            self.last_sample_ns = np.full(self.n, NO_TIMESTAMP_NS, dtype=np.int64)
+        unset = self.last_sample_ns == NO_TIMESTAMP_NS
+        if unset.any():
+            period_ns = np.rint(1e9 / self.sample_rate_hz[unset]).astype(np.int64)
+            self.last_sample_ns[unset] = timestamps[unset, 0] - period_ns
+
+        dts = np.diff(timestamps, axis=1, prepend=self.last_sample_ns[:, None]) * 1e-9
+        for step in range(timestamps.shape[1]):
+            self.predict(gyro_ned[:, step], dts[:, step])
+        self.last_sample_ns = np.asarray(timestamps[:, -1], dtype=np.int64)
+
+        self.update_accelerometer(accel_ned.mean(axis=1))
+        self.update_magnetometer(mag_ned, mag_valid)
+
+    def get_orientation_degrees(self):
+        """Orientation estimates in degrees, (N,) arrays"""
+        return {
+            'roll': np.degrees(self.state[:, 0]),
+            'pitch': np.degrees(self.state[:, 1]),
+            'yaw': np.degrees(self.state[:, 2])
+        }
+
+    def get_gyro_biases_degrees(self):
+        """Gyroscope bias estimates in degrees/second, (N,) arrays"""
+        return {
+            'bias_x': np.degrees(self.state[:, 3]),
+            'bias_y': np.degrees(self.state[:, 4]),
+            'bias_z': np.degrees(self.state[:, 5])
+        }
+
+    def get_uncertainty(self):
+        """Orientation standard deviations in degrees, (N,) arrays"""
+        return {
+            'roll_std': np.degrees(np.sqrt(self.P[:, 0, 0])),
+            'pitch_std': np.degrees(np.sqrt(self.P[:, 1, 1])),
+            'yaw_std': np.degrees(np.sqrt(self.P[:, 2, 2]))
+        }
+
+def main():
+    """Benchmark: one batched engine vs a loop over ICM20948_EKF objects"""
+    print("🧮 ICM20948 Batched EKF Benchmark")
+    print("=" * 50)
+
+    rng = np.random.default_rng(0)
+    steps = 500
+    dt = 0.01
+    gyro = rng.normal(0.0, 0.2, (steps, 3))
+    accel = np.array([0.0, 0.0, 1.0]) + rng.normal(0.0, 0.01, (steps, 3))
+    mag = np.array([20.0, 0.0, 40.0]) + rng.normal(0.0, 0.5, (steps, 3))
+
+    for n in (1, 16, 64, 256):
+        filters = [ICM20948_EKF(imu=None, checkpoint_file=None) for _ in range(n)]
+        bank = BatchedEKF.from_filters(filters)
+        bank.initialize_state(np.tile(accel[0], (n, 1)), np.tile(mag[0], (n, 1)), np.ones(n, dtype=bool))
+
+        start = time.perf_counter()
+        for step in range(steps):
+            bank.predict(np.tile(gyro[step], (n, 1)), dt)
+            bank.update_accelerometer(np.tile(accel[step], (n, 1)))
+            bank.update_magnetometer(np.tile(mag[step], (n, 1)))
+        batched = (time.perf_counter() - start) / steps
+
+        looped = None
+        if n <= 64:
+            for ekf in filters:
+                ekf.state[:] = bank.state[0]
+                ekf.state[3:6] = 0.0
+            start = time.perf_counter()
+            for step in range(steps):
+                for ekf in filters:
+                    ekf.predict(gyro[step], dt)
+                    ekf.update_accelerometer(accel[step])
+                    ekf.update_magnetometer(mag[step])
+            looped = (time.perf_counter() - start) / steps
+
+        line = f"   N={n:4d}: batched {batched * 1e6:7.0f} µs/step ({batched / n * 1e6:6.1f} µs per filter)"
+        if looped is not None:
+            line += f", loop {looped * 1e6:7.0f} µs/step ({looped / batched:4.1f}x)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Accelerometer/Gyroscope Configuration
+Output data rate (sample-rate divider), digital low-pass filter and full-scale range
+
+With the DLPF enabled (FCHOICE = 1) both sensors sample at
+ODR = 1125 Hz / (1 + SMPLRT_DIV). When no DLPF bandwidth is given, the
+widest filter that stays below the Nyquist frequency (ODR / 2) is chosen,
+so the chip never aliases content the pipeline cannot see.
+"""
+
+# Base internal sample rate with DLPF enabled
+BASE_ODR_HZ = 1125.0
+
+# 3 dB bandwidth for each DLPFCFG value (datasheet tables 16 and 18)
+GYRO_DLPF_BANDWIDTH_HZ = {0: 196.6, 1: 151.8, 2: 119.5, 3: 51.2, 4: 23.9, 5: 11.6, 6: 5.7, 7: 361.4}
+ACCEL_DLPF_BANDWIDTH_HZ = {0: 246.0, 1: 246.0, 2: 111.4, 3: 50.4, 4: 23.9, 5: 11.5, 6: 5.7, 7: 473.0}
+
+# Full-scale range → FS_SEL
+GYRO_FS_SEL = {250: 0, 500: 1, 1000: 2, 2000: 3}     # ±°/s
+ACCEL_FS_SEL = {2: 0, 4: 1, 8: 2, 16: 3}              # ±g
+
+GYRO_SMPLRT_DIV_MAX = 0xFF
+ACCEL_SMPLRT_DIV_MAX = 0xFFF
+
+def _sample_rate_divider(odr_hz, max_divider):
+    """Divider giving the closest achievable rate to odr_hz"""
+    if odr_hz <= 0:
+        raise ValueError(f"Output data rate must be positive, got {odr_hz}")
+    divider = int(round(BASE_ODR_HZ / odr_hz - 1))
+    return max(0, min(max_divider, divider))
+
+def _select_dlpf(bandwidths, odr_hz, bandwidth_hz):
+    """Pick DLPFCFG: nearest to the requested bandwidth, or widest below Nyquist"""
+    if bandwidth_hz is not None:
+        return min(bandwidths, key=lambda cfg: abs(bandwidths[cfg] - bandwidth_hz))
+
+    nyquist = odr_hz / 2.0
+    below = [cfg for cfg in bandwidths if bandwidths[cfg] <= nyquist]
+    if not below:
+        return min(bandwidths, key=lambda cfg: bandwidths[cfg])
+    return max(below, key=lambda cfg: (bandwidths[cfg], -cfg))
+
+class SensorConfig:
+    """Accelerometer and gyroscope ODR, DLPF bandwidth and full-scale range"""
+
+    def __init__(self, odr_hz=BASE_ODR_HZ, accel_odr_hz=None, gyro_odr_hz=None,
+                 accel_range_g=2, gyro_range_dps=250, accel_dlpf_hz=None, gyro_dlpf_hz=None):
+        if accel_range_g not in ACCEL_FS_SEL:
+            raise ValueError(f"Accelerometer range must be one of {sorted(ACCEL_FS_SEL)} g")
+        if gyro_range_dps not in GYRO_FS_SEL:
+            raise ValueError(f"Gyroscope range must be one of {sorted(GYRO_FS_SEL)} °/s")
+
+        self.accel_range_g = accel_range_g
+        self.gyro_range_dps = gyro_range_dps
+
+        # Sample-rate dividers and the rates they actually produce
+        self.gyro_smplrt_div = _sample_rate_divider(gyro_odr_hz or odr_hz, GYRO_SMPLRT_DIV_MAX)
+        self.accel_smplrt_div = _sample_rate_divider(accel_odr_hz or odr_hz, ACCEL_SMPLRT_DIV_MAX)
+        self.gyro_odr_hz = BASE_ODR_HZ / (1 + self.gyro_smplrt_div)
+        self.accel_odr_hz = BASE_ODR_HZ / (1 + self.accel_smplrt_div)
+
+        # Digital low-pass filters
+        self.gyro_dlpfcfg = _select_dlpf(GYRO_DLPF_BANDWIDTH_HZ, self.gyro_odr_hz, gyro_dlpf_hz)
+        self.accel_dlpfcfg = _select_dlpf(ACCEL_DLPF_BANDWIDTH_HZ, self.accel_odr_hz, accel_dlpf_hz)
+
+    @property
+    def accel_scale(self):
+        """g per LSB"""
+        return self.accel_range_g / 32768.0
+
+    @property
+    def gyro_scale(self):
+        """°/s per LSB"""
+        return self.gyro_range_dps / 32768.0
+
+    @property
+    def gyro_dlpf_hz(self):
+        return GYRO_DLPF_BANDWIDTH_HZ[self.gyro_dlpfcfg]
+
+    @property
+    def accel_dlpf_hz(self):
+        return ACCEL_DLPF_BANDWIDTH_HZ[self.accel_dlpfcfg]
+
+    @property
+    def gyro_config_1(self):
+        """GYRO_CONFIG_1: DLPFCFG[5:3], FS_SEL[2:1], FCHOICE[0]"""
+        return (self.gyro_dlpfcfg << 3) | (GYRO_FS_SEL[self.gyro_range_dps] << 1) | 0x01
+
+    @property
+    def accel_config(self):
+        """ACCEL_CONFIG: DLPFCFG[5:3], FS_SEL[2:1], FCHOICE[0]"""
+        return (self.accel_dlpfcfg << 3) | (ACCEL_FS_SEL[self.accel_range_g] << 1) | 0x01
+
+    def describe(self):
+        """One-line human readable summary"""
+        return (f"accel ±{self.accel_range_g}g @ {self.accel_odr_hz:.1f} Hz (DLPF {self.accel_dlpf_hz} Hz), "
+                f"gyro ±{self.gyro_range_dps}°/s @ {self.gyro_odr_hz:.1f} Hz (DLPF {self.gyro_dlpf_hz} Hz)")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Raw Data Decoding
+Byte blocks to int16 counts in one call, and counts to physical units in one multiply
+
+- ICM20948 accel/gyro/temperature registers and FIFO words are big-endian
+- AK09916 data registers (HXL..HZH) are little-endian
+- Single bursts are decoded with a precompiled struct, multi-sample FIFO
+  drains with np.frombuffer, so the cost per byte does not grow with ODR
+"""
+
+import struct
+import numpy as np
+
+# ACCEL_XOUT_H..GYRO_ZOUT_L, TEMP_OUT_H/L
+SENSOR_STRUCT = struct.Struct('>7h')
+
+# One X/Y/Z register triple (ACCEL_XOUT_H.. or GYRO_XOUT_H..)
+AXES_STRUCT = struct.Struct('>3h')
+
+# TEMP_OUT_H/L
+TEMP_STRUCT = struct.Struct('>h')
+
+# AK09916 HXL..HZH
+MAG_STRUCT = struct.Struct('<3h')
+
+def _buffer(data):
+    """smbus returns lists; struct and numpy need a bytes-like object"""
+    return bytes(data) if isinstance(data, list) else data
+
+def decode_sensor_block(data, offset=0):
+    """Decode accel, gyro and temperature from a burst starting at ACCEL_XOUT_H
+
+    Returns ((ax, ay, az), (gx, gy, gz), temperature) in raw counts.
+    """
+    values = SENSOR_STRUCT.unpack_from(_buffer(data), offset)
+    return values[0:3], values[3:6], values[6]
+
+def decode_axes(data, offset=0):
+    """Decode one big-endian X/Y/Z register triple into (x, y, z) raw counts"""
+    return AXES_STRUCT.unpack_from(_buffer(data), offset)
+
+def decode_temperature(data, offset=0):
+    """Decode TEMP_OUT_H/L into raw counts"""
+    return TEMP_STRUCT.unpack_from(_buffer(data), offset)[0]
+
+def decode_mag_data(data, offset=0):
+    """Decode AK09916 HXL..HZH into (x, y, z) raw counts"""
+    return MAG_STRUCT.unpack_from(_buffer(data), offset)
+
+def decode_samples(data, columns=6):
+    """Decode a multi-sample big-endian block (e.g. a FIFO drain) into an (N, columns) int16 array"""
+    words = np.frombuffer(_buffer(data), dtype='>i2')
+    return words.reshape(-1, columns).astype(np.int16)
+
+def sample_scales(accel_scale, gyro_scale):
+    """Per-column scale factors for accel X/Y/Z, gyro X/Y/Z samples"""
+    return np.array([accel_scale] * 3 + [gyro_scale] * 3)
+
+def scale_samples(samples, scales):
+    """Raw (N, k) counts to physical units with a single broadcast multiply"""
+    return np.multiply(samples, scales)
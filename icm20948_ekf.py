@@ -9,6 +9,7 @@ State Vector: [roll, pitch, yaw, bias_x, bias_y, bias_z]
 - Automatically estimates and corrects gyroscope biases
 """
 
+import os
 import time
 import math
 import json
@@ -23,14 +24,62 @@ except ImportError:
     print("Make sure icm20948_ned_corrected.py is in the same directory")
     sys.exit(1)
 
+from icm20948_acquisition import SampleRingBuffer, AcquisitionThread
+from icm20948_recovery import FaultRecovery
+from icm20948_scheduler import MultiRateScheduler
+
+def invert_symmetric_3x3(a, b, c, d, e, f):
+    """Closed-form inverse of the symmetric matrix [[a, b, c], [b, d, e], [c, e, f]]
+    
+    Returns the upper triangle (00, 01, 02, 11, 12, 22) as floats.
+    """
+    A = d * f - e * e
+    B = c * e - b * f
+    C = b * e - c * d
+    inv_det = 1.0 / (a * A + b * B + c * C)
+    return (A * inv_det, B * inv_det, C * inv_det,
+            (a * f - c * c) * inv_det, (b * c - a * e) * inv_det, (a * d - b * b) * inv_det)
+
 class ICM20948_EKF:
     """Extended Kalman Filter for ICM20948 orientation estimation"""
     
-    def __init__(self, calibration_file="icm20948_raw_calibration.json"):
-        self.imu = None
+    def __init__(self, calibration_file="icm20948_raw_calibration.json", imu=None, use_fifo=False,
+                 threaded=False, checkpoint_file="icm20948_ekf_state.json", sequential_updates=False):
+        self.imu = imu  # Pre-configured ICM20948_NED_Corrected, or None to create one
         self.calibration_data = None
         self.calibration_file = calibration_file
         
+        # Warm start: bias estimates and covariance persisted across restarts (None = disabled);
+        # a relative path is taken next to the calibration file, not the working directory
+        if checkpoint_file and not os.path.isabs(checkpoint_file):
+            checkpoint_file = os.path.join(os.path.dirname(os.path.abspath(calibration_file)), checkpoint_file)
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_interval = 60.0       # Seconds between periodic checkpoints
+        self.checkpoint_max_age = 24 * 3600.0 # Ignore checkpoints older than this (s)
+        self.checkpoint_max_temp_delta = 5.0  # Ignore if the sensor is this much warmer/colder (°C)
+        self.checkpoint_bias_growth = 1e-8    # Bias variance added per second of checkpoint age ((rad/s)²/s)
+        self.warm_start = None                # Checkpoint accepted by load_checkpoint()
+        self.temperature_c = None             # Latest sensor temperature
+        self._last_checkpoint = time.monotonic()
+        
+        # FIFO mode: predict on every sensor sample with sensor-clock dt
+        self.use_fifo = use_fifo
+        self.last_sample_ns = None
+        
+        # Bus fault recovery: during an outage, keep predicting on the last good gyro sample
+        self.recovery = None
+        self.last_gyro_ned = None             # rad/s
+        self.last_mag_valid = False
+        
+        # Threaded mode: an acquisition thread fills a ring buffer, the filter consumes batches
+        self.threaded = threaded
+        self.display_interval = 0.1           # Seconds between terminal updates
+        
+        # Burst mode: accel/gyro at the sensor ODR, magnetometer at its own rate
+        self.scheduler = None                 # MultiRateScheduler, created by run_ekf() if not set
+        self.batch_interval = 0.02            # Seconds of scheduled samples per filter batch
+        self.mag_max_age = 0.1                # Skip magnetometer updates older than this (s)
+        
         # EKF State: [roll, pitch, yaw, bias_x, bias_y, bias_z]
         self.state = np.zeros(6)  # [rad, rad, rad, rad/s, rad/s, rad/s]
         
@@ -44,12 +93,32 @@ class ICM20948_EKF:
         self.R_accel = np.eye(3)
         self.R_mag = np.eye(3)
         
+        # Sequential mode: accelerometer axes and magnetometer yaw as scalar updates (no matrix inverse)
+        self.sequential_updates = sequential_updates
+        self._seq_u = np.zeros(3)
+        self._seq_M = np.zeros((3, 3))
+        self._seq_PM = np.zeros((6, 3))
+        
+        # Accelerometer update work buffers (only roll/pitch columns of H are nonzero)
+        self._gain_u = np.zeros(2)
+        self._gain_M = np.zeros((2, 2))
+        self._PM = np.zeros((6, 2))
+        self._P_work = np.zeros((6, 6))
+        self._dx = np.zeros(6)
+        
+        # Prediction work buffers: F keeps its [0 | I] bias rows, only the attitude rows change
+        self._F = np.eye(6)
+        self._Q_dt = np.zeros((6, 6))         # Q·dt scratch
+        
         # Magnetic declination (adjust for your location)
         self.magnetic_declination = 0.0  # degrees
         
         # EKF initialization flag
         self.initialized = False
         
+        # Boot latency: sensor cold start (driver construction) to the first state estimate
+        self.time_to_first_estimate_s = None
+        
         # Setup noise parameters
         self._setup_noise_parameters()
         
@@ -74,7 +143,9 @@ class ICM20948_EKF:
         
         # Initialize sensor
         try:
-            self.imu = ICM20948_NED_Corrected()
+            if self.imu is None:
+                self.imu = ICM20948_NED_Corrected()
+            self.recovery = FaultRecovery(self.imu)
             print("✅ ICM20948 initialized")
         except Exception as e:
             print(f"❌ Failed to initialize sensor: {e}")
@@ -90,6 +161,12 @@ class ICM20948_EKF:
             coord_system = self.calibration_data.get('coordinate_system', 'unknown')
             if coord_system != 'raw_sensor_coordinates':
                 print(f"⚠️  WARNING: Expected raw_sensor_coordinates, got {coord_system}")
+            
+            gyro_cal = self.calibration_data.get('gyroscope', {})
+            if 'temperature_coefficients' in gyro_cal and gyro_cal.get('temperature_c') is not None:
+                slopes = gyro_cal['temperature_coefficients']
+                print(f"🌡️  Gyro temperature compensation: {slopes[0]:+.4f} {slopes[1]:+.4f} "
+                      f"{slopes[2]:+.4f} °/s/°C around {gyro_cal['temperature_c']:.1f}°C")
                 
         except FileNotFoundError:
             print(f"❌ Calibration file {self.calibration_file} not found")
@@ -99,15 +176,105 @@ class ICM20948_EKF:
             print(f"❌ Failed to load calibration: {e}")
             return False
         
+        # Restore bias estimates from the previous run, if still valid
+        if self.checkpoint_file:
+            self.load_checkpoint()
+        
+        return True
+    
+    def save_checkpoint(self):
+        """Write state, covariance and sensor temperature to checkpoint_file
+        
+        Written to a temporary file and renamed, so a crash or power loss
+        mid-write leaves the previous checkpoint intact.
+        """
+        if not self.checkpoint_file or not self.initialized:
+            return False
+        
+        checkpoint = {
+            'timestamp': datetime.now().isoformat(),
+            'saved_at': time.time(),
+            'state': self.state.tolist(),
+            'covariance': self.P.tolist(),
+            'temperature_c': self.temperature_c,
+            'calibration_timestamp': self.calibration_data.get('timestamp') if self.calibration_data else None,
+        }
+        
+        temp_file = self.checkpoint_file + '.tmp'
+        try:
+            with open(temp_file, 'w') as f:
+                json.dump(checkpoint, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.checkpoint_file)
+        except OSError as e:
+            print(f"\n⚠️  Failed to save EKF checkpoint: {e}")
+            return False
+        
+        self._last_checkpoint = time.monotonic()
+        return True
+    
+    def checkpoint_if_due(self):
+        """Save a checkpoint every checkpoint_interval seconds"""
+        if time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            self.save_checkpoint()
+    
+    def load_checkpoint(self):
+        """Read checkpoint_file and keep it for initialize_state() if it is still valid
+        
+        A checkpoint is rejected if it is older than checkpoint_max_age, was
+        made against a different calibration (biases are residuals of it), or
+        the sensor temperature has moved more than checkpoint_max_temp_delta.
+        """
+        self.warm_start = None
+        try:
+            with open(self.checkpoint_file, 'r') as f:
+                checkpoint = json.load(f)
+            state = np.array(checkpoint['state'], dtype=float)
+            covariance = np.array(checkpoint['covariance'], dtype=float)
+            age = time.time() - checkpoint['saved_at']
+        except FileNotFoundError:
+            return False
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"⚠️  Ignoring unreadable EKF checkpoint {self.checkpoint_file}: {e}")
+            return False
+        
+        if state.shape != (6,) or covariance.shape != (6, 6) or not np.all(np.isfinite(covariance)):
+            reason = "unexpected state or covariance shape"
+        elif age < 0 or age > self.checkpoint_max_age:
+            reason = f"saved {age / 3600:.1f} h ago (limit {self.checkpoint_max_age / 3600:.1f} h)"
+        elif self.calibration_data and checkpoint.get('calibration_timestamp') != self.calibration_data.get('timestamp'):
+            reason = "made with a different calibration"
+        else:
+            reason = None
+            saved_temp = checkpoint.get('temperature_c')
+            if saved_temp is not None and self.imu is not None:
+                try:
+                    self.temperature_c = self.imu.read_temperature()
+                except OSError as e:
+                    reason = f"could not read the sensor temperature ({e})"
+                else:
+                    if abs(self.temperature_c - saved_temp) > self.checkpoint_max_temp_delta:
+                        reason = f"temperature changed {saved_temp:.1f} → {self.temperature_c:.1f} °C"
+        
+        if reason:
+            print(f"⚠️  EKF checkpoint ignored: {reason}")
+            return False
+        
+        self.warm_start = {'state': state, 'covariance': covariance, 'age': age}
+        print(f"✅ EKF checkpoint loaded ({age / 60:.1f} min old)")
         return True
     
     def apply_calibration_and_transform(self):
         """Read raw sensors, apply calibration, transform to NED"""
         
         # Step 1: Read RAW sensor data
-        accel_raw = self.imu.read_accelerometer_raw()
-        gyro_raw = self.imu.read_gyroscope_raw()
-        mag_raw_x, mag_raw_y, mag_raw_z, mag_valid = self.imu.read_magnetometer_raw()
+        sample = self.imu.read_all_raw()  # Accel + gyro + mag in one burst
+        accel_raw = sample.accel
+        gyro_raw = sample.gyro
+        mag_raw_x, mag_raw_y, mag_raw_z = sample.mag
+        mag_valid = sample.mag_valid
+        self.temperature_c = self.imu.temperature_to_celsius(sample.temperature)
         
         # Step 2: Convert to physical units
         accel_raw_g = [x * self.imu.accel_scale for x in accel_raw]
@@ -133,6 +300,144 @@ class ICM20948_EKF:
         
         return accel_ned, gyro_ned, mag_ned, mag_valid
     
+    def read_sample_batch(self):
+        """Drain the FIFO, apply calibration, transform to NED
+        
+        Returns (timestamps_ns, accel_ned (N,3) in g, gyro_ned (N,3) in rad/s,
+        mag_ned, mag_valid). Magnetometer and temperature come from one burst.
+        """
+        timestamps, samples = self.imu.read_fifo_timestamped()
+        burst = self.imu.read_all_raw()
+        self.temperature_c = self.imu.temperature_to_celsius(burst.temperature)
+        
+        accel_ned, gyro_ned = self.calibrate_batch(samples)
+        mag_valid = burst.mag_valid
+        mag_ned = self.calibrate_mag_sample(burst.mag, mag_valid)
+        
+        return timestamps, accel_ned, gyro_ned, mag_ned, mag_valid
+    
+    def read_scheduled_batch(self):
+        """Read batch_interval seconds of samples from the multi-rate scheduler
+        
+        Same return values as read_sample_batch(); mag_valid is True only for
+        a magnetometer reading that arrived in this batch and is younger than
+        mag_max_age.
+        """
+        timestamps, samples, temperature, mag_raw, mag_fresh, mag_age_s = \
+            self.scheduler.read_batch(self.batch_interval)
+        self.temperature_c = self.imu.temperature_to_celsius(temperature)
+        accel_ned, gyro_ned = self.calibrate_batch(samples)
+        
+        mag_valid = mag_fresh and mag_age_s <= self.mag_max_age
+        mag_ned = self.calibrate_mag_sample(mag_raw, mag_valid)
+        
+        return timestamps, accel_ned, gyro_ned, mag_ned, mag_valid
+    
+    def read_ring_batch(self, batch):
+        """Calibrate a batch of SAMPLE_DTYPE records from an acquisition ring buffer
+        
+        Same return values as read_sample_batch(); the magnetometer is the
+        newest valid reading in the batch.
+        """
+        if len(batch):
+            self.temperature_c = self.imu.temperature_to_celsius(int(batch['temperature'][-1]))
+        samples = np.concatenate((batch['accel'], batch['gyro']), axis=1)
+        accel_ned, gyro_ned = self.calibrate_batch(samples)
+        
+        valid = np.flatnonzero(batch['mag_valid'])
+        mag_valid = len(valid) > 0
+        mag_raw = batch['mag'][valid[-1]] if mag_valid else (0, 0, 0)
+        mag_ned = self.calibrate_mag_sample(mag_raw, mag_valid)
+        
+        return batch['timestamp_ns'], accel_ned, gyro_ned, mag_ned, mag_valid
+    
+    def calibrate_batch(self, samples):
+        """Raw (N, 6) accel/gyro counts → calibrated NED accel (g) and gyro (rad/s)"""
+        # Physical units and calibration for the whole batch at once
+        physical = self.imu.samples_to_physical(samples)
+        accel = physical[:, 0:3]
+        gyro = physical[:, 3:6]
+        
+        if 'accelerometer' in self.calibration_data:
+            cal = self.calibration_data['accelerometer']
+            accel = (accel - np.array(cal.get('bias_raw', [0, 0, 0]))) * np.array(cal.get('scale_factors', [1, 1, 1]))
+        if 'gyroscope' in self.calibration_data:
+            gyro = gyro - self.gyro_bias_at_temperature()
+        
+        # NED transforms (accelerometer [+X, +Y, -Z], gyroscope [-X, -Y, +Z])
+        accel_ned = accel * np.array([1.0, 1.0, -1.0])
+        gyro_ned = gyro * np.array([-1.0, -1.0, 1.0]) * (math.pi / 180.0)  # rad/s
+        
+        return accel_ned, gyro_ned
+    
+    def calibrate_mag_sample(self, mag_raw, mag_valid):
+        """Raw magnetometer counts → calibrated NED field (µT), zeros if not valid"""
+        if not mag_valid:
+            return np.zeros(3)
+        
+        mag_raw_ut = [mag_raw[0] * self.imu.mag_scale,
+                      mag_raw[1] * self.imu.mag_scale,
+                      mag_raw[2] * self.imu.mag_scale]
+        return np.array(self.transform_mag_to_ned(self.apply_mag_calibration(mag_raw_ut)))
+    
+    def process_sample_batch(self):
+        """Run the filter over one FIFO drain; returns the number of samples used
+        
+        Every gyro sample drives a predict step with its exact sensor-clock dt.
+        The accelerometer update uses the batch mean (lower noise, one update
+        per drain) and the magnetometer update the latest fresh reading.
+        """
+        return self.process_batch(*self.read_sample_batch())
+    
+    def process_scheduled_batch(self):
+        """Run the filter over one batch from the multi-rate scheduler"""
+        return self.process_batch(*self.read_scheduled_batch())
+    
+    def process_ring_batch(self, batch):
+        """Run the filter over a batch read from an acquisition ring buffer"""
+        return self.process_batch(*self.read_ring_batch(batch))
+    
+    def process_batch(self, timestamps, accel_ned, gyro_ned, mag_ned, mag_valid):
+        """Predict on every sample of a calibrated batch, then update once"""
+        if len(timestamps) == 0:
+            return 0
+        
+        self.last_gyro_ned = gyro_ned[-1]
+        self.last_mag_valid = mag_valid
+        
+        if not self.initialized:
+            self.initialize_state(accel_ned.mean(axis=0), mag_ned, mag_valid)
+            self.last_sample_ns = int(timestamps[-1])
+            return len(timestamps)
+        
+        if self.last_sample_ns is None:
+            # State initialized elsewhere: assume one nominal period before this batch
+            self.last_sample_ns = int(timestamps[0] - 1e9 / self.imu.sample_rate_hz)
+        
+        dts = np.diff(timestamps, prepend=self.last_sample_ns) * 1e-9
+        for gyro, dt in zip(gyro_ned, dts):
+            self.predict(gyro, dt)
+        self.last_sample_ns = int(timestamps[-1])
+        
+        self.update_accelerometer(accel_ned.mean(axis=0))
+        if mag_valid:
+            self.update_magnetometer(mag_ned)
+        
+        return len(timestamps)
+    
+    def predict_through_outage(self):
+        """Predict up to now on the last good gyro sample while the sensor is unavailable
+        
+        Keeps the orientation moving with the last measured rate (and the
+        covariance growing) instead of freezing; the next batch continues
+        from here on the same monotonic clock.
+        """
+        if not self.initialized or self.last_gyro_ned is None or self.last_sample_ns is None:
+            return
+        now_ns = time.monotonic_ns()
+        self.predict(self.last_gyro_ned, (now_ns - self.last_sample_ns) * 1e-9)
+        self.last_sample_ns = now_ns
+    
     def apply_accel_calibration(self, raw_accel):
         """Apply accelerometer calibration"""
         if 'accelerometer' not in self.calibration_data:
@@ -149,11 +454,30 @@ class ICM20948_EKF:
         if 'gyroscope' not in self.calibration_data:
             return raw_gyro
         
-        cal = self.calibration_data['gyroscope']
-        bias = cal.get('bias_raw', [0, 0, 0])
+        bias = self.gyro_bias_at_temperature()
         
         return [raw_gyro[i] - bias[i] for i in range(3)]
     
+    def gyro_bias_at_temperature(self):
+        """RAW gyroscope bias (°/s) at the current sensor temperature
+        
+        bias_raw holds at the calibration temperature; a fitted temperature
+        model shifts it linearly (clamped to the fitted range), so the bias
+        states only track the residual drift.
+        """
+        cal = self.calibration_data['gyroscope']
+        bias = np.array(cal.get('bias_raw', [0, 0, 0]), dtype=float)
+        
+        coefficients = cal.get('temperature_coefficients')
+        reference_c = cal.get('temperature_c')
+        if coefficients is None or reference_c is None or self.temperature_c is None:
+            return bias
+        
+        temperature_c = self.temperature_c
+        if 'temperature_range_c' in cal:
+            temperature_c = min(max(temperature_c, cal['temperature_range_c'][0]), cal['temperature_range_c'][1])
+        return bias + np.array(coefficients) * (temperature_c - reference_c)
+    
     def apply_mag_calibration(self, raw_mag):
         """Apply magnetometer calibration"""
         if 'magnetometer' not in self.calibration_data:
@@ -181,6 +505,42 @@ class ICM20948_EKF:
         """Initialize EKF state from accelerometer and magnetometer"""
         
         # Calculate initial orientation from sensors
+        roll_init, pitch_init, yaw_init = self.initial_orientation(accel_ned, mag_ned, mag_valid)
+        
+        # Initialize state vector [roll, pitch, yaw, bias_x, bias_y, bias_z]
+        self.set_orientation(roll_init, pitch_init, yaw_init)
+        self.state[3:6] = 0.0  # Initial bias estimates
+        
+        # Warm start: the sensor may have moved while off, so orientation always
+        # comes from the measurements above; biases and their covariance are
+        # restored, with variance grown for the time the filter was not running
+        if self.warm_start is not None:
+            self.state[3:6] = self.warm_start['state'][3:6]
+            self.P[3:6, 3:6] = self.warm_start['covariance'][3:6, 3:6] + \
+                np.eye(3) * self.checkpoint_bias_growth * self.warm_start['age']
+            self.P[0:3, 3:6] = 0.0
+            self.P[3:6, 0:3] = 0.0
+        
+        self.initialized = True
+        
+        if self.time_to_first_estimate_s is None and self.imu is not None and self.imu.cold_start_ns is not None:
+            self.time_to_first_estimate_s = (time.monotonic_ns() - self.imu.cold_start_ns) * 1e-9
+        
+        print(f"📍 EKF initialized:")
+        print(f"   Roll:  {math.degrees(roll_init):+6.1f}°")
+        print(f"   Pitch: {math.degrees(pitch_init):+6.1f}°") 
+        print(f"   Yaw:   {math.degrees(yaw_init):+6.1f}°")
+        if self.warm_start is not None:
+            biases = self.get_gyro_biases_degrees()
+            print(f"   Biases: [{biases['bias_x']:.2f}, {biases['bias_y']:.2f}, {biases['bias_z']:.2f}]°/s "
+                  f"(restored from checkpoint)")
+        else:
+            print(f"   Biases: [0.0, 0.0, 0.0]°/s (will be estimated)")
+        if self.time_to_first_estimate_s is not None:
+            print(f"   Cold start to first estimate: {self.time_to_first_estimate_s * 1000:.0f} ms")
+    
+    def initial_orientation(self, accel_ned, mag_ned, mag_valid):
+        """Roll, pitch (accelerometer) and yaw (tilt-compensated magnetometer) in radians"""
         roll_init = math.atan2(accel_ned[1], math.sqrt(accel_ned[0]**2 + accel_ned[2]**2))
         pitch_init = math.atan2(-accel_ned[0], math.sqrt(accel_ned[1]**2 + accel_ned[2]**2))
         
@@ -200,34 +560,31 @@ class ICM20948_EKF:
         else:
             yaw_init = 0.0  # Default to North if magnetometer invalid
         
-        # Initialize state vector [roll, pitch, yaw, bias_x, bias_y, bias_z]
-        self.state[0] = roll_init
-        self.state[1] = pitch_init  
-        self.state[2] = yaw_init
-        self.state[3:6] = 0.0  # Initial bias estimates
-        
-        self.initialized = True
-        
-        print(f"📍 EKF initialized:")
-        print(f"   Roll:  {math.degrees(roll_init):+6.1f}°")
-        print(f"   Pitch: {math.degrees(pitch_init):+6.1f}°") 
-        print(f"   Yaw:   {math.degrees(yaw_init):+6.1f}°")
-        print(f"   Biases: [0.0, 0.0, 0.0]°/s (will be estimated)")
+        return roll_init, pitch_init, yaw_init
+    
+    def set_orientation(self, roll, pitch, yaw):
+        """Set the orientation states (radians)"""
+        self.state[0] = roll
+        self.state[1] = pitch
+        self.state[2] = yaw
     
     def predict(self, gyro_ned, dt):
-        """EKF Prediction Step - Use gyroscope data to predict state"""
+        """EKF Prediction Step - Use gyroscope data to predict state
+        
+        Returns the transition Jacobian F of this step (a reused buffer), or
+        None if dt <= 0.
+        """
         
         if dt <= 0:
             return
         
-        # Extract current state
-        roll, pitch, yaw = self.state[0:3]
-        bias_x, bias_y, bias_z = self.state[3:6]
+        # Extract current state (as floats: scalar math on numpy elements is several times slower)
+        roll, pitch, yaw, bias_x, bias_y, bias_z = self.state.tolist()
         
         # Bias-corrected gyroscope rates
-        omega_x = gyro_ned[0] - bias_x
-        omega_y = gyro_ned[1] - bias_y
-        omega_z = gyro_ned[2] - bias_z
+        omega_x = float(gyro_ned[0]) - bias_x
+        omega_y = float(gyro_ned[1]) - bias_y
+        omega_z = float(gyro_ned[2]) - bias_z
         
         # Predict new orientation using gyroscope (Euler angle integration)
         # This is the nonlinear process model
@@ -241,30 +598,40 @@ class ICM20948_EKF:
         pitch_dot = omega_y * cos_roll - omega_z * sin_roll
         yaw_dot = omega_y * sin_roll * sec_pitch + omega_z * cos_roll * sec_pitch
         
-        # Update state (prediction)
-        self.state[0] += roll_dot * dt   # roll
-        self.state[1] += pitch_dot * dt  # pitch
-        self.state[2] += yaw_dot * dt    # yaw
+        # Update state (prediction), normalized to [-pi, pi]
         # Biases don't change in prediction (state[3:6] remain same)
-        
-        # Normalize angles
-        self.state[0] = self.normalize_angle(self.state[0])
-        self.state[1] = self.normalize_angle(self.state[1])
-        self.state[2] = self.normalize_angle(self.state[2])
+        self.state[0:3] = (self.normalize_angle(roll + roll_dot * dt),
+                           self.normalize_angle(pitch + pitch_dot * dt),
+                           self.normalize_angle(yaw + yaw_dot * dt))
         
         # Fix Euler angle ambiguities (handles flipped angles after complex movements)
         self.unwrap_euler_angles()
         
         # Compute Jacobian of process model (F matrix)
-        F = self.compute_process_jacobian(omega_x, omega_y, omega_z, dt)
+        self.compute_process_jacobian(omega_x, omega_y, omega_z, dt)
         
         # Predict covariance: P = F * P * F^T + Q
-        self.P = F @ self.P @ F.T + self.Q * dt
+        self.propagate_covariance(dt)
+        return self._F
+    
+    def propagate_covariance(self, dt):
+        """P = F P Fᵀ + Q·dt in place, with the preallocated F and scratch buffers
+        
+        Q·dt is recomputed every step (cheaper than checking whether self.Q was
+        edited in place), so tuning Q between steps takes effect immediately.
+        """
+        np.dot(np.dot(self._F, self.P, out=self._P_work), self._F.T, out=self.P)
+        np.multiply(self.Q, dt, out=self._Q_dt)
+        self.P += self._Q_dt
     
     def compute_process_jacobian(self, omega_x, omega_y, omega_z, dt):
-        """Compute Jacobian matrix of the process model"""
+        """Compute Jacobian matrix of the process model
         
-        roll, pitch, yaw = self.state[0:3]
+        Fills the attitude rows of the preallocated F; the bias rows are
+        always [0 | I].
+        """
+        
+        roll, pitch = self.state[0:2].tolist()
         
         sin_roll = math.sin(roll)
         cos_roll = math.cos(roll)
@@ -273,79 +640,48 @@ class ICM20948_EKF:
         sec2_pitch = sec_pitch**2
         
         # Partial derivatives of the process model
-        F = np.eye(6)
-        
-        # d(roll_dot)/d(roll)
-        F[0, 0] = 1 + dt * (omega_y * cos_roll * tan_pitch - omega_z * sin_roll * tan_pitch)
-        # d(roll_dot)/d(pitch)  
-        F[0, 1] = dt * (omega_y * sin_roll * sec2_pitch + omega_z * cos_roll * sec2_pitch)
-        
-        # d(pitch_dot)/d(roll)
-        F[1, 0] = dt * (-omega_y * sin_roll - omega_z * cos_roll)
-        F[1, 1] = 1  # d(pitch_dot)/d(pitch)
-        
-        # d(yaw_dot)/d(roll)
-        F[2, 0] = dt * (omega_y * cos_roll * sec_pitch - omega_z * sin_roll * sec_pitch)
-        # d(yaw_dot)/d(pitch)
-        F[2, 1] = dt * (omega_y * sin_roll * sec_pitch * tan_pitch + omega_z * cos_roll * sec_pitch * tan_pitch)
-        F[2, 2] = 1  # d(yaw_dot)/d(yaw)
-        
-        # Derivatives w.r.t. biases
-        F[0, 3] = -dt  # d(roll_dot)/d(bias_x)
-        F[0, 4] = -dt * sin_roll * tan_pitch  # d(roll_dot)/d(bias_y)
-        F[0, 5] = -dt * cos_roll * tan_pitch  # d(roll_dot)/d(bias_z)
-        
-        F[1, 4] = -dt * cos_roll  # d(pitch_dot)/d(bias_y)
-        F[1, 5] = dt * sin_roll   # d(pitch_dot)/d(bias_z)
-        
-        F[2, 4] = -dt * sin_roll * sec_pitch  # d(yaw_dot)/d(bias_y)
-        F[2, 5] = -dt * cos_roll * sec_pitch  # d(yaw_dot)/d(bias_z)
-        
-        return F
+        roll_roll = 1 + dt * (omega_y * cos_roll * tan_pitch - omega_z * sin_roll * tan_pitch)
+        roll_pitch = dt * (omega_y * sin_roll * sec2_pitch + omega_z * cos_roll * sec2_pitch)
+        pitch_roll = dt * (-omega_y * sin_roll - omega_z * cos_roll)
+        yaw_roll = dt * (omega_y * cos_roll * sec_pitch - omega_z * sin_roll * sec_pitch)
+        yaw_pitch = dt * (omega_y * sin_roll * sec_pitch * tan_pitch + omega_z * cos_roll * sec_pitch * tan_pitch)
+        
+        # Rows: d(roll_dot), d(pitch_dot), d(yaw_dot) / d[roll, pitch, yaw, bias_x, bias_y, bias_z]
+        self._F[0:3] = (
+            (roll_roll, roll_pitch, 0.0, -dt, -dt * sin_roll * tan_pitch, -dt * cos_roll * tan_pitch),
+            (pitch_roll, 1.0, 0.0, 0.0, -dt * cos_roll, dt * sin_roll),
+            (yaw_roll, yaw_pitch, 1.0, 0.0, -dt * sin_roll * sec_pitch, -dt * cos_roll * sec_pitch),
+        )
+        
+        return self._F
     
     def update_accelerometer(self, accel_ned):
         """EKF Update Step - Use accelerometer data"""
         
         # Expected accelerometer measurement (gravity in body frame)
-        roll, pitch, yaw = self.state[0:3]
-        
-        # Predicted accelerometer measurement (gravity vector in NED rotated to body frame)
+        roll, pitch = self.state[0], self.state[1]
         g = 9.81  # Gravity magnitude
         
-        # Expected measurement (what accelerometer should read)
-        h_accel = np.array([
-            -g * math.sin(pitch),
-            g * math.sin(roll) * math.cos(pitch),
-            g * math.cos(roll) * math.cos(pitch)
-        ])
-        
-        # Measurement residual
-        z_accel = accel_ned * g  # Convert from g to m/s^2
-        y_accel = z_accel - h_accel
-        
-        # Compute measurement Jacobian (H matrix)
-        H_accel = np.zeros((3, 6))
-        
         cos_roll = math.cos(roll)
         sin_roll = math.sin(roll)
         cos_pitch = math.cos(pitch)
         sin_pitch = math.sin(pitch)
         
-        # Partial derivatives of h_accel w.r.t. state
-        H_accel[0, 1] = -g * cos_pitch  # d(h_x)/d(pitch)
-        
-        H_accel[1, 0] = g * cos_roll * cos_pitch   # d(h_y)/d(roll)
-        H_accel[1, 1] = -g * sin_roll * sin_pitch  # d(h_y)/d(pitch)
-        
-        H_accel[2, 0] = -g * sin_roll * cos_pitch  # d(h_z)/d(roll)
-        H_accel[2, 1] = -g * cos_roll * sin_pitch  # d(h_z)/d(pitch)
+        # Measurement residual: z - h, h = [-g sin(pitch), g sin(roll) cos(pitch), g cos(roll) cos(pitch)]
+        ax, ay, az = accel_ned.tolist()
+        y_accel = (ax * g + g * sin_pitch,
+                   ay * g - g * sin_roll * cos_pitch,
+                   az * g - g * cos_roll * cos_pitch)
         
-        # Kalman gain
-        S_accel = H_accel @ self.P @ H_accel.T + self.R_accel
-        K_accel = self.P @ H_accel.T @ np.linalg.inv(S_accel)
+        # Measurement Jacobian: only the d/d(roll) and d/d(pitch) columns are nonzero
+        H_accel = ((0.0, -g * cos_pitch),                                 # d(h_x)/d(roll, pitch)
+                   (g * cos_roll * cos_pitch, -g * sin_roll * sin_pitch),  # d(h_y)/d(roll, pitch)
+                   (-g * sin_roll * cos_pitch, -g * cos_roll * sin_pitch)) # d(h_z)/d(roll, pitch)
         
-        # State update
-        self.state += K_accel @ y_accel
+        if self.sequential_updates:
+            self.update_sequential_accelerometer(H_accel, y_accel)
+        else:
+            self.update_first_two_states(H_accel, y_accel, self.R_accel)
         
         # Normalize angles after update
         self.state[0] = self.normalize_angle(self.state[0])
@@ -354,10 +690,118 @@ class ICM20948_EKF:
         
         # Fix Euler angle ambiguities
         self.unwrap_euler_angles()
+    
+    def update_first_two_states(self, H, y, R):
+        """Kalman update for a 3-D measurement that only observes states 0 and 1
+        
+        H holds the nonzero (3, 2) block of the (3, 6) Jacobian and y the
+        residual, both as floats. With C = P[:, 0:2], the gain is
+        K = C W with W = Hᵀ S⁻¹ (2x3), so the update reduces to
+            state += C (W y)
+            P -= C (W H) Cᵀ
+        which equals the Joseph form for this optimal gain. S is inverted in
+        closed form; the 6x6 work stays in preallocated buffers.
+        """
+        (h00, h01), (h10, h11), (h20, h21) = H
+        y0, y1, y2 = y
+        P = self.P
+        (p00, p01), (_, p11) = P[0:2, 0:2].tolist()
+        (r00, r01, r02), (_, r11, r12), (_, _, r22) = R.tolist()
+        
+        # P₂ hᵢ for each measurement row (P₂ = observed 2x2 block)
+        a0, b0 = p00 * h00 + p01 * h01, p01 * h00 + p11 * h01
+        a1, b1 = p00 * h10 + p01 * h11, p01 * h10 + p11 * h11
+        a2, b2 = p00 * h20 + p01 * h21, p01 * h20 + p11 * h21
+        
+        # S = H P₂ Hᵀ + R (symmetric) and its inverse
+        s00, s01, s02 = h00 * a0 + h01 * b0 + r00, h00 * a1 + h01 * b1 + r01, h00 * a2 + h01 * b2 + r02
+        s11, s12 = h10 * a1 + h11 * b1 + r11, h10 * a2 + h11 * b2 + r12
+        s22 = h20 * a2 + h21 * b2 + r22
+        i00, i01, i02, i11, i12, i22 = invert_symmetric_3x3(s00, s01, s02, s11, s12, s22)
+        
+        # W = Hᵀ S⁻¹
+        w00 = h00 * i00 + h10 * i01 + h20 * i02
+        w01 = h00 * i01 + h10 * i11 + h20 * i12
+        w02 = h00 * i02 + h10 * i12 + h20 * i22
+        w10 = h01 * i00 + h11 * i01 + h21 * i02
+        w11 = h01 * i01 + h11 * i11 + h21 * i12
+        w12 = h01 * i02 + h11 * i12 + h21 * i22
+        
+        # State update: K y = C (W y)
+        u = self._gain_u
+        u[0] = w00 * y0 + w01 * y1 + w02 * y2
+        u[1] = w10 * y0 + w11 * y1 + w12 * y2
+        C = P[:, 0:2]
+        self.state += np.matmul(C, u, out=self._dx)
+        
+        # Covariance update: P -= C (W H) Cᵀ
+        M = self._gain_M
+        M[0, 0] = w00 * h00 + w01 * h10 + w02 * h20
+        M[0, 1] = M[1, 0] = w00 * h01 + w01 * h11 + w02 * h21
+        M[1, 1] = w10 * h01 + w11 * h11 + w12 * h21
+        np.dot(np.dot(C, M, out=self._PM), C.T, out=self._P_work)
+        P -= self._P_work
+    
+    def update_sequential_accelerometer(self, H, y):
+        """Accelerometer update as scalar measurements when R_accel is diagonal
         
-        # Covariance update
-        I_KH = np.eye(6) - K_accel @ H_accel
-        self.P = I_KH @ self.P @ I_KH.T + K_accel @ self.R_accel @ K_accel.T
+        Falls back to update_first_two_states() for correlated axis noise.
+        """
+        (r00, r01, r02), (_, r11, r12), (_, _, r22) = self.R_accel.tolist()
+        if r01 or r02 or r12:
+            self.update_first_two_states(H, y, self.R_accel)
+            return
+        (h00, h01), (h10, h11), (h20, h21) = H
+        self.update_sequential(((h00, h01, 0.0), (h10, h11, 0.0), (h20, h21, 0.0)), y, (r00, r11, r22))
+    
+    def update_sequential(self, H, y, variances):
+        """Kalman update as a sequence of scalar measurements of the attitude states
+        
+        Each row h of H holds the coefficients of states 0-2 for one
+        measurement with its own noise variance r. A scalar update needs no
+        inverse, only a division by s = hᵀ P h + r and a rank-1 downdate.
+        Every downdate lies in the span of C = P[:, 0:3], so after the scalars
+        seen so far P = P₀ - C M Cᵀ and the state moved by C u; each scalar
+        only updates the 3-vector u and the 3x3 matrix M:
+            g = A h,  a = h - M g,  s = g·a + r     (A = P₀[0:3, 0:3])
+            u += a (residual - g·u) / s,  M += a aᵀ / s
+        and the 6x6 work is done once at the end in preallocated buffers.
+        Residuals stay linearized about the prior state, so for uncorrelated
+        noise the result equals the batch update.
+        """
+        P = self.P
+        (p00, p01, p02), (_, p11, p12), (_, _, p22) = P[0:3, 0:3].tolist()
+        m00 = m01 = m02 = m11 = m12 = m22 = 0.0
+        u0 = u1 = u2 = 0.0
+        for (h0, h1, h2), residual, r in zip(H, y, variances):
+            g0 = p00 * h0 + p01 * h1 + p02 * h2
+            g1 = p01 * h0 + p11 * h1 + p12 * h2
+            g2 = p02 * h0 + p12 * h1 + p22 * h2
+            a0 = h0 - (m00 * g0 + m01 * g1 + m02 * g2)
+            a1 = h1 - (m01 * g0 + m11 * g1 + m12 * g2)
+            a2 = h2 - (m02 * g0 + m12 * g1 + m22 * g2)
+            inv_s = 1.0 / (g0 * a0 + g1 * a1 + g2 * a2 + r)
+            c = (residual - g0 * u0 - g1 * u1 - g2 * u2) * inv_s
+            u0 += a0 * c
+            u1 += a1 * c
+            u2 += a2 * c
+            b0, b1, b2 = a0 * inv_s, a1 * inv_s, a2 * inv_s
+            m00 += a0 * b0
+            m01 += a0 * b1
+            m02 += a0 * b2
+            m11 += a1 * b1
+            m12 += a1 * b2
+            m22 += a2 * b2
+        
+        # State update: C u; covariance update: P -= C M Cᵀ
+        u = self._seq_u
+        u[:] = (u0, u1, u2)
+        C = P[:, 0:3]
+        self.state += np.matmul(C, u, out=self._dx)
+        M = self._seq_M
+        M[:] = ((m00, m01, m02), (m01, m11, m12), (m02, m12, m22))
+        np.dot(np.dot(C, M, out=self._seq_PM), C.T, out=self._P_work)
+        P -= self._P_work
     
     def update_magnetometer(self, mag_ned):
         """EKF Update Step - Use magnetometer data"""
@@ -365,6 +809,17 @@ class ICM20948_EKF:
         if np.linalg.norm(mag_ned) < 1.0:  # Skip if magnetometer data is invalid
             return
         
+        if self.sequential_updates:
+            # Yaw is observed directly: a single scalar update
+            yaw_measured = math.atan2(mag_ned[1], mag_ned[0]) + math.radians(self.magnetic_declination)
+            y_yaw = self.normalize_angle(yaw_measured - float(self.state[2]))
+            self.update_sequential(((0.0, 0.0, 1.0),), (y_yaw,), (float(self.R_mag[0, 0]),))
+            self.state[0] = self.normalize_angle(self.state[0])
+            self.state[1] = self.normalize_angle(self.state[1])
+            self.state[2] = self.normalize_angle(self.state[2])
+            self.unwrap_euler_angles()
+            return
+        
         roll, pitch, yaw = self.state[0:3]
         
         # Earth's magnetic field in NED frame (approximate)
@@ -448,7 +903,7 @@ class ICM20948_EKF:
         This resolves the issue where roll/pitch flip to ±180° representation
         after figure-8 movements when the sensor should return to ~0°.
         """
-        roll, pitch, yaw = self.state[0:3]
+        roll, pitch, yaw = self.state[0:3].tolist()
         
         # Threshold for detecting "flipped" angles (close to ±180°)
         flip_threshold = math.radians(150)  # 150 degrees
@@ -540,32 +995,69 @@ class ICM20948_EKF:
         print("(°)   (°)    (°)           (°/s) (°/s) (°/s)       (°)  (°)   (°)")
         print("-" * 75)
         
-        last_time = time.time()
+        if self.threaded:
+            self._run_threaded()
+            return
+        
+        if self.use_fifo:
+            self.imu.enable_fifo()
+            print(f"📥 FIFO mode: every sample at {self.imu.config.gyro_odr_hz:.1f} Hz, sensor-clock dt")
+        else:
+            if self.scheduler is None:
+                self.scheduler = MultiRateScheduler(self.imu)
+            pacing = "DATA_RDY interrupt" if self.imu.interrupt is not None else "sleep"
+            print(f"⏱️  Multi-rate reads: accel/gyro at {self.scheduler.imu_rate_hz:.1f} Hz, "
+                  f"magnetometer at {self.scheduler.mag_rate_hz:.1f} Hz ({pacing} paced)")
+        start_time = time.time()
+        last_display = 0.0
         
         try:
             while True:
-                current_time = time.time()
-                dt = current_time - last_time
-                last_time = current_time
-                
-                if dt <= 0:
+                if self.use_fifo:
+                    # Predict on every FIFO sample with exact dt
+                    count = self.recovery.call(self.process_sample_batch)
+                    if count is None:
+                        self.predict_through_outage()
+                        time.sleep(0.02)
+                        continue
+                    self.recovery.check_magnetometer(self.last_mag_valid)
+                    if count == 0 or not self.initialized:
+                        self.imu.wait_for_data(0.02)
+                        continue
+                    self.checkpoint_if_due()
+                    
+                    # Redraw at display_interval; with an interrupt the loop wakes at the ODR
+                    now = time.time()
+                    if now - last_display >= self.display_interval:
+                        last_display = now
+                        orientation = self.get_orientation_degrees()
+                        biases = self.get_gyro_biases_degrees()
+                        uncertainty = self.get_uncertainty()
+                        
+                        print(f"{orientation['roll']:+5.1f} {orientation['pitch']:+5.1f} {orientation['yaw']:+6.1f}     "
+                              f"{biases['bias_x']:+5.2f} {biases['bias_y']:+5.2f} {biases['bias_z']:+5.2f}     "
+                              f"{uncertainty['roll_std']:4.1f} {uncertainty['pitch_std']:4.1f} {uncertainty['yaw_std']:5.1f}", 
+                              end="\r")
+                    
+                    self.imu.wait_for_data(0.02)  # Drain well before the FIFO fills
                     continue
                 
-                # Get calibrated sensor data
-                accel_ned, gyro_ned, mag_ned, mag_valid = self.apply_calibration_and_transform()
-                
-                # Initialize EKF on first iteration
-                if not self.initialized:
-                    self.initialize_state(accel_ned, mag_ned, mag_valid)
+                # Predict on every scheduled sample, update on the batch and fresh magnetometer data
+                count = self.recovery.call(self.process_scheduled_batch)
+                if count is None:
+                    # Sensor outage: keep predicting on the last good gyro sample
+                    self.predict_through_outage()
+                    time.sleep(0.05)
                     continue
+                self.recovery.check_magnetometer(self.last_mag_valid)
+                if count == 0 or not self.initialized:
+                    continue
+                self.checkpoint_if_due()
                 
-                # EKF Predict step
-                self.predict(gyro_ned, dt)
-                
-                # EKF Update steps
-                self.update_accelerometer(accel_ned)
-                if mag_valid:
-                    self.update_magnetometer(mag_ned)
+                now = time.time()
+                if now - last_display < self.display_interval:
+                    continue
+                last_display = now
                 
                 # Get results
                 orientation = self.get_orientation_degrees()
@@ -578,14 +1070,84 @@ class ICM20948_EKF:
                       f"{uncertainty['roll_std']:4.1f} {uncertainty['pitch_std']:4.1f} {uncertainty['yaw_std']:5.1f}", 
                       end="\r")
                 
-                time.sleep(0.05)  # 20Hz update rate
-                
         except KeyboardInterrupt:
             print("\n\n🎯 EKF stopped!")
             print(f"\n📊 Final Results:")
             print(f"   Orientation: Roll={orientation['roll']:+5.1f}°, Pitch={orientation['pitch']:+5.1f}°, Yaw={orientation['yaw']:+6.1f}°")
             print(f"   Gyro Biases: X={biases['bias_x']:+5.2f}°/s, Y={biases['bias_y']:+5.2f}°/s, Z={biases['bias_z']:+5.2f}°/s")
             print(f"   Uncertainty: Roll=±{uncertainty['roll_std']:4.1f}°, Pitch=±{uncertainty['pitch_std']:4.1f}°, Yaw=±{uncertainty['yaw_std']:5.1f}°")
+            if self.time_to_first_estimate_s is not None:
+                print(f"   Boot latency: {self.time_to_first_estimate_s * 1000:.0f} ms to first estimate "
+                      f"(sensor init {self.imu.init_timings.get('total', 0.0) * 1000:.0f} ms)")
+            if self.use_fifo and self.imu.sample_clock is not None:
+                print(f"   Sensor ODR:  {self.imu.sample_clock.odr_hz:.2f} Hz measured, "
+                      f"{self.imu.fifo_overflows} FIFO overflows")
+            if self.scheduler is not None:
+                self.scheduler.print_statistics(time.time() - start_time)
+            self.recovery.print_statistics()
+        
+        finally:
+            if self.use_fifo:
+                try:
+                    self.imu.disable_fifo()
+                except OSError:
+                    pass
+            if self.save_checkpoint():
+                print(f"💾 EKF state saved to {self.checkpoint_file}")
+    
+    def _run_threaded(self):
+        """EKF loop fed by an acquisition thread through a ring buffer
+        
+        Reading, filtering and printing are decoupled: a slow terminal update
+        only delays this consumer, never the next sensor read.
+        """
+        ring = SampleRingBuffer()
+        reader = ring.reader()
+        producer = AcquisitionThread(self.imu, ring, use_fifo=self.use_fifo)
+        producer.start()
+        print(f"🧵 Acquisition thread: {'FIFO' if self.use_fifo else 'burst'} reads "
+              f"at {self.imu.sample_rate_hz:.1f} Hz")
+        
+        last_display = 0.0
+        try:
+            while True:
+                if not reader.wait(0.05):
+                    if producer.recovery.in_outage:
+                        self.predict_through_outage()
+                    continue
+                if self.process_ring_batch(reader.read()) == 0 or not self.initialized:
+                    continue
+                self.checkpoint_if_due()
+                
+                now = time.time()
+                if now - last_display < self.display_interval:
+                    continue
+                last_display = now
+                
+                orientation = self.get_orientation_degrees()
+                biases = self.get_gyro_biases_degrees()
+                uncertainty = self.get_uncertainty()
+                
+                print(f"{orientation['roll']:+5.1f} {orientation['pitch']:+5.1f} {orientation['yaw']:+6.1f}     "
+                      f"{biases['bias_x']:+5.2f} {biases['bias_y']:+5.2f} {biases['bias_z']:+5.2f}     "
+                      f"{uncertainty['roll_std']:4.1f} {uncertainty['pitch_std']:4.1f} {uncertainty['yaw_std']:5.1f}", 
+                      end="\r")
+                
+        except KeyboardInterrupt:
+            print("\n\n🎯 EKF stopped!")
+            orientation = self.get_orientation_degrees()
+            biases = self.get_gyro_biases_degrees()
+            print(f"\n📊 Final Results:")
+            print(f"   Orientation: Roll={orientation['roll']:+5.1f}°, Pitch={orientation['pitch']:+5.1f}°, Yaw={orientation['yaw']:+6.1f}°")
+            print(f"   Gyro Biases: X={biases['bias_x']:+5.2f}°/s, Y={biases['bias_y']:+5.2f}°/s, Z={biases['bias_z']:+5.2f}°/s")
+            print(f"   Acquisition: {ring.written} samples, {producer.read_errors} read errors, "
+                  f"{reader.dropped} dropped by the filter")
+            producer.recovery.print_statistics()
+        
+        finally:
+            producer.stop()
+            if self.save_checkpoint():
+                print(f"💾 EKF state saved to {self.checkpoint_file}")
     
     def close(self):
         """Close sensor connection"""
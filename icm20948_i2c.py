@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+ICM20948 I2C_RDWR Bus Backend
+Combined write-then-read I2C messages through the Linux i2c-dev I2C_RDWR ioctl
+
+A register read normally costs separate ioctls for the bank select write and
+the pointer-write/block-read pair. Here the bank select, register pointer
+and block read go to the kernel as one batch of i2c_msg structures (with
+repeated starts), so a sample costs one syscall. Reads land in a
+preallocated buffer and no memory is allocated per transaction.
+
+The class is a drop-in for smbus.SMBus (write_byte_data, read_byte_data,
+read_i2c_block_data, close) and adds read_banked_block() used by
+ICM20948_RegisterBus.
+"""
+
+import os
+import fcntl
+import ctypes
+
+# linux/i2c-dev.h, linux/i2c.h
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+
+# Kernel limit per i2c_msg is 8192 bytes; the ICM20948 FIFO is far smaller
+MAX_READ_LENGTH = 4096
+
+REG_BANK_SEL = 0x7F
+
+class i2c_msg(ctypes.Structure):
+    _fields_ = [('addr', ctypes.c_uint16),
+                ('flags', ctypes.c_uint16),
+                ('len', ctypes.c_uint16),
+                ('buf', ctypes.POINTER(ctypes.c_uint8))]
+
+class i2c_rdwr_ioctl_data(ctypes.Structure):
+    _fields_ = [('msgs', ctypes.POINTER(i2c_msg)),
+                ('nmsgs', ctypes.c_uint32)]
+
+class I2CRdwrBus:
+    """smbus-compatible I2C bus issuing batched I2C_RDWR transactions"""
+
+    # Largest single block read (ICM20948_RegisterBus uses this to size FIFO drains)
+    max_block_length = MAX_READ_LENGTH
+
+    def __init__(self, bus=1):
+        self.bus_num = bus
+        self.fd = os.open(f"/dev/i2c-{bus}", os.O_RDWR)
+        self.ioctl_calls = 0
+
+        # Preallocated message buffers
+        self._bank_buf = (ctypes.c_uint8 * 2)(REG_BANK_SEL, 0)
+        self._write_buf = (ctypes.c_uint8 * 2)()
+        self._read_buf = (ctypes.c_uint8 * MAX_READ_LENGTH)()
+        self._read_view = memoryview(self._read_buf).cast('B')
+
+        self._msgs = (i2c_msg * 3)()
+        self._ioctl_data = i2c_rdwr_ioctl_data(self._msgs, 0)
+        self._ioctl_arg = ctypes.addressof(self._ioctl_data)
+
+    def _set_msg(self, index, address, flags, length, buf):
+        msg = self._msgs[index]
+        msg.addr = address
+        msg.flags = flags
+        msg.len = length
+        msg.buf = ctypes.cast(buf, ctypes.POINTER(ctypes.c_uint8))
+
+    def _transfer(self, nmsgs):
+        self._ioctl_data.nmsgs = nmsgs
+        fcntl.ioctl(self.fd, I2C_RDWR, self._ioctl_arg)
+        self.ioctl_calls += 1
+
+    def write_byte_data(self, address, register, value):
+        """Write one register (single message)"""
+        self._write_buf[0] = register
+        self._write_buf[1] = value
+        self._set_msg(0, address, 0, 2, self._write_buf)
+        self._transfer(1)
+
+    def read_banked_block(self, address, bank, register, length):
+        """Optionally select a bank, then read length bytes from register, in one ioctl
+
+        bank=None skips the bank select message. Returns a memoryview into the
+        preallocated read buffer; it is only valid until the next read.
+        """
+        if length > MAX_READ_LENGTH:
+            raise ValueError(f"Read length {length} exceeds {MAX_READ_LENGTH} bytes")
+
+        index = 0
+        if bank is not None:
+            self._bank_buf[1] = bank << 4
+            self._set_msg(index, address, 0, 2, self._bank_buf)
+            index += 1
+
+        self._write_buf[0] = register
+        self._set_msg(index, address, 0, 1, self._write_buf)
+        self._set_msg(index + 1, address, I2C_M_RD, length, self._read_buf)
+        self._transfer(index + 2)
+
+        return self._read_view[:length]
+
+    def read_byte_data(self, address, register):
+        """Read one register (pointer write + read, one ioctl)"""
+        return self.read_banked_block(address, None, register, 1)[0]
+
+    def read_i2c_block_data(self, address, register, length):
+        """Read a register block (pointer write + read, one ioctl), as a list like smbus"""
+        return list(self.read_banked_block(address, None, register, length))
+
+    def close(self):
+        """Close the i2c-dev file"""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Interrupt Sources
+Lets acquisition block on the ICM20948 INT pin instead of polling with time.sleep
+
+- GPIOChipInterrupt: INT pin through the Linux GPIO character device (/dev/gpiochipN)
+- SoftwareInterrupt: software fake firing at a fixed rate or on trigger(), for testing
+
+Both return the host time of the edge (time.monotonic_ns) from wait(),
+or None on timeout.
+"""
+
+import os
+import time
+import fcntl
+import select
+import struct
+import threading
+
+# Linux GPIO character device ABI (v1 line events, linux/gpio.h)
+GPIO_GET_LINEEVENT_IOCTL = 0xC030B404       # _IOWR(0xB4, 0x04, struct gpioevent_request)
+GPIOHANDLE_REQUEST_INPUT = 1 << 0
+GPIOEVENT_REQUEST_RISING_EDGE = 1 << 0
+GPIOEVENT_REQUEST_FALLING_EDGE = 1 << 1
+GPIOEVENT_REQUEST_FORMAT = "<III32si"       # lineoffset, handleflags, eventflags, label, fd
+GPIOEVENT_DATA_FORMAT = "<QI4x"             # timestamp (ns), id, padding
+GPIOEVENT_DATA_SIZE = struct.calcsize(GPIOEVENT_DATA_FORMAT)
+
+class InterruptSource:
+    """Interface for something that signals ICM20948 data-ready events"""
+
+    def wait(self, timeout=None):
+        """Block until the next interrupt; return its monotonic_ns time or None on timeout"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the interrupt source"""
+        pass
+
+class GPIOChipInterrupt(InterruptSource):
+    """ICM20948 INT pin read through the Linux GPIO character device"""
+
+    def __init__(self, line, chip="/dev/gpiochip0", rising=True, consumer="icm20948-int"):
+        self.line = line
+        self.chip = chip
+        self.event_fd = None
+
+        eventflags = GPIOEVENT_REQUEST_RISING_EDGE if rising else GPIOEVENT_REQUEST_FALLING_EDGE
+        request = bytearray(struct.pack(GPIOEVENT_REQUEST_FORMAT, line, GPIOHANDLE_REQUEST_INPUT,
+                                        eventflags, consumer.encode()[:31], 0))
+
+        chip_fd = os.open(chip, os.O_RDONLY)
+        try:
+            fcntl.ioctl(chip_fd, GPIO_GET_LINEEVENT_IOCTL, request, True)
+        finally:
+            os.close(chip_fd)
+
+        self.event_fd = struct.unpack(GPIOEVENT_REQUEST_FORMAT, request)[4]
+        os.set_blocking(self.event_fd, False)
+
+        self.poller = select.poll()
+        self.poller.register(self.event_fd, select.POLLIN | select.POLLPRI)
+        self.events = 0
+
+    def _drain_events(self):
+        """Read all queued edge events, return how many were consumed"""
+        count = 0
+        while True:
+            try:
+                data = os.read(self.event_fd, GPIOEVENT_DATA_SIZE * 16)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            count += len(data) // GPIOEVENT_DATA_SIZE
+        return count
+
+    def wait(self, timeout=None):
+        """Block on the INT edge; queued edges collapse into one wake-up"""
+        if self._drain_events():
+            self.events += 1
+            return time.monotonic_ns()
+
+        timeout_ms = None if timeout is None else max(0, int(timeout * 1000))
+        if not self.poller.poll(timeout_ms):
+            return None
+
+        timestamp = time.monotonic_ns()
+        self._drain_events()
+        self.events += 1
+        return timestamp
+
+    def close(self):
+        """Release the GPIO line"""
+        if self.event_fd is not None:
+            os.close(self.event_fd)
+            self.event_fd = None
+
+class SoftwareInterrupt(InterruptSource):
+    """Software fake interrupt: fires at rate_hz and/or whenever trigger() is called"""
+
+    def __init__(self, rate_hz=None):
+        self.period_ns = int(1e9 / rate_hz) if rate_hz else None
+        self.next_edge_ns = time.monotonic_ns() + self.period_ns if self.period_ns else None
+        self.condition = threading.Condition()
+        self.pending = 0
+        self.events = 0
+
+    def trigger(self):
+        """Fire one interrupt (e.g. from a simulated sensor)"""
+        with self.condition:
+            self.pending += 1
+            self.condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until the next periodic edge or trigger()"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self.condition:
+            while True:
+                if self.pending:
+                    self.pending = 0
+                    self.events += 1
+                    return time.monotonic_ns()
+
+                now_ns = time.monotonic_ns()
+                if self.next_edge_ns is not None and now_ns >= self.next_edge_ns:
+                    # Missed edges collapse into one wake-up, like a real edge queue drain
+                    missed = (now_ns - self.next_edge_ns) // self.period_ns + 1
+                    self.next_edge_ns += missed * self.period_ns
+                    self.events += 1
+                    return now_ns
+
+                wait_s = None
+                if self.next_edge_ns is not None:
+                    wait_s = (self.next_edge_ns - now_ns) / 1e9
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    wait_s = remaining if wait_s is None else min(wait_s, remaining)
+
+                self.condition.wait(wait_s)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Multiplicative (Error-State) Quaternion EKF
+Drop-in alternative to ICM20948_EKF without the Euler angle singularity
+
+Attitude: unit quaternion q (body → NED), integrated from the gyroscope
+Error state: [dθ_north, dθ_east, dθ_down, bias_x, bias_y, bias_z]
+- dθ is a small NED-frame rotation; each update folds it into q and resets
+  it to zero, so state[0:3] is always zero between steps
+- No tan(pitch)/sec(pitch) in the kinematics, no angle wrapping or
+  unwrap_euler_angles(); Euler angles are computed only on request
+- Same sensor I/O, calibration, warm start and run loops as ICM20948_EKF;
+  get_uncertainty() reports the north/east/down attitude errors, which are
+  roll/pitch/yaw near level
+
+Usage:
+    ekf = ICM20948_MEKF("icm20948_raw_calibration.json")
+    ekf.initialize()
+    ekf.run_ekf()
+"""
+
+import math
+import sys
+import numpy as np
+
+try:
+    from icm20948_ekf import ICM20948_EKF
+except ImportError:
+    print("ERROR: Could not import ICM20948_EKF")
+    print("Make sure icm20948_ekf.py is in the same directory")
+    sys.exit(1)
+
+def quaternion_multiply(a, b):
+    """Hamilton product a ⊗ b of (w, x, y, z) quaternions"""
+    aw, ax, ay, az = a
+    bw, bx, by, bz = b
+    return (aw * bw - ax * bx - ay * by - az * bz,
+            aw * bx + ax * bw + ay * bz - az * by,
+            aw * by - ax * bz + ay * bw + az * bx,
+            aw * bz + ax * by - ay * bx + az * bw)
+
+def quaternion_from_rotation_vector(x, y, z):
+    """Quaternion for a rotation of |(x, y, z)| radians about (x, y, z)"""
+    angle = math.sqrt(x * x + y * y + z * z)
+    if angle < 1e-9:
+        return (1.0, 0.5 * x, 0.5 * y, 0.5 * z)  # First order, renormalized by the caller
+    s = math.sin(0.5 * angle) / angle
+    return (math.cos(0.5 * angle), x * s, y * s, z * s)
+
+def quaternion_normalize(q):
+    """Scale q back to unit length"""
+    w, x, y, z = q
+    n = 1.0 / math.sqrt(w * w + x * x + y * y + z * z)
+    return (w * n, x * n, y * n, z * n)
+
+def quaternion_from_euler(roll, pitch, yaw):
+    """Quaternion (body → NED) from ZYX Euler angles in radians"""
+    cr, sr = math.cos(0.5 * roll), math.sin(0.5 * roll)
+    cp, sp = math.cos(0.5 * pitch), math.sin(0.5 * pitch)
+    cy, sy = math.cos(0.5 * yaw), math.sin(0.5 * yaw)
+    return (cr * cp * cy + sr * sp * sy,
+            sr * cp * cy - cr * sp * sy,
+            cr * sp * cy + sr * cp * sy,
+            cr * cp * sy - sr * sp * cy)
+
+def quaternion_to_rotation_matrix(q):
+    """Rotation matrix (body → NED) for a unit quaternion"""
+    w, x, y, z = q
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - w * z), 2 * (x * z + w * y)],
+        [2 * (x * y + w * z), 1 - 2 * (x * x + z * z), 2 * (y * z - w * x)],
+        [2 * (x * z - w * y), 2 * (y * z + w * x), 1 - 2 * (x * x + y * y)]
+    ])
+
+def quaternion_to_euler(q):
+    """ZYX Euler angles (roll, pitch, yaw) in radians"""
+    w, x, y, z = q
+    roll = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = math.asin(max(-1.0, min(1.0, 2 * (w * y - x * z))))
+    yaw = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return roll, pitch, yaw
+
+class ICM20948_MEKF(ICM20948_EKF):
+    """Quaternion attitude with a 6-state error covariance (same interface as ICM20948_EKF)"""
+
+    def __init__(self, *args, **kwargs):
+        self.q = (1.0, 0.0, 0.0, 0.0)  # Attitude, body → NED
+        super().__init__(*args, **kwargs)
+
+    def initial_orientation(self, accel_ned, mag_ned, mag_valid):
+        """Roll, pitch from the accelerometer, yaw from the magnetometer heading"""
+        roll, pitch, _ = super().initial_orientation(accel_ned, mag_ned, mag_valid)
+        yaw = 0.0
+        if mag_valid and np.linalg.norm(mag_ned) > 1.0:
+            yaw = self.heading_error(quaternion_to_rotation_matrix(quaternion_from_euler(roll, pitch, 0.0)),
+                                     mag_ned)
+        return roll, pitch, yaw
+
+    def set_orientation(self, roll, pitch, yaw):
+        """Set the attitude quaternion; the error states start at zero"""
+        self.q = quaternion_from_euler(roll, pitch, yaw)
+        self.state[0:3] = 0.0
+
+    def predict(self, gyro_ned, dt):
+        """Integrate the bias-corrected rate into q and propagate the error covariance; returns F"""
+        if dt <= 0:
+            return
+
+        bias_x, bias_y, bias_z = self.state[3:6].tolist()
+        omega_x = (float(gyro_ned[0]) - bias_x) * dt
+        omega_y = (float(gyro_ned[1]) - bias_y) * dt
+        omega_z = (float(gyro_ned[2]) - bias_z) * dt
+        self.q = quaternion_normalize(quaternion_multiply(
+            self.q, quaternion_from_rotation_vector(omega_x, omega_y, omega_z)))
+
+        # NED-frame attitude error only grows through the bias error: dθ' = dθ - R db dt,
+        # so F = [[I, -R dt], [0, I]] and only its top-right block changes
+        w, x, y, z = self.q
+        k = -2.0 * dt
+        self._F[0:3, 3:6] = (
+            (-dt + k * (-y * y - z * z), k * (x * y - w * z), k * (x * z + w * y)),
+            (k * (x * y + w * z), -dt + k * (-x * x - z * z), k * (y * z - w * x)),
+            (k * (x * z - w * y), k * (y * z + w * x), -dt + k * (-x * x - y * y)),
+        )
+        self.propagate_covariance(dt)
+        return self._F
+
+    def update_accelerometer(self, accel_ned):
+        """Gravity update: h = Rᵀ g, H = Rᵀ [g×] with respect to the NED-frame error"""
+        g = 9.81
+        r0, r1, r2 = quaternion_to_rotation_matrix(self.q).tolist()
+
+        # Expected measurement: gravity (0, 0, g) in the body frame is g × the third row of R
+        ax, ay, az = accel_ned.tolist()
+        y_accel = (ax * g - g * r2[0], ay * g - g * r2[1], az * g - g * r2[2])
+
+        # Only the north/east error columns are nonzero: H[:, 0] = g R[1, :], H[:, 1] = -g R[0, :]
+        H_accel = ((g * r1[0], -g * r0[0]),
+                   (g * r1[1], -g * r0[1]),
+                   (g * r1[2], -g * r0[2]))
+
+        if self.sequential_updates:
+            self.update_sequential_accelerometer(H_accel, y_accel)
+        else:
+            self.update_first_two_states(H_accel, y_accel, self.R_accel)
+        self.reset_attitude_error()
+
+    def update_magnetometer(self, mag_ned):
+        """Heading update: yaw error from the field rotated into the NED frame"""
+        if np.linalg.norm(mag_ned) < 1.0:  # Skip if magnetometer data is invalid
+            return
+
+        # A NED-frame rotation about Down changes yaw one-to-one
+        y_yaw = self.heading_error(quaternion_to_rotation_matrix(self.q), mag_ned)
+
+        if self.sequential_updates:
+            self.update_sequential(((0.0, 0.0, 1.0),), (y_yaw,), (float(self.R_mag[0, 0]),))
+            self.reset_attitude_error()
+            return
+
+        S_yaw = self.P[2, 2] + self.R_mag[0, 0]
+        K_yaw = self.P[:, 2] / S_yaw
+
+        self.state += K_yaw * y_yaw
+        self.reset_attitude_error()
+
+        # Covariance update
+        self.P = self.P - np.outer(K_yaw, self.P[2, :])
+
+    def heading_error(self, R, mag_ned):
+        """Rotation about Down (radians) that aligns the measured field with magnetic north"""
+        north = R[0, 0] * mag_ned[0] + R[0, 1] * mag_ned[1] + R[0, 2] * mag_ned[2]
+        east = R[1, 0] * mag_ned[0] + R[1, 1] * mag_ned[1] + R[1, 2] * mag_ned[2]
+        return self.normalize_angle(math.radians(self.magnetic_declination) - math.atan2(east, north))
+
+    def reset_attitude_error(self):
+        """Fold the attitude error dθ = state[0:3] into q and reset it to zero"""
+        dx, dy, dz = self.state[0:3].tolist()
+        self.q = quaternion_normalize(quaternion_multiply(
+            quaternion_from_rotation_vector(dx, dy, dz), self.q))
+        self.state[0:3] = 0.0
+
+    def get_orientation_degrees(self):
+        """Get current orientation estimate in degrees"""
+        roll, pitch, yaw = quaternion_to_euler(self.q)
+        return {
+            'roll': math.degrees(roll),
+            'pitch': math.degrees(pitch),
+            'yaw': math.degrees(yaw)
+        }
+
+def main():
+    """Main function"""
+    ekf = ICM20948_MEKF()
+
+    try:
+        if not ekf.initialize():
+            print("\n❌ Failed to initialize. Make sure:")
+            print("   1. ICM20948 is connected and working")
+            print("   2. Calibration file exists (run calibrate_raw_sensors.py)")
+            return
+
+        print("\n🚀 QUATERNION (MULTIPLICATIVE) EKF:")
+        print("✅ No gimbal lock at ±90° pitch")
+        print("✅ No angle wrapping or Euler unwrapping")
+        print("✅ Automatic gyroscope bias estimation and correction")
+
+        ekf.run_ekf()
+
+    except Exception as e:
+        print(f"\n❌ Error: {e}")
+
+    finally:
+        ekf.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Multi-IMU Manager
+Finds every ICM20948 on the configured I2C buses (0x68 and 0x69 on each),
+reads them with one worker thread per physical bus and hands out
+time-aligned sample sets
+
+All workers share one tick grid (start time + k * period). On each tick a
+worker burst-reads every device on its bus, so devices on different buses
+are sampled in parallel and devices on the same bus back to back. A sample
+set is complete when every bus has reported the same tick; its skew is the
+spread of the per-bus read times.
+
+Usage:
+    manager = ICM20948_Manager(buses=[1, 3])
+    manager.open()
+    manager.start(rate_hz=200)
+    sample_set = manager.read_set()   # SampleSet(tick, timestamp_ns, samples, skew_ns)
+"""
+
+import time
+import threading
+from collections import namedtuple, OrderedDict
+
+from icm20948_ned_corrected import ICM20948_NED_Corrected
+from icm20948_registers import REG_BANK_SEL
+
+ICM20948_ADDRESSES = (0x68, 0x69)     # AD0 low, AD0 high
+WHO_AM_I_REG = 0x00
+WHO_AM_I_EXPECTED = 0xEA
+
+# Ticks kept per bus while waiting for slower buses to catch up
+TICK_HISTORY = 32
+
+# One time-aligned set: samples maps (bus, address) → RawSample (None on a read error)
+SampleSet = namedtuple('SampleSet', ['tick', 'timestamp_ns', 'samples', 'skew_ns'])
+
+def probe_icm20948(bus, addresses=ICM20948_ADDRESSES):
+    """Return the addresses on an open bus that answer WHO_AM_I with 0xEA
+
+    Other parts share 0x68 (RTCs, MPU-6050s), so nothing is written until the
+    device looks like an ICM20948: either register 0x00 already reads 0xEA,
+    or REG_BANK_SEL reads back as another bank (only bits 4-5 set), as for
+    an ICM20948 left outside bank 0. Bank 0 is then selected and WHO_AM_I
+    read again.
+    """
+    found = []
+    for address in addresses:
+        try:
+            if bus.read_byte_data(address, WHO_AM_I_REG) != WHO_AM_I_EXPECTED:
+                bank_select = bus.read_byte_data(address, REG_BANK_SEL)
+                if bank_select == 0x00 or bank_select & ~0x30:
+                    continue  # Bank 0 already, or not an ICM20948 REG_BANK_SEL value
+            bus.write_byte_data(address, REG_BANK_SEL, 0x00)  # WHO_AM_I is in bank 0
+            if bus.read_byte_data(address, WHO_AM_I_REG) == WHO_AM_I_EXPECTED:
+                found.append(address)
+        except OSError:
+            pass  # No device (NACK)
+    return found
+
+class ICM20948_Manager:
+    """Several ICM20948s across addresses and buses, one worker per bus"""
+
+    def __init__(self, buses=(1,), addresses=ICM20948_ADDRESSES, use_i2c_rdwr=False, **driver_kwargs):
+        # Bus numbers, or bus objects (e.g. SimulatedI2CBus) labelled by position
+        self.bus_specs = list(buses)
+        self.addresses = addresses
+        self.use_i2c_rdwr = use_i2c_rdwr
+        self.driver_kwargs = driver_kwargs    # Passed to every ICM20948_NED_Corrected
+
+        self.buses = {}                       # bus id → open bus object
+        self.devices = {}                     # bus id → {address: driver}
+
+        self.period = None
+        self.start_time = None
+        self._threads = []
+        self._running = False
+        self._condition = threading.Condition()
+        self._history = {}                    # bus id → OrderedDict(tick → (read_ns, samples))
+        self._last_tick = -1
+        self.stats = {}
+
+    def open(self):
+        """Probe every bus and initialize each ICM20948 found; returns the number of devices"""
+        for index, spec in enumerate(self.bus_specs):
+            bus_id = spec if isinstance(spec, int) else index
+            try:
+                bus = ICM20948_NED_Corrected._open_bus(spec, self.use_i2c_rdwr)
+            except OSError as e:
+                print(f"⚠️  Cannot open I2C bus {bus_id}: {e}")
+                continue
+
+            found = probe_icm20948(bus, self.addresses)
+            if not found:
+                print(f"⚠️  No ICM20948 on bus {bus_id}")
+                bus.close()
+                continue
+
+            self.buses[bus_id] = bus
+            self.devices[bus_id] = {}
+            for address in found:
+                print(f"🔍 ICM20948 at bus {bus_id}, 0x{address:02X}")
+                self.devices[bus_id][address] = ICM20948_NED_Corrected(
+                    address=address, bus=bus, **self.driver_kwargs)
+
+        return sum(len(devices) for devices in self.devices.values())
+
+    def start(self, rate_hz=100.0):
+        """Start one acquisition worker per bus on a shared tick grid"""
+        if self._running:
+            return
+        self.period = 1.0 / rate_hz
+        self.start_time = time.monotonic() + self.period   # Let every worker reach the first tick
+        self._running = True
+        self._last_tick = -1
+
+        for bus_id, devices in self.devices.items():
+            self._history[bus_id] = OrderedDict()
+            self.stats[bus_id] = {'ticks': 0, 'missed_ticks': 0, 'read_errors': 0, 'read_time_s': 0.0}
+            thread = threading.Thread(target=self._worker, args=(bus_id, devices),
+                                      name=f"icm20948-bus{bus_id}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self, bus_id, devices):
+        """Read every device on one bus at each tick"""
+        stats = self.stats[bus_id]
+        tick = 0
+        while self._running:
+            # Sleep to this tick's slot; skip ticks if the bus fell behind
+            delay = self.start_time + tick * self.period - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif -delay > self.period:
+                skipped = int(-delay / self.period)
+                stats['missed_ticks'] += skipped
+                tick += skipped
+
+            start = time.perf_counter()
+            samples = {}
+            for address, imu in devices.items():
+                try:
+                    samples[(bus_id, address)] = imu.read_all_raw()
+                except OSError:
+                    samples[(bus_id, address)] = None
+                    stats['read_errors'] += 1
+            read_ns = time.monotonic_ns()
+            stats['read_time_s'] += time.perf_counter() - start
+            stats['ticks'] += 1
+
+            with self._condition:
+                history = self._history[bus_id]
+                history[tick] = (read_ns, samples)
+                while len(history) > TICK_HISTORY:
+                    history.popitem(last=False)
+                self._condition.notify_all()
+
+            tick += 1
+
+    def _complete_tick(self):
+        """Newest tick every bus has reported (newer than the last one returned), or None"""
+        common = None
+        for history in self._history.values():
+            ticks = set(history)
+            common = ticks if common is None else common & ticks
+        ticks = [tick for tick in (common or ()) if tick > self._last_tick]
+        return max(ticks) if ticks else None
+
+    def read_set(self, timeout=1.0):
+        """Wait for the next time-aligned sample set from all buses (None on timeout)"""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._complete_tick() is not None, timeout):
+                return None
+
+            tick = self._complete_tick()
+            self._last_tick = tick
+            samples = {}
+            read_times = []
+            for history in self._history.values():
+                read_ns, bus_samples = history[tick]
+                samples.update(bus_samples)
+                read_times.append(read_ns)
+
+        return SampleSet(tick, max(read_times), samples, max(read_times) - min(read_times))
+
+    def stop(self):
+        """Stop the acquisition workers"""
+        self._running = False
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+
+    def close(self):
+        """Stop acquisition and close every bus"""
+        self.stop()
+        for bus in self.buses.values():
+            bus.close()
+        self.buses = {}
+        self.devices = {}
+
+    def print_statistics(self):
+        """Print per-bus acquisition statistics"""
+        print("📊 MULTI-IMU ACQUISITION")
+        for bus_id, stats in self.stats.items():
+            ticks = stats['ticks']
+            read_ms = stats['read_time_s'] * 1000 / ticks if ticks else 0.0
+            print(f"   Bus {bus_id}: {len(self.devices.get(bus_id, {}))} IMUs, {ticks} ticks, "
+                  f"{stats['missed_ticks']} missed, {stats['read_errors']} errors, "
+                  f"{read_ms:.2f} ms/tick")
+
+def main():
+    """Read every ICM20948 on I2C buses 0 and 1"""
+    print("🔀 ICM20948 Multi-IMU Manager")
+    print("=" * 50)
+
+    manager = ICM20948_Manager(buses=[0, 1])
+    if manager.open() == 0:
+        print("✗ No ICM20948 found")
+        return
+
+    manager.start(rate_hz=100)
+    sets = 0
+    try:
+        while True:
+            sample_set = manager.read_set()
+            if sample_set is None:
+                continue
+            sets += 1
+            if sets % 10 == 0:
+                line = "  ".join(f"{bus}/0x{address:02X}: Z={sample.accel[2]:+6d}"
+                                 for (bus, address), sample in sorted(sample_set.samples.items())
+                                 if sample is not None)
+                print(f"tick {sample_set.tick:6d} skew {sample_set.skew_ns / 1000:6.0f} µs  {line}")
+    except KeyboardInterrupt:
+        print("\n👋 Stopped by user")
+        manager.print_statistics()
+    finally:
+        manager.close()
+
+if __name__ == "__main__":
+    main()
@@ -8,59 +8,172 @@ Transforms all sensor data to NED (North-East-Down) coordinates
 import time
 import sys
 import math
+from collections import namedtuple
 
 try:
     import smbus
 except ImportError:
-    print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
+    smbus = None  # Only needed for hardware buses (see icm20948_emulator.py)
+
+try:
+    import numpy as np
+except ImportError:
+    print("ERROR: numpy not found. Install with: sudo apt-get install python3-numpy")
     sys.exit(1)
 
+from icm20948_registers import ICM20948_RegisterBus
+from icm20948_i2c import I2CRdwrBus
+from icm20948_config import SensorConfig
+from icm20948_timing import SampleClock
+from icm20948_decode import (decode_sensor_block, decode_axes, decode_temperature, decode_mag_data,
+                             decode_samples, sample_scales, scale_samples)
+
+# Contiguous bank 0 sample block read in one transaction:
+# ACCEL_XOUT_H (0x2D) .. GYRO_ZOUT_L (0x38), TEMP_OUT (0x39-0x3A),
+# EXT_SLV_SENS_DATA_00.. (0x3B+) holding the AK09916 ST1..ST2 block
+SENSOR_BLOCK_START = 0x2D
+SENSOR_BLOCK_LENGTH = 6 + 6 + 2 + 9
+
+# AK09916 block polled autonomously by I2C_SLV0: ST1, HXL..HZH, TMPS, ST2
+MAG_BLOCK_START = 0x10
+MAG_BLOCK_LENGTH = 9
+
+# Wait for an I2C master SLV0 transaction to the AK09916 to complete (SLV0 has no done flag)
+MAG_TRANSACTION_DELAY = 0.03
+
+# Extra attempts for a register transaction that fails with a bus error (transient NACK)
+BUS_RETRIES = 2
+
+# Bounded waits for status-polled initialization (seconds)
+DEVICE_RESET_TIMEOUT = 0.1        # PWR_MGMT_1.DEVICE_RESET self-clears
+MAG_TRANSACTION_TIMEOUT = 0.05    # I2C_MST_STATUS.I2C_SLV4_DONE, plus two sample periods
+MAG_RESET_TIMEOUT = 0.1           # AK09916 CNTL3.SRST self-clears
+FIRST_SAMPLE_TIMEOUT = 0.2        # INT_STATUS_1.RAW_DATA_0_RDY after wake (gyro start-up ~35 ms)
+STATUS_POLL_INTERVAL = 0.0005
+
+# TEMP_OUT: degC = TEMP_OUT / 333.87 + 21
+TEMP_SENSITIVITY = 333.87
+TEMP_OFFSET_C = 21.0
+
+# FIFO layout with FIFO_EN_2 = accel + gyro: ACCEL_X/Y/Z, GYRO_X/Y/Z (big-endian int16)
+FIFO_SAMPLE_SIZE = 12
+
+# One burst-read sample (raw counts, sensor frame)
+RawSample = namedtuple('RawSample', ['accel', 'gyro', 'temperature', 'mag', 'mag_valid',
+                                     'ext_data', 'timestamp'])
+
 class ICM20948_NED_Corrected:
     """ICM20948 sensor with corrected NED coordinate transformation for your mounting"""
     
-    def __init__(self, address=0x69, bus=1):
+    def __init__(self, address=0x69, bus=1, mag_autonomous=True, interrupt=None, config=None,
+                 use_i2c_rdwr=False):
+        self.cold_start_ns = time.monotonic_ns()  # Start of cold-start latency (see init_timings)
         self.address = address
         self.bus_num = bus
-        self.bus = smbus.SMBus(bus)
+        self.bus = self._open_bus(bus, use_i2c_rdwr)
+        self.registers = ICM20948_RegisterBus(self.bus, address, retries=BUS_RETRIES)
         self.mag_initialized = False
         
-        # Scale factors
-        self.accel_scale = 2.0 / 32768.0      # ±2g range
-        self.gyro_scale = 250.0 / 32768.0     # ±250°/s range  
+        # Autonomous magnetometer polling (SLV0 reads ST1..ST2 into EXT_SLV_SENS_DATA)
+        self.mag_autonomous = mag_autonomous
+        self.mag_polling = False
+        self.mag_odr = 50.0                   # AK09916 continuous mode 2
+        self.mag_mst_delay = 0                # I2C_MST_DLY, shares I2C_SLV4_CTRL with SLV4_EN
+        self.mag_read_errors = 0              # Bus errors in per-read magnetometer access
+        self.sample_rate_hz = 1125.0          # Gyro ODR (also drives the I2C master), set by configure()
+        self._last_mag_block = None
+        
+        # Data-ready interrupt source (see icm20948_interrupts.py), None = sleep polling
+        self.interrupt = interrupt
+        self.interrupt_timeout = 0.5          # Give up waiting for INT after this long
+        
+        # FIFO streaming state
+        self.fifo_enabled = False
+        self.fifo_overflows = 0
+        self.fifo_misaligned = False          # A drain was cut short by a bus error
+        self.fifo_read_ns = None              # Host time FIFO_COUNT was last read
+        self.fifo_backlog = 0                 # Samples left in the FIFO after the last drain
+        self.sample_clock = None              # Sensor-clock timestamps for FIFO samples
+        
+        # ODR, DLPF and full-scale range (see icm20948_config.py)
+        self.config = config if config is not None else SensorConfig()
+        
+        # Scale factors (accel/gyro follow the configured full-scale range)
+        self.accel_scale = self.config.accel_scale
+        self.gyro_scale = self.config.gyro_scale
+        self.sample_scales = sample_scales(self.accel_scale, self.gyro_scale)
         self.mag_scale = 4912.0 / 32752.0     # µT per LSB for AK09916
         
+        # Seconds spent in each initialization phase (filled by initialize())
+        self.init_timings = {}
+        
         # Initialize sensor
         self.initialize()
     
+    @staticmethod
+    def _open_bus(bus, use_i2c_rdwr):
+        """Open /dev/i2c-<bus>, or use bus as-is if it is already a bus object"""
+        if not isinstance(bus, int):
+            return bus  # e.g. SimulatedI2CBus, I2CRdwrBus
+        
+        # I2C_RDWR backend batches bank select + pointer + read into one ioctl
+        if use_i2c_rdwr:
+            return I2CRdwrBus(bus)
+        
+        if smbus is None:
+            print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
+            sys.exit(1)
+        return smbus.SMBus(bus)
+    
     def initialize(self):
         """Initialize ICM20948 with optimal settings"""
         print("Initializing ICM20948 with CORRECTED NED transformation...")
         
         try:
-            # Reset device
+            start = time.perf_counter()
+            
+            # Reset device and wait for DEVICE_RESET to self-clear
             self._write_register(0, 0x06, 0x80)  # PWR_MGMT_1: Reset
-            time.sleep(0.1)
+            self.registers.invalidate_bank()      # Reset returns to bank 0
+            self._wait_until(lambda: not self._read_register(0, 0x06) & 0x80,
+                             DEVICE_RESET_TIMEOUT, "Device reset")
+            reset_done = time.perf_counter()
             
             # Wake up and set clock source
             self._write_register(0, 0x06, 0x01)  # PWR_MGMT_1: Auto clock
-            time.sleep(0.01)
             
             # Enable accelerometer and gyroscope
             self._write_register(0, 0x07, 0x00)  # PWR_MGMT_2: Enable all
-            time.sleep(0.01)
             
-            # Configure accelerometer (±2g, 1125 Hz)
-            self._write_register(2, 0x14, 0x00)  # ACCEL_CONFIG
-            time.sleep(0.01)
-            
-            # Configure gyroscope (±250 dps, 1125 Hz)
-            self._write_register(2, 0x01, 0x00)  # GYRO_CONFIG_1
-            time.sleep(0.01)
+            # Configure accelerometer and gyroscope ODR, DLPF and range
+            self.configure(self.config)
+            configure_done = time.perf_counter()
             
             # Initialize magnetometer
             self._initialize_magnetometer()
+            mag_done = time.perf_counter()
+            
+            # Route DATA_RDY to the INT pin if acquisition blocks on it
+            if self.interrupt is not None:
+                self.enable_data_ready_interrupt()
             
-            print("✓ ICM20948 initialized successfully")
+            # First sample out of the data registers (no fixed start-up sleep)
+            self._wait_until(lambda: self._read_register(0, 0x1A) & 0x01,  # INT_STATUS_1: RAW_DATA_0_RDY
+                             FIRST_SAMPLE_TIMEOUT, "First sample")
+            done = time.perf_counter()
+            
+            self.init_timings = {
+                'reset': reset_done - start,
+                'configure': configure_done - reset_done,
+                'magnetometer': mag_done - configure_done,
+                'first_sample': done - mag_done,
+                'total': (time.monotonic_ns() - self.cold_start_ns) * 1e-9,
+            }
+            
+            print(f"✓ ICM20948 initialized successfully in {self.init_timings['total'] * 1000:.0f} ms "
+                  f"(reset {self.init_timings['reset'] * 1000:.0f}, "
+                  f"magnetometer {self.init_timings['magnetometer'] * 1000:.0f}, "
+                  f"first sample {self.init_timings['first_sample'] * 1000:.0f} ms)")
             print("✓ NED transformation corrected based on your test results:")
             print("  ACCELEROMETER:")
             print("    X_ned = +X_sensor  (your 'right' direction → North)")
@@ -79,24 +192,85 @@ class ICM20948_NED_Corrected:
             print(f"✗ Initialization failed: {e}")
             raise
     
+    def reinitialize(self):
+        """Reset and re-initialize after a bus fault, keeping the configuration
+        
+        FIFO streaming and magnetometer polling are restored if they were on.
+        Raises OSError (including TimeoutError) if the device is still not
+        responding.
+        """
+        fifo_enabled = self.fifo_enabled
+        self.registers.invalidate_bank()
+        self.mag_polling = False              # Re-armed by _initialize_magnetometer()
+        
+        self.initialize()
+        if fifo_enabled:
+            self.enable_fifo()
+    
+    def reinitialize_magnetometer(self):
+        """Re-run the AK09916 setup; returns True if it is delivering data again"""
+        self.mag_polling = False
+        self._initialize_magnetometer()
+        return self.mag_initialized
+    
+    def configure(self, config):
+        """Apply output data rate, DLPF bandwidth and full-scale range settings"""
+        self._write_register(2, 0x00, config.gyro_smplrt_div)              # GYRO_SMPLRT_DIV
+        self._write_register(2, 0x01, config.gyro_config_1)                # GYRO_CONFIG_1
+        self._write_register(2, 0x10, config.accel_smplrt_div >> 8)        # ACCEL_SMPLRT_DIV_1
+        self._write_register(2, 0x11, config.accel_smplrt_div & 0xFF)      # ACCEL_SMPLRT_DIV_2
+        self._write_register(2, 0x14, config.accel_config)                 # ACCEL_CONFIG
+        self._write_register(2, 0x09, 0x01)                                # ODR_ALIGN_EN
+        
+        self.config = config
+        self.accel_scale = config.accel_scale
+        self.gyro_scale = config.gyro_scale
+        self.sample_scales = sample_scales(self.accel_scale, self.gyro_scale)
+        self.sample_rate_hz = config.gyro_odr_hz
+        
+        # The I2C master follows the gyro ODR, so re-derive the SLV0 poll spacing
+        if self.mag_polling:
+            self._start_mag_polling()
+        
+        print(f"✓ Sensor configuration: {config.describe()}")
+    
     def _write_register(self, bank, register, value):
         """Write to a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.002)  # Increased delay for better reliability
-        self.bus.write_byte_data(self.address, register, value)
-        time.sleep(0.002)  # Increased delay for better reliability
+        self.registers.write_register(bank, register, value)
     
     def _read_register(self, bank, register):
         """Read from a register in a specific bank"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.002)  # Increased delay for better reliability
-        return self.bus.read_byte_data(self.address, register)
+        return self.registers.read_register(bank, register)
     
     def _read_registers(self, bank, start_register, length):
         """Read multiple registers in sequence"""
-        self.bus.write_byte_data(self.address, 0x7F, bank << 4)  # Set bank
-        time.sleep(0.002)  # Increased delay for better reliability
-        return self.bus.read_i2c_block_data(self.address, start_register, length)
+        return self.registers.read_registers(bank, start_register, length)
+    
+    def _wait_until(self, condition, timeout, description):
+        """Poll condition() until it returns something true, and return that
+        
+        Bus errors count as "not yet" (the device NACKs while resetting).
+        Raises TimeoutError after timeout seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                result = condition()
+                if result:
+                    return result
+            except OSError:
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"{description} not complete after {timeout * 1000:.0f} ms")
+            time.sleep(STATUS_POLL_INTERVAL)
+    
+    def get_bus_statistics(self):
+        """Get I2C transaction counters (per bank and per register)"""
+        return self.registers.get_statistics()
+    
+    def reset_bus_statistics(self):
+        """Reset I2C transaction counters"""
+        self.registers.reset_statistics()
     
     def _initialize_magnetometer(self):
         """Initialize AK09916 magnetometer via I2C master - IMPROVED"""
@@ -105,23 +279,16 @@ class ICM20948_NED_Corrected:
             
             # Step 1: Configure I2C master first
             self._write_register(3, 0x01, 0x4D)  # I2C_MST_CTRL: 400kHz
-            time.sleep(0.02)
             
             # Step 2: Use I2C master mode (not bypass) - this method worked in debug
             self._write_register(0, 0x0F, 0x00)  # INT_PIN_CFG: Disable bypass
-            time.sleep(0.02)
-            
-            # Enable I2C master
-            self._write_register(0, 0x03, 0x20)  # USER_CTRL: I2C master enable
-            time.sleep(0.02)
             
-            # Step 3: Test magnetometer communication
-            self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Read mode
-            self._write_register(3, 0x04, 0x01)         # I2C_SLV0_REG: WHO_AM_I
-            self._write_register(3, 0x05, 0x81)         # I2C_SLV0_CTRL: Enable read, 1 byte
-            time.sleep(0.1)  # Longer wait for I2C master
+            # Enable I2C master, keeping FIFO_EN if a re-init runs while streaming
+            user_ctrl = self._read_register(0, 0x03)
+            self._write_register(0, 0x03, user_ctrl | 0x20)  # USER_CTRL: I2C master enable
             
-            who_am_i = self._read_register(0, 0x3B)  # Read result
+            # Step 3: Test magnetometer communication (WIA2)
+            who_am_i = self._read_mag_registers(0x01, 1)[0]
             
             if who_am_i != 0x09:
                 print(f"⚠ Magnetometer WHO_AM_I: 0x{who_am_i:02X} (expected 0x09)")
@@ -129,17 +296,18 @@ class ICM20948_NED_Corrected:
                 self.mag_initialized = False
                 return
             
-            # Step 4: Reset magnetometer
+            # Step 4: Reset magnetometer and wait for SRST to self-clear
             self._write_mag_register(0x32, 0x01)  # CNTL3: Reset
-            time.sleep(0.2)  # Longer reset wait
+            self._wait_until(lambda: not self._read_mag_registers(0x32, 1)[0] & 0x01,
+                             MAG_RESET_TIMEOUT, "Magnetometer reset")
             
             # Step 5: Set power down mode first (required by AK09916)
+            # Each SLV4 transaction takes at least one sample period, which covers
+            # the 100 µs the AK09916 needs between mode changes
             self._write_mag_register(0x31, 0x00)  # CNTL2: Power down
-            time.sleep(0.1)
             
             # Step 6: Set continuous measurement mode 2 (50Hz) - more stable than 100Hz
             self._write_mag_register(0x31, 0x06)  # CNTL2: Continuous mode 2
-            time.sleep(0.1)
             
             # Step 7: Verify mode setting
             mode_data = self._read_mag_registers(0x31, 1)
@@ -148,6 +316,9 @@ class ICM20948_NED_Corrected:
                 if mode == 0x06:
                     self.mag_initialized = True
                     print("✓ Magnetometer initialized successfully (50Hz continuous mode)")
+                    if self.mag_autonomous:
+                        self._start_mag_polling()
+                        print("✓ Magnetometer polled autonomously by I2C_SLV0")
                 else:
                     print(f"⚠ Failed to set magnetometer mode (got 0x{mode:02X}, expected 0x06)")
                     print("  Run 'python3 fix_magnetometer_continuous.py' to fix this")
@@ -162,46 +333,128 @@ class ICM20948_NED_Corrected:
             print("  Run 'python3 fix_magnetometer_continuous.py' to fix this")
             self.mag_initialized = False
     
+    def _mag_transaction(self, address, register, value=0):
+        """One I2C_SLV4 transaction to the AK09916, polled on I2C_SLV4_DONE
+        
+        SLV4 is a one-shot slave with a completion flag, so no fixed delay is
+        needed and the SLV0 magnetometer polling is left untouched. Returns
+        I2C_SLV4_DI (the byte read) for read transactions.
+        """
+        self._write_register(3, 0x13, address)   # I2C_SLV4_ADDR
+        self._write_register(3, 0x14, register)  # I2C_SLV4_REG
+        if not address & 0x80:
+            self._write_register(3, 0x16, value) # I2C_SLV4_DO
+        self._write_register(3, 0x15, 0x80 | self.mag_mst_delay)  # I2C_SLV4_CTRL: Enable, keep I2C_MST_DLY
+        
+        timeout = MAG_TRANSACTION_TIMEOUT + 2.0 / self.sample_rate_hz  # Master runs once per sample
+        status = self._wait_until(lambda: self._read_register(0, 0x17) & 0x50,  # I2C_MST_STATUS
+                                  timeout, "Magnetometer transaction")
+        if status & 0x10:
+            raise OSError(121, "AK09916 did not acknowledge (I2C_SLV4_NACK)")
+        
+        if address & 0x80:
+            return self._read_register(3, 0x17)  # I2C_SLV4_DI
+        return None
+    
     def _write_mag_register(self, register, value):
         """Write to magnetometer register via I2C master"""
-        self._write_register(3, 0x03, 0x0C)      # I2C_SLV0_ADDR: Mag address
-        self._write_register(3, 0x04, register)  # I2C_SLV0_REG
-        self._write_register(3, 0x06, value)     # I2C_SLV0_DO
-        self._write_register(3, 0x05, 0x81)      # I2C_SLV0_CTRL: Enable write
-        time.sleep(0.03)  # Increased delay for magnetometer communication
+        self._mag_transaction(0x0C, register, value)
     
     def _read_mag_registers(self, register, length):
-        """Read from magnetometer registers via I2C master"""
-        self._write_register(3, 0x03, 0x0C | 0x80)  # I2C_SLV0_ADDR: Read mode
-        self._write_register(3, 0x04, register)     # I2C_SLV0_REG
-        self._write_register(3, 0x05, 0x80 | length)  # I2C_SLV0_CTRL: Enable read
-        time.sleep(0.03)  # Increased delay for magnetometer communication
-        return self._read_registers(0, 0x3B, length)  # EXT_SLV_SENS_DATA_00
-    
-    def _convert_raw_to_signed(self, high, low):
-        """Convert raw 16-bit data to signed integer"""
-        value = (high << 8) | low
-        return value - 65536 if value > 32767 else value
+        """Read from magnetometer registers via I2C master (one SLV4 read per byte)"""
+        return [self._mag_transaction(0x0C | 0x80, register + i) for i in range(length)]
+    
+    def _start_mag_polling(self):
+        """Program I2C_SLV0 once to read ST1..ST2 continuously into EXT_SLV_SENS_DATA_00
+        
+        SLV0 is accessed every (1 + I2C_MST_DLY) internal samples, chosen so the
+        AK09916 is polled about twice per measurement period. Reading through ST2
+        on every access releases the AK09916 data lock, so continuous mode keeps
+        updating without any host transactions.
+        """
+        samples_per_poll = self.sample_rate_hz / (2.0 * self.mag_odr)
+        mst_delay = max(0, min(31, int(samples_per_poll) - 1))
+        
+        self._write_register(3, 0x00, 0x04)       # I2C_MST_ODR_CONFIG: 1.1kHz/2^4 when duty-cycled
+        self._write_register(3, 0x15, mst_delay)  # I2C_SLV4_CTRL: I2C_MST_DLY
+        self.mag_mst_delay = mst_delay
+        self._write_register(3, 0x02, 0x01)       # I2C_MST_DELAY_CTRL: SLV0 uses I2C_MST_DLY
+        self._arm_mag_polling()
+        
+        self._last_mag_block = None
+        self.mag_polling = True
+    
+    def _arm_mag_polling(self):
+        """Point I2C_SLV0 at the AK09916 ST1..ST2 block in read mode"""
+        self._write_register(3, 0x03, 0x0C | 0x80)                # I2C_SLV0_ADDR: Read mode
+        self._write_register(3, 0x04, MAG_BLOCK_START)            # I2C_SLV0_REG: ST1
+        self._write_register(3, 0x05, 0x80 | MAG_BLOCK_LENGTH)    # I2C_SLV0_CTRL: Enable, 9 bytes
+    
+    def _decode_mag_block(self, data):
+        """Decode a polled ST1..ST2 block into (x, y, z, valid)
+        
+        Valid means a new, non-overflowed measurement since the previous decode:
+        either ST1.DRDY was captured by SLV0 or the data registers changed.
+        SLV0 re-reads faster than the host may poll, so the same DRDY capture
+        can be seen more than once; only a changed block counts.
+        """
+        st1 = data[0]
+        st2 = data[8]
+        mag_block = bytes(data[0:9])
+        mag_bytes = mag_block[1:7]
+        
+        # Magnetometer is little-endian
+        x, y, z = decode_mag_data(mag_bytes)
+        
+        changed = mag_block != self._last_mag_block
+        fresh = changed and ((st1 & 0x01) != 0 or (self._last_mag_block is not None
+                                                   and mag_bytes != self._last_mag_block[1:7]))
+        self._last_mag_block = mag_block
+        
+        # Check for overflow (ST2 bit 3 = 1 means overflow)
+        overflow = (st2 & 0x08) != 0
+        
+        return x, y, z, fresh and not overflow
     
     def read_accelerometer_raw(self):
         """Read raw accelerometer data"""
         data = self._read_registers(0, 0x2D, 6)  # ACCEL_XOUT_H
-        
-        x = self._convert_raw_to_signed(data[0], data[1])
-        y = self._convert_raw_to_signed(data[2], data[3])
-        z = self._convert_raw_to_signed(data[4], data[5])
-        
-        return x, y, z
+        return decode_axes(data)
     
     def read_gyroscope_raw(self):
         """Read raw gyroscope data"""
         data = self._read_registers(0, 0x33, 6)  # GYRO_XOUT_H
+        return decode_axes(data)
+    
+    def read_temperature(self):
+        """Read the die temperature (°C)"""
+        data = self._read_registers(0, 0x39, 2)  # TEMP_OUT_H
+        return self.temperature_to_celsius(decode_temperature(data))
+    
+    def read_sensor_raw(self):
+        """Read accel, gyro and temperature in one burst, without the external sensor data"""
+        data = self._read_registers(0, SENSOR_BLOCK_START, 14)
+        return decode_sensor_block(data)
+    
+    def read_all_raw(self):
+        """Read accel, gyro, temperature and external sensor data in one burst
+        
+        With autonomous magnetometer polling the AK09916 data arrives in the same
+        block; otherwise the magnetometer is read with per-read SLV4 transactions.
+        """
+        data = self._read_registers(0, SENSOR_BLOCK_START, SENSOR_BLOCK_LENGTH)
+        timestamp = time.time()
         
-        x = self._convert_raw_to_signed(data[0], data[1])
-        y = self._convert_raw_to_signed(data[2], data[3])
-        z = self._convert_raw_to_signed(data[4], data[5])
+        accel, gyro, temperature = decode_sensor_block(data)
+        ext_data = bytes(data[14:])
         
-        return x, y, z
+        if self.mag_polling:
+            mag_x, mag_y, mag_z, mag_valid = self._decode_mag_block(ext_data)
+        else:
+            mag_x, mag_y, mag_z, mag_valid = self.read_magnetometer_raw()
+        
+        return RawSample(accel, gyro, temperature, (mag_x, mag_y, mag_z), mag_valid,
+                         ext_data, timestamp)
     
     def read_magnetometer_raw(self):
         """Read raw magnetometer data - IMPROVED for continuous mode"""
@@ -209,6 +462,11 @@ class ICM20948_NED_Corrected:
             return 0, 0, 0, False
         
         try:
+            if self.mag_polling:
+                # Latest ST1..ST2 block is already in EXT_SLV_SENS_DATA_00
+                data = self._read_registers(0, 0x3B, MAG_BLOCK_LENGTH)
+                return self._decode_mag_block(data)
+            
             # Read ST1 register first to check data ready
             st1_data = self._read_mag_registers(0x10, 1)
             if len(st1_data) < 1:
@@ -227,9 +485,7 @@ class ICM20948_NED_Corrected:
                 return 0, 0, 0, False
             
             # Magnetometer is little-endian
-            x = self._convert_raw_to_signed(data[1], data[0])  # HXH, HXL
-            y = self._convert_raw_to_signed(data[3], data[2])  # HYH, HYL
-            z = self._convert_raw_to_signed(data[5], data[4])  # HZH, HZL
+            x, y, z = decode_mag_data(data)
             
             # Read ST2 register to complete the reading sequence and clear data ready
             st2_data = self._read_mag_registers(0x18, 1)
@@ -242,12 +498,140 @@ class ICM20948_NED_Corrected:
             
             return x, y, z, not overflow
             
-        except Exception as e:
+        except OSError:
+            self.mag_read_errors += 1
+            self.registers.invalidate_bank()
             return 0, 0, 0, False
     
+    def enable_data_ready_interrupt(self):
+        """Pulse INT1 (active high, push-pull, 50 µs) whenever new sensor data is ready"""
+        self._write_register(0, 0x0F, 0x00)  # INT_PIN_CFG: active high, pulse, bypass off
+        self._write_register(0, 0x11, 0x01)  # INT_ENABLE_1: RAW_DATA_0_RDY_EN
+    
+    def wait_for_data(self, period):
+        """Block until the next DATA_RDY interrupt
+        
+        Without an interrupt source this falls back to sleeping for period
+        seconds. Returns False if the interrupt did not arrive in time.
+        """
+        if self.interrupt is None:
+            time.sleep(period)
+            return True
+        
+        return self.interrupt.wait(self.interrupt_timeout) is not None
+    
+    def enable_fifo(self):
+        """Stream accelerometer and gyroscope samples into the FIFO at the sensor ODR"""
+        if self.config.accel_smplrt_div != self.config.gyro_smplrt_div:
+            raise ValueError("FIFO streaming needs equal accelerometer and gyroscope ODR")
+        
+        user_ctrl = self._read_register(0, 0x03)        # USER_CTRL
+        self._write_register(0, 0x03, user_ctrl & ~0x40)  # FIFO_EN off while configuring
+        self._write_register(0, 0x66, 0x00)             # FIFO_EN_1: no slave data
+        self._write_register(0, 0x67, 0x1E)             # FIFO_EN_2: ACCEL + GYRO_Z/Y/X
+        self._write_register(0, 0x69, 0x00)             # FIFO_MODE: stream (overwrite)
+        self.reset_fifo()
+        self._write_register(0, 0x03, user_ctrl | 0x40) # USER_CTRL: FIFO_EN
+        
+        self.fifo_enabled = True
+        self.fifo_overflows = 0
+        self.fifo_misaligned = False
+        self.sample_clock = SampleClock(self.config.gyro_odr_hz)
+    
+    def disable_fifo(self):
+        """Stop FIFO streaming"""
+        self._write_register(0, 0x67, 0x00)  # FIFO_EN_2: nothing
+        user_ctrl = self._read_register(0, 0x03)
+        self._write_register(0, 0x03, user_ctrl & ~0x40)
+        self.fifo_enabled = False
+    
+    def reset_fifo(self):
+        """Discard FIFO contents"""
+        self._write_register(0, 0x68, 0x1F)  # FIFO_RST: assert
+        self._write_register(0, 0x68, 0x00)  # FIFO_RST: release
+    
+    def read_fifo_count(self):
+        """Read number of bytes waiting in the FIFO"""
+        high, low = self._read_registers(0, 0x70, 2)  # FIFO_COUNTH, FIFO_COUNTL
+        return ((high & 0x1F) << 8) | low
+    
+    def read_fifo_raw(self, max_samples=None):
+        """Drain complete samples from the FIFO
+        
+        Returns an (N, 6) int16 array of raw counts with columns
+        accel X/Y/Z, gyro X/Y/Z in sensor coordinates.
+        """
+        # FIFO_OVERFLOW_INT (INT_STATUS_2): oldest samples were overwritten, and
+        # the 512-byte wrap leaves the read pointer mid-sample; start over aligned.
+        # A drain cut short by a bus error can leave it mid-sample too.
+        overflow = self._read_register(0, 0x1B) & 0x1F
+        if overflow or self.fifo_misaligned:
+            if overflow:
+                self.fifo_overflows += 1
+            self.reset_fifo()
+            self.fifo_misaligned = False
+            self._read_register(0, 0x1B)  # Clear an overflow latched just before the reset
+            if self.sample_clock is not None:
+                self.sample_clock.reset()
+            self.fifo_read_ns = time.monotonic_ns()
+            self.fifo_backlog = 0
+            return np.empty((0, 6), dtype=np.int16)
+        
+        count = self.read_fifo_count()
+        self.fifo_read_ns = time.monotonic_ns()
+        samples = count // FIFO_SAMPLE_SIZE
+        if max_samples is not None:
+            samples = min(samples, max_samples)
+        self.fifo_backlog = count // FIFO_SAMPLE_SIZE - samples
+        if samples == 0:
+            return np.empty((0, 6), dtype=np.int16)
+        
+        # Burst-read FIFO_R_W; the FIFO pops on every byte read
+        nbytes = samples * FIFO_SAMPLE_SIZE
+        chunk = self.registers.max_block_length
+        buffer = bytearray(nbytes)
+        offset = 0
+        try:
+            while offset < nbytes:
+                length = min(chunk, nbytes - offset)
+                buffer[offset:offset + length] = self.registers.read_registers(0, 0x72, length,
+                                                                               retry=False)
+                offset += length
+        except OSError:
+            self.fifo_misaligned = True   # Bytes already popped are lost
+            raise
+        
+        return decode_samples(buffer, 6)
+    
+    def read_fifo_timestamped(self, max_samples=None):
+        """Drain the FIFO and stamp each sample from the sensor clock
+        
+        Returns (timestamps, samples): int64 time.monotonic_ns values spaced
+        exactly one estimated sensor period apart, and the (N, 6) raw samples.
+        """
+        samples = self.read_fifo_raw(max_samples)
+        
+        # Samples left behind were produced after the newest one drained
+        read_ns = self.fifo_read_ns - self.fifo_backlog * self.sample_clock.period_ns
+        timestamps = self.sample_clock.timestamp_samples(len(samples), read_ns)
+        
+        return timestamps, samples
+    
+    def temperature_to_celsius(self, raw):
+        """Convert raw TEMP_OUT counts to °C"""
+        return raw / TEMP_SENSITIVITY + TEMP_OFFSET_C
+    
+    def samples_to_physical(self, samples):
+        """Raw (N, 6) accel/gyro counts to g and °/s (sensor frame) in one multiply"""
+        return scale_samples(samples, self.sample_scales)
+    
     def read_accelerometer_ned(self):
         """Read accelerometer data in NED coordinates (g) - CORRECTED"""
-        raw_x, raw_y, raw_z = self.read_accelerometer_raw()
+        return self.accel_raw_to_ned(self.read_accelerometer_raw())
+    
+    def accel_raw_to_ned(self, raw):
+        """Convert raw accelerometer counts to NED coordinates (g)"""
+        raw_x, raw_y, raw_z = raw
         
         # Convert to g's
         x_g = raw_x * self.accel_scale
@@ -263,7 +647,11 @@ class ICM20948_NED_Corrected:
     
     def read_gyroscope_ned(self):
         """Read gyroscope data in NED coordinates (°/s) - CORRECTED"""
-        raw_x, raw_y, raw_z = self.read_gyroscope_raw()
+        return self.gyro_raw_to_ned(self.read_gyroscope_raw())
+    
+    def gyro_raw_to_ned(self, raw):
+        """Convert raw gyroscope counts to NED coordinates (°/s)"""
+        raw_x, raw_y, raw_z = raw
         
         # Convert to °/s
         x_dps = raw_x * self.gyro_scale
@@ -280,6 +668,11 @@ class ICM20948_NED_Corrected:
     def read_magnetometer_ned(self):
         """Read magnetometer data in NED coordinates (µT) - CORRECTED"""
         raw_x, raw_y, raw_z, valid = self.read_magnetometer_raw()
+        return self.mag_raw_to_ned((raw_x, raw_y, raw_z), valid)
+    
+    def mag_raw_to_ned(self, raw, valid):
+        """Convert raw magnetometer counts to NED coordinates (µT)"""
+        raw_x, raw_y, raw_z = raw
         
         if not valid:
             return 0.0, 0.0, 0.0, False
@@ -298,16 +691,18 @@ class ICM20948_NED_Corrected:
     
     def read_all_sensors_ned(self):
         """Read all sensors in NED coordinates - CORRECTED"""
-        accel_ned = self.read_accelerometer_ned()
-        gyro_ned = self.read_gyroscope_ned()
-        mag_ned_x, mag_ned_y, mag_ned_z, mag_valid = self.read_magnetometer_ned()
+        sample = self.read_all_raw()  # Accel + gyro + mag in one burst
+        accel_ned = self.accel_raw_to_ned(sample.accel)
+        gyro_ned = self.gyro_raw_to_ned(sample.gyro)
+        mag_ned_x, mag_ned_y, mag_ned_z, mag_valid = self.mag_raw_to_ned(sample.mag, sample.mag_valid)
         
         return {
             'accelerometer': accel_ned,      # (North, East, Down) in g
             'gyroscope': gyro_ned,           # (North, East, Down) in °/s
             'magnetometer': (mag_ned_x, mag_ned_y, mag_ned_z),  # (North, East, Down) in µT
             'magnetometer_valid': mag_valid,
-            'timestamp': time.time()
+            'temperature': self.temperature_to_celsius(sample.temperature),  # °C
+            'timestamp': sample.timestamp
         }
     
     def get_orientation_estimate(self):
@@ -327,6 +722,8 @@ class ICM20948_NED_Corrected:
     
     def close(self):
         """Close I2C bus"""
+        if self.interrupt is not None:
+            self.interrupt.close()
         self.bus.close()
 
 # Test function to verify the corrected transformation
@@ -335,6 +732,8 @@ def main():
     print("ICM20948 CORRECTED NED Sensor Test")
     print("="*50)
     
+    samples = 0
+    
     try:
         # Initialize sensor
         imu = ICM20948_NED_Corrected()
@@ -346,6 +745,8 @@ def main():
         print("- Level: Z_ned should be positive (~1g)")
         print("\nPress Ctrl+C to stop\n")
         
+        imu.reset_bus_statistics()
+        
         print("Accel (g)        Gyro (°/s)       Roll  Pitch")
         print("N     E     D    N     E     D    (°)   (°)")
         print("-" * 60)
@@ -364,10 +765,14 @@ def main():
                   f"{gyro[0]:+5.1f} {gyro[1]:+5.1f} {gyro[2]:+5.1f}  "
                   f"{roll:+5.1f} {pitch:+5.1f}", end="\r")
             
-            time.sleep(0.1)
+            samples += 1
+            imu.wait_for_data(0.1)
             
     except KeyboardInterrupt:
         print("\n\nCorrected NED sensor test completed!")
+        if samples:
+            print()
+            imu.registers.print_statistics(samples)
         print("\nWith the corrected transformations:")
         print("✓ ACCELEROMETER:")
         print("  X_ned = +X_sensor, Y_ned = +Y_sensor, Z_ned = -Z_sensor")
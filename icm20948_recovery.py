@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Bus Fault Recovery
+Keeps a running sensor usable through I2C faults (NACKs and glitches from
+vibration or loose wiring) without restarting the process
+
+A failing read escalates in steps:
+1. Immediate retries, re-selecting the register bank first (the cached bank
+   cannot be trusted after a failed transaction)
+2. Outage: the call returns None, and the device is re-initialized with
+   exponential backoff until it responds; configuration, FIFO streaming and
+   magnetometer polling are restored
+A magnetometer that stops delivering fresh data is re-initialized on its
+own, also with backoff. Each outage is reported when it starts and ends.
+
+Usage:
+    recovery = FaultRecovery(imu)
+    sample = recovery.call(imu.read_all_raw)   # None while the sensor is down
+    if sample is not None:
+        recovery.check_magnetometer(sample.mag_valid)
+"""
+
+import time
+
+class FaultRecovery:
+    """Retry, re-initialize and report for one ICM20948_NED_Corrected"""
+
+    def __init__(self, imu, retries=2, backoff_initial=0.02, backoff_max=2.0, mag_timeout=1.0,
+                 verbose=True):
+        self.imu = imu
+        self.retries = retries                    # Immediate retries before declaring an outage
+        self.backoff_initial = backoff_initial    # First re-initialization delay (s), doubled per failure
+        self.backoff_max = backoff_max
+        self.mag_timeout = mag_timeout            # Re-init the magnetometer after this long without data (s)
+        self.verbose = verbose
+
+        self.in_outage = False
+        self.outage_start = None
+        self.next_attempt = 0.0
+        self.backoff = backoff_initial
+        self.last_error = None
+
+        self._last_mag_time = time.monotonic()
+        self._mag_next_attempt = 0.0
+        self._mag_backoff = mag_timeout
+
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        """Clear fault counters"""
+        self.stats = {
+            'errors': 0,                # OSErrors seen, including retried ones
+            'recovered_by_retry': 0,    # Calls that succeeded after a retry
+            'outages': 0,
+            'reinit_attempts': 0,
+            'reinit_failures': 0,
+            'outage_time_s': 0.0,
+            'longest_outage_s': 0.0,
+            'mag_reinits': 0,
+        }
+
+    def call(self, function, *args, **kwargs):
+        """Run a bus operation with recovery; returns its result, or None during an outage"""
+        if self.in_outage:
+            if time.monotonic() < self.next_attempt or not self._reinitialize():
+                return None
+
+        for attempt in range(self.retries + 1):
+            try:
+                result = function(*args, **kwargs)
+            except OSError as e:
+                self.last_error = e
+                self.stats['errors'] += 1
+                self.imu.registers.invalidate_bank()
+                continue
+
+            if attempt:
+                self.stats['recovered_by_retry'] += 1
+            if self.in_outage:
+                self._end_outage()
+            return result
+
+        if self.in_outage:
+            self._schedule_attempt()              # Re-initialized, but still failing
+        else:
+            self._start_outage()
+        return None
+
+    def _start_outage(self):
+        self.in_outage = True
+        self.outage_start = time.monotonic()
+        self.backoff = self.backoff_initial
+        self.next_attempt = self.outage_start          # First re-init on the next call
+        self.stats['outages'] += 1
+        if self.verbose:
+            print(f"\n⚠️  Sensor outage: {self.last_error} - re-initializing with backoff")
+
+    def _end_outage(self):
+        duration = time.monotonic() - self.outage_start
+        self.in_outage = False
+        self.stats['outage_time_s'] += duration
+        self.stats['longest_outage_s'] = max(self.stats['longest_outage_s'], duration)
+        self._last_mag_time = time.monotonic()
+        if self.verbose:
+            print(f"\n✅ Sensor recovered after {duration * 1000:.0f} ms")
+
+    def _reinitialize(self):
+        """One re-initialization attempt; schedules the next one on failure"""
+        self.stats['reinit_attempts'] += 1
+        try:
+            self.imu.reinitialize()
+            return True
+        except OSError as e:                           # Includes TimeoutError from status polls
+            self.last_error = e
+            self.stats['reinit_failures'] += 1
+            self._schedule_attempt()
+            return False
+
+    def _schedule_attempt(self):
+        self.next_attempt = time.monotonic() + self.backoff
+        self.backoff = min(self.backoff * 2, self.backoff_max)
+
+    def check_magnetometer(self, mag_valid):
+        """Re-initialize the magnetometer if it has been silent for mag_timeout"""
+        now = time.monotonic()
+        if mag_valid:
+            self._last_mag_time = now
+            self._mag_backoff = self.mag_timeout
+            return
+        if now - self._last_mag_time < self.mag_timeout or now < self._mag_next_attempt:
+            return
+
+        self.stats['mag_reinits'] += 1
+        if self.verbose:
+            print(f"\n⚠️  No magnetometer data for {now - self._last_mag_time:.1f} s - re-initializing")
+        if self.imu.reinitialize_magnetometer():
+            self._last_mag_time = time.monotonic()
+        else:
+            self._mag_next_attempt = time.monotonic() + self._mag_backoff
+            self._mag_backoff = min(self._mag_backoff * 2, 30.0)
+
+    def print_statistics(self):
+        """Print fault and recovery summary"""
+        stats = self.stats
+        print("🛠️  BUS FAULT RECOVERY")
+        print(f"   Errors: {stats['errors']} ({stats['recovered_by_retry']} recovered by retry)")
+        print(f"   Outages: {stats['outages']}, {stats['outage_time_s'] * 1000:.0f} ms total, "
+              f"longest {stats['longest_outage_s'] * 1000:.0f} ms "
+              f"({stats['reinit_attempts']} re-init attempts, {stats['reinit_failures']} failed)")
+        print(f"   Magnetometer re-inits: {stats['mag_reinits']}, "
+              f"per-read errors: {self.imu.mag_read_errors}")
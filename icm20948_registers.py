@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Bank-Aware Register Access Layer
+Tracks the currently selected register bank so REG_BANK_SEL is only written
+when the bank actually changes, and keeps I2C transaction accounting
+
+Statistics are kept per bank and per register:
+- transactions: number of I2C transactions issued
+- bytes: payload bytes transferred (register pointer and bank byte excluded)
+- time_s: wall time spent inside bus calls
+- delay_s: time spent in settling delays after bank switches and writes
+
+If the bus object provides read_banked_block() (see icm20948_i2c.py), reads
+are issued as one combined transaction: bank select (only when the bank
+changes), register pointer and block read, with no settling delay.
+
+With retries > 0, a transaction that fails with a bus error (a transient
+NACK) is repeated, re-selecting the bank first since the cached bank is
+dropped on every error. Reads that pop data (FIFO_R_W) must pass
+retry=False: a failed read may already have consumed bytes.
+"""
+
+import time
+
+# Register bank select (present in every bank)
+REG_BANK_SEL = 0x7F
+
+# Largest block read supported by plain SMBus
+SMBUS_BLOCK_MAX = 32
+
+class ICM20948_RegisterBus:
+    """Bank-aware register access with per-bank and per-register accounting"""
+
+    def __init__(self, device, address, bank_switch_delay=0.002, write_delay=0.002, retries=0):
+        self.device = device              # smbus-compatible bus object
+        self.address = address
+        self.bank_switch_delay = bank_switch_delay
+        self.write_delay = write_delay
+        self.retries = retries            # Extra attempts per transaction after a bus error
+
+        # Currently selected bank (None = unknown, forces a bank write)
+        self.current_bank = None
+
+        # Combined bank-select + pointer + read transactions, if the bus supports them
+        self.combined_reads = hasattr(device, 'read_banked_block')
+        self.max_block_length = getattr(device, 'max_block_length', SMBUS_BLOCK_MAX)
+
+        self.reset_statistics()
+
+    def reset_statistics(self):
+        """Clear all transaction counters"""
+        self.bank_switches = 0
+        self.bank_switches_skipped = 0
+        self.retried = 0
+        self.bank_stats = {}
+        self.register_stats = {}
+
+    def invalidate_bank(self):
+        """Forget the cached bank (after a device reset or bus error)"""
+        self.current_bank = None
+
+    def _account(self, bank, register, nbytes, elapsed, delay=0.0):
+        """Record one I2C transaction"""
+        for stats, key in ((self.bank_stats, bank), (self.register_stats, (bank, register))):
+            entry = stats.get(key)
+            if entry is None:
+                entry = stats[key] = {'transactions': 0, 'bytes': 0, 'time_s': 0.0, 'delay_s': 0.0}
+            entry['transactions'] += 1
+            entry['bytes'] += nbytes
+            entry['time_s'] += elapsed
+            entry['delay_s'] += delay
+
+    def select_bank(self, bank):
+        """Select a register bank, skipping the write if it is already selected"""
+        if bank == self.current_bank:
+            self.bank_switches_skipped += 1
+            return
+
+        start = time.perf_counter()
+        try:
+            self.device.write_byte_data(self.address, REG_BANK_SEL, bank << 4)
+        except Exception:
+            self.invalidate_bank()
+            raise
+        elapsed = time.perf_counter() - start
+
+        if self.bank_switch_delay:
+            time.sleep(self.bank_switch_delay)
+
+        self.current_bank = bank
+        self.bank_switches += 1
+        self._account(bank, REG_BANK_SEL, 1, elapsed, self.bank_switch_delay)
+
+    def _retry(self, transaction, *args):
+        """Repeat a failed transaction up to self.retries times"""
+        for attempt in range(self.retries):
+            self.retried += 1
+            try:
+                return transaction(*args)
+            except OSError:
+                if attempt == self.retries - 1:
+                    raise
+
+    def write_register(self, bank, register, value):
+        """Write to a register in a specific bank"""
+        try:
+            self._write_register(bank, register, value)
+        except OSError:
+            if not self.retries:
+                raise
+            self._retry(self._write_register, bank, register, value)
+
+    def _write_register(self, bank, register, value):
+        self.select_bank(bank)
+
+        start = time.perf_counter()
+        try:
+            self.device.write_byte_data(self.address, register, value)
+        except Exception:
+            self.invalidate_bank()
+            raise
+        elapsed = time.perf_counter() - start
+
+        if self.write_delay:
+            time.sleep(self.write_delay)
+
+        self._account(bank, register, 1, elapsed, self.write_delay)
+
+    def _read_combined(self, bank, register, length):
+        """Bank select (if needed), pointer write and read as one bus transaction"""
+        switch = bank != self.current_bank
+        if not switch:
+            self.bank_switches_skipped += 1
+
+        start = time.perf_counter()
+        try:
+            data = self.device.read_banked_block(self.address, bank if switch else None,
+                                                 register, length)
+        except Exception:
+            self.invalidate_bank()
+            raise
+        elapsed = time.perf_counter() - start
+
+        if switch:
+            self.current_bank = bank
+            self.bank_switches += 1
+        self._account(bank, register, length, elapsed)
+
+        return data
+
+    def read_register(self, bank, register):
+        """Read from a register in a specific bank"""
+        try:
+            return self._read_register(bank, register)
+        except OSError:
+            if not self.retries:
+                raise
+            return self._retry(self._read_register, bank, register)
+
+    def _read_register(self, bank, register):
+        if self.combined_reads:
+            return self._read_combined(bank, register, 1)[0]
+
+        self.select_bank(bank)
+
+        start = time.perf_counter()
+        try:
+            value = self.device.read_byte_data(self.address, register)
+        except Exception:
+            self.invalidate_bank()
+            raise
+        self._account(bank, register, 1, time.perf_counter() - start)
+
+        return value
+
+    def read_registers(self, bank, start_register, length, retry=True):
+        """Read multiple registers in sequence
+
+        With a combined-transaction bus the result is a view into its
+        preallocated buffer, valid until the next read.
+        """
+        try:
+            return self._read_registers(bank, start_register, length)
+        except OSError:
+            if not (retry and self.retries):
+                raise
+            return self._retry(self._read_registers, bank, start_register, length)
+
+    def _read_registers(self, bank, start_register, length):
+        if self.combined_reads:
+            return self._read_combined(bank, start_register, length)
+
+        self.select_bank(bank)
+
+        start = time.perf_counter()
+        try:
+            data = self.device.read_i2c_block_data(self.address, start_register, length)
+        except Exception:
+            self.invalidate_bank()
+            raise
+        self._account(bank, start_register, length, time.perf_counter() - start)
+
+        return data
+
+    def get_statistics(self):
+        """Get a summary of I2C traffic since the last reset"""
+        totals = {'transactions': 0, 'bytes': 0, 'time_s': 0.0, 'delay_s': 0.0}
+        for entry in self.bank_stats.values():
+            for key in totals:
+                totals[key] += entry[key]
+
+        return {
+            'totals': totals,
+            'bank_switches': self.bank_switches,
+            'bank_switches_skipped': self.bank_switches_skipped,
+            'retried': self.retried,
+            'banks': {bank: dict(entry) for bank, entry in self.bank_stats.items()},
+            'registers': {f"B{bank}:0x{register:02X}": dict(entry)
+                          for (bank, register), entry in sorted(self.register_stats.items())}
+        }
+
+    def print_statistics(self, samples=None):
+        """Print I2C traffic summary, optionally normalized per sample"""
+        stats = self.get_statistics()
+        totals = stats['totals']
+
+        print("📊 I2C TRAFFIC SUMMARY")
+        print(f"   Transactions: {totals['transactions']}  Bytes: {totals['bytes']}  "
+              f"Bus time: {totals['time_s'] * 1000:.1f} ms  Delays: {totals['delay_s'] * 1000:.1f} ms")
+        print(f"   Bank switches: {stats['bank_switches']} "
+              f"(skipped {stats['bank_switches_skipped']} redundant)")
+        if stats['retried']:
+            print(f"   Retried after bus errors: {stats['retried']}")
+
+        if samples:
+            print(f"   Per sample: {totals['transactions'] / samples:.2f} transactions, "
+                  f"{totals['bytes'] / samples:.1f} bytes, "
+                  f"{(totals['time_s'] + totals['delay_s']) * 1e6 / samples:.0f} µs")
+
+        print("   Register     Trans   Bytes   Time (ms)")
+        for name, entry in stats['registers'].items():
+            print(f"   {name:<10} {entry['transactions']:7d} {entry['bytes']:7d} "
+                  f"{(entry['time_s'] + entry['delay_s']) * 1000:10.1f}")
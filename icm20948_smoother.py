@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Offline Rauch–Tung–Striebel Smoother
+Best (non-causal) attitude and gyro bias tracks for a recorded session
+
+- Forward pass: ICM20948_EKF over a SampleLogger file, predicting on every
+  sample and updating once per update_interval as in the live loop. Per
+  update epoch the predicted and updated state, the two covariances (upper
+  triangles) and the epoch's transition F (attitude rows) are written to a
+  .npy record file
+- Backward pass: RTS recursion from the last epoch to the first, reading the
+  forward records in reverse chunks; the gains of a whole chunk are solved
+  in one batched call
+- The log, the forward records and the output are memory-mapped and
+  processed chunk by chunk, so memory use is bounded by chunk_size whatever
+  the length of the recording
+
+An Euler unwrap flip (roll and pitch jumping by 180°) is not a linear step;
+the smoother restarts from the filtered estimate at such an epoch.
+
+Usage:
+    smoother = RTSSmoother("icm20948_raw_calibration.json")
+    tracks = smoother.smooth("session.bin")     # → session.bin.smoothed.npy
+    roll_deg = np.degrees(tracks['state'][:, 0])
+"""
+
+import copy
+import math
+import os
+import sys
+import numpy as np
+
+try:
+    from icm20948_ekf import ICM20948_EKF
+except ImportError:
+    print("ERROR: Could not import ICM20948_EKF")
+    print("Make sure icm20948_ekf.py is in the same directory")
+    sys.exit(1)
+
+from icm20948_acquisition import load_sample_log
+from icm20948_decode import sample_scales, scale_samples
+from icm20948_ned_corrected import TEMP_SENSITIVITY, TEMP_OFFSET_C
+
+# One forward-pass epoch: covariances as the 21 upper-triangle entries, F as
+# its attitude rows (the bias rows are always [0 | I])
+FORWARD_DTYPE = np.dtype([
+    ('timestamp_ns', np.int64),       # Last sample of the epoch
+    ('x_pred', np.float64, (6,)),
+    ('P_pred', np.float64, (21,)),
+    ('x_filt', np.float64, (6,)),
+    ('P_filt', np.float64, (21,)),
+    ('F', np.float64, (3, 6)),        # Transition from the previous epoch
+    ('restart', np.bool_),            # First epoch, or an Euler unwrap flip
+])
+
+# One smoothed epoch: [roll, pitch, yaw, bias_x, bias_y, bias_z] in rad, rad/s
+SMOOTHED_DTYPE = np.dtype([
+    ('timestamp_ns', np.int64),
+    ('state', np.float64, (6,)),
+    ('std', np.float64, (6,)),
+])
+
+TRIU_ROWS, TRIU_COLS = np.triu_indices(6)
+
+def pack_covariance(P):
+    """(..., 6, 6) symmetric → (..., 21) upper triangle"""
+    return P[..., TRIU_ROWS, TRIU_COLS]
+
+def unpack_covariance(packed):
+    """(..., 21) upper triangle → (..., 6, 6) symmetric"""
+    P = np.empty(packed.shape[:-1] + (6, 6))
+    P[..., TRIU_ROWS, TRIU_COLS] = packed
+    P[..., TRIU_COLS, TRIU_ROWS] = packed
+    return P
+
+def wrap_attitude(x):
+    """Normalize the three angle states of a state or state difference to [-pi, pi]"""
+    x[..., 0:3] = np.mod(x[..., 0:3] + math.pi, 2 * math.pi) - math.pi
+    return x
+
+class LogReplaySensor:
+    """Stands in for ICM20948_NED_Corrected when the filter reads a SampleLogger file
+
+    Provides the scale factors from the log's JSON sidecar and the unit
+    conversions the EKF uses on raw records.
+    """
+
+    def __init__(self, metadata):
+        self.accel_scale = metadata['accel_scale']
+        self.gyro_scale = metadata['gyro_scale']
+        self.mag_scale = metadata['mag_scale']
+        self.sample_rate_hz = metadata['sample_rate_hz']
+        self.sample_scales = sample_scales(self.accel_scale, self.gyro_scale)
+        self.cold_start_ns = None         # No live sensor start-up to time
+
+    def samples_to_physical(self, samples):
+        """Raw (N, 6) accel/gyro counts to g and °/s"""
+        return scale_samples(samples, self.sample_scales)
+
+    def temperature_to_celsius(self, raw):
+        """Convert raw TEMP_OUT counts to °C"""
+        return raw / TEMP_SENSITIVITY + TEMP_OFFSET_C
+
+    def close(self):
+        """Nothing to release"""
+
+class RTSSmoother:
+    """Forward EKF plus backward Rauch–Tung–Striebel pass over a recorded log"""
+
+    def __init__(self, calibration_file="icm20948_raw_calibration.json", template=None,
+                 update_interval=0.02, chunk_size=65536):
+        self.calibration_file = calibration_file
+        self.template = template              # Tuned ICM20948_EKF (imu=None) to copy per run
+        self.update_interval = update_interval  # Seconds of samples per filter update
+        self.chunk_size = chunk_size          # Log samples held in memory at once
+        self.stats = {}
+
+    def create_filter(self, metadata):
+        """Fresh forward filter reading from the log, with calibration loaded"""
+        if self.template is not None:
+            ekf = copy.deepcopy(self.template)
+            ekf.calibration_file = self.calibration_file
+            ekf.checkpoint_file = None        # A recording starts from its own data, not a live warm start
+        else:
+            ekf = ICM20948_EKF(self.calibration_file, checkpoint_file=None)
+        ekf.imu = LogReplaySensor(metadata)
+        if ekf.calibration_data is None and not ekf.initialize():
+            return None
+        return ekf
+
+    def smooth(self, log_path, output_path=None, keep_forward=False):
+        """Smooth a SampleLogger recording; returns the SMOOTHED_DTYPE records (memory-mapped)
+
+        Writes <output_path> (default <log_path>.smoothed.npy) and, while
+        running, <output_path>.forward.npy with the forward-pass records.
+        """
+        records, metadata = load_sample_log(log_path)
+        if metadata is None:
+            print(f"❌ {log_path}.json not found: the log needs its scale factors and sample rate")
+            return None
+        if len(records) == 0:
+            print(f"❌ {log_path} holds no samples")
+            return None
+
+        ekf = self.create_filter(metadata)
+        if ekf is None:
+            return None
+
+        output_path = output_path or log_path + '.smoothed.npy'
+        forward_path = output_path + '.forward.npy'
+        samples_per_epoch = max(1, int(round(self.update_interval * metadata['sample_rate_hz'])))
+        self.stats = {'samples': len(records), 'epochs': 0, 'restarts': 0}
+
+        forward = self.forward_pass(ekf, records, samples_per_epoch, forward_path)
+        smoothed = self.backward_pass(forward, max(1, self.chunk_size // samples_per_epoch), output_path)
+
+        del forward
+        if not keep_forward:
+            os.remove(forward_path)
+        return smoothed
+
+    def forward_pass(self, ekf, records, samples_per_epoch, path):
+        """Run the filter over the log, one FORWARD_DTYPE record per update epoch"""
+        epochs = -(-len(records) // samples_per_epoch)
+        forward = np.lib.format.open_memmap(path, mode='w+', dtype=FORWARD_DTYPE, shape=(epochs,))
+
+        chunk_epochs = max(1, self.chunk_size // samples_per_epoch)
+        buffer = np.zeros(chunk_epochs, dtype=FORWARD_DTYPE)
+        epoch = restarts = 0
+        for start in range(0, len(records), chunk_epochs * samples_per_epoch):
+            block = np.array(records[start:start + chunk_epochs * samples_per_epoch])
+            count = 0
+            for offset in range(0, len(block), samples_per_epoch):
+                self.forward_step(ekf, block[offset:offset + samples_per_epoch], buffer[count])
+                count += 1
+            forward[epoch:epoch + count] = buffer[:count]
+            epoch += count
+            restarts += int(np.count_nonzero(buffer['restart'][:count]))
+
+        forward.flush()
+        self.stats['epochs'] = epochs
+        self.stats['restarts'] = restarts - 1      # The first epoch always starts a segment
+        return forward
+
+    def forward_step(self, ekf, batch, record):
+        """Predict through one epoch of samples, update once, and fill record"""
+        timestamps, accel_ned, gyro_ned, mag_ned, mag_valid = ekf.read_ring_batch(batch)
+
+        if not ekf.initialized:
+            ekf.initialize_state(accel_ned.mean(axis=0), mag_ned, mag_valid)
+            record['x_pred'] = ekf.state
+            record['P_pred'] = pack_covariance(ekf.P)
+            record['F'] = np.eye(6)[0:3]
+            record['restart'] = True
+        else:
+            previous_roll, previous_pitch = ekf.state[0:2].tolist()
+            transition = np.eye(6)
+            dts = np.diff(timestamps, prepend=ekf.last_sample_ns) * 1e-9
+            for gyro, dt in zip(gyro_ned, dts):
+                F = ekf.predict(gyro, dt)
+                if F is not None:
+                    transition = np.dot(F, transition)
+            record['x_pred'] = ekf.state
+            record['P_pred'] = pack_covariance(ekf.P)
+            record['F'] = transition[0:3]
+
+            ekf.update_accelerometer(accel_ned.mean(axis=0))
+            if mag_valid:
+                ekf.update_magnetometer(mag_ned)
+
+            # An unwrap flip moves roll and pitch by ~180°; real motion in one epoch cannot
+            roll, pitch = ekf.state[0:2].tolist()
+            record['restart'] = (abs(ekf.normalize_angle(roll - previous_roll)) > math.pi / 2 or
+                                 abs(ekf.normalize_angle(pitch - previous_pitch)) > math.pi / 2)
+
+        ekf.last_sample_ns = int(timestamps[-1])
+        record['timestamp_ns'] = timestamps[-1]
+        record['x_filt'] = ekf.state
+        record['P_filt'] = pack_covariance(ekf.P)
+
+    def backward_pass(self, forward, chunk_epochs, path):
+        """RTS recursion over the forward records, newest chunk first
+
+        For epoch k with the forward records of k + 1:
+            C = P_filt[k] Fᵀ P_pred[k+1]⁻¹
+            x[k] = x_filt[k] + C (x[k+1] - x_pred[k+1])
+            P[k] = P_filt[k] + C (P[k+1] - P_pred[k+1]) Cᵀ
+        """
+        epochs = len(forward)
+        smoothed = np.lib.format.open_memmap(path, mode='w+', dtype=SMOOTHED_DTYPE, shape=(epochs,))
+        buffer = np.zeros(chunk_epochs, dtype=SMOOTHED_DTYPE)
+
+        x_smooth = P_smooth = None
+        following = None                 # Forward record of the epoch after this chunk
+        for end in range(epochs, 0, -chunk_epochs):
+            start = max(0, end - chunk_epochs)
+            block = np.array(forward[start:end])
+            count = len(block)
+            x_filt = block['x_filt']
+            P_filt = unpack_covariance(block['P_filt'])
+
+            # Records k + 1 for every k in the chunk that has a successor
+            successors = block[1:] if following is None else np.concatenate((block[1:], following[None]))
+            linked = len(successors)
+            x_pred = successors['x_pred']
+            P_pred = unpack_covariance(successors['P_pred'])
+            F = np.tile(np.eye(6), (linked, 1, 1))
+            F[:, 0:3, :] = successors['F']
+
+            # All gains of the chunk at once: C = (P_pred⁻¹ F P_filt)ᵀ, P_pred and P_filt symmetric
+            gains = np.linalg.solve(P_pred, F @ P_filt[:linked]).transpose(0, 2, 1)
+
+            for j in range(count - 1, -1, -1):
+                if j >= linked or successors['restart'][j]:
+                    x_smooth = x_filt[j].copy()
+                    P_smooth = P_filt[j]
+                else:
+                    C = gains[j]
+                    x_smooth = wrap_attitude(x_filt[j] + C @ wrap_attitude(x_smooth - x_pred[j]))
+                    P_smooth = P_filt[j] + C @ (P_smooth - P_pred[j]) @ C.T
+                buffer[j] = (block['timestamp_ns'][j], x_smooth, np.sqrt(np.diagonal(P_smooth)))
+
+            smoothed[start:end] = buffer[:count]
+            following = block[0]
+
+        smoothed.flush()
+        return smoothed
+
+    def print_summary(self, smoothed):
+        """Print the size of the run and the start/end of the smoothed tracks"""
+        stats = self.stats
+        duration = (int(smoothed['timestamp_ns'][-1]) - int(smoothed['timestamp_ns'][0])) * 1e-9
+        print("🧽 RTS SMOOTHER")
+        print(f"   {stats['samples']} samples, {stats['epochs']} epochs over {duration:.1f} s, "
+              f"{stats['restarts']} unwrap restarts")
+        for label, record in (("Start", smoothed[0]), ("End", smoothed[-1])):
+            roll, pitch, yaw, bias_x, bias_y, bias_z = np.degrees(record['state'])
+            print(f"   {label:5s}: Roll={roll:+5.1f}°, Pitch={pitch:+5.1f}°, Yaw={yaw:+6.1f}°, "
+                  f"Biases=[{bias_x:+.2f}, {bias_y:+.2f}, {bias_z:+.2f}]°/s")
+        roll_std, pitch_std, yaw_std = np.degrees(np.mean(smoothed['std'][:, 0:3], axis=0))
+        print(f"   Mean uncertainty: Roll ±{roll_std:.2f}°, Pitch ±{pitch_std:.2f}°, Yaw ±{yaw_std:.2f}°")
+
+def main():
+    """Smooth the log given on the command line"""
+    if len(sys.argv) < 2:
+        print("Usage: python3 icm20948_smoother.py <sample log> [calibration file]")
+        return
+
+    calibration_file = sys.argv[2] if len(sys.argv) > 2 else "icm20948_raw_calibration.json"
+    smoother = RTSSmoother(calibration_file)
+    smoothed = smoother.smooth(sys.argv[1])
+    if smoothed is not None:
+        smoother.print_summary(smoothed)
+        print(f"💾 Smoothed tracks saved to {sys.argv[1]}.smoothed.npy")
+
+if __name__ == "__main__":
+    main()
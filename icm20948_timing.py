@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+ICM20948 Sample Timing
+Timestamps derived from the sensor's own ODR and FIFO sample counts,
+disciplined against the host's time.monotonic_ns
+
+Sample k of a FIFO drain is stamped last + k * period, so consecutive
+samples are exactly one (estimated) sensor period apart regardless of
+I2C latency or scheduling jitter on the host. The host clock only steers
+the phase and the period estimate:
+
+- A sample can never be produced after the host saw it counted in the FIFO,
+  so timestamps that run ahead of the read time are pulled back quickly
+  (by at most a quarter period per drain, keeping dt close to the period)
+- Lag behind the read time (read latency + jitter) is corrected slowly
+- The period is measured over a long baseline (samples counted between two
+  FIFO reads far apart), following the sensor oscillator's deviation from
+  nominal, bounded to max_drift
+"""
+
+import time
+import numpy as np
+
+class SampleClock:
+    """Sensor-clock-derived timestamps for FIFO samples"""
+
+    def __init__(self, odr_hz, phase_gain=0.002, max_drift=0.02, resync_periods=8,
+                 min_baseline_s=2.0):
+        self.nominal_period_ns = 1e9 / odr_hz
+        self.period_ns = self.nominal_period_ns
+        self.phase_gain = phase_gain
+        self.max_drift = max_drift
+        self.resync_periods = resync_periods
+        self.min_baseline_ns = min_baseline_s * 1e9
+
+        self.last_ns = None       # Timestamp assigned to the newest sample
+        self.anchor_ns = None     # Read time the period baseline starts from
+        self.anchor_samples = 0   # Samples drained since the anchor
+        self.resyncs = 0
+
+    def reset(self):
+        """Forget the phase (after FIFO reset or overflow); keep the period estimate"""
+        self.last_ns = None
+        self.anchor_ns = None
+        self.anchor_samples = 0
+
+    def timestamp_samples(self, count, read_ns=None):
+        """Timestamps (int64 ns, monotonic clock) for count samples just drained
+
+        read_ns is the host time at which the samples were known to be in
+        the FIFO (e.g. right after FIFO_COUNT was read).
+        """
+        if read_ns is None:
+            read_ns = time.monotonic_ns()
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        if self.last_ns is None:
+            # First drain: assume the newest sample was produced at read time
+            self.last_ns = read_ns - count * self.period_ns
+            self.anchor_ns = read_ns
+            self.anchor_samples = 0
+        else:
+            error_ns = read_ns - (self.last_ns + count * self.period_ns)
+            self.anchor_samples += count
+
+            if abs(error_ns) > (self.resync_periods + count * self.max_drift) * self.period_ns:
+                # Gap (lost samples, stalled host): re-anchor phase and baseline
+                self.last_ns = read_ns - count * self.period_ns
+                self.anchor_ns = read_ns
+                self.anchor_samples = 0
+                self.resyncs += 1
+            else:
+                # Steer phase: fast if ahead of the host, gentle if behind
+                if error_ns < 0:
+                    self.last_ns += max(error_ns, -0.25 * self.period_ns)
+                else:
+                    self.last_ns += self.phase_gain * error_ns
+
+                # Period from the long baseline between anchor and now
+                baseline_ns = read_ns - self.anchor_ns
+                if baseline_ns >= self.min_baseline_ns and self.anchor_samples:
+                    low = self.nominal_period_ns * (1.0 - self.max_drift)
+                    high = self.nominal_period_ns * (1.0 + self.max_drift)
+                    self.period_ns = min(high, max(low, baseline_ns / self.anchor_samples))
+
+        timestamps = self.last_ns + self.period_ns * np.arange(1, count + 1)
+        self.last_ns = float(timestamps[-1])
+
+        return timestamps.astype(np.int64)
+
+    @property
+    def odr_hz(self):
+        """Current estimate of the sensor's actual output data rate"""
+        return 1e9 / self.period_ns
@@ -6,88 +6,28 @@ Interactive test to confirm sensor orientation is working correctly
 """
 
 import time
-import sys
 import math
 
-try:
-    import smbus
-except ImportError:
-    print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
-    sys.exit(1)
-
-# ICM20948 Configuration
-ICM20948_ADDRESS = 0x69
-I2C_BUS = 1
+from icm20948_ned_sensor import ICM20948_NED
 
 def setup_icm20948():
-    """Basic ICM20948 setup"""
-    bus = smbus.SMBus(I2C_BUS)
-    
-    # Set bank 0
-    bus.write_byte_data(ICM20948_ADDRESS, 0x7F, 0x00)
-    time.sleep(0.01)
-    
-    # Wake up device
-    bus.write_byte_data(ICM20948_ADDRESS, 0x06, 0x01)
-    time.sleep(0.01)
-    
-    # Enable accel and gyro
-    bus.write_byte_data(ICM20948_ADDRESS, 0x07, 0x00)
-    time.sleep(0.01)
-    
-    return bus
+    """Basic ICM20948 setup (shared driver core, X_ned = +Y_sensor mapping)"""
+    return ICM20948_NED()
 
-def read_sensors_ned(bus):
-    """Read sensors and apply NED transformation"""
-    bus.write_byte_data(ICM20948_ADDRESS, 0x7F, 0x00)
-    time.sleep(0.001)
-    
-    # Read accelerometer data
-    accel_data = bus.read_i2c_block_data(ICM20948_ADDRESS, 0x2D, 6)
-    
-    # Read gyroscope data
-    gyro_data = bus.read_i2c_block_data(ICM20948_ADDRESS, 0x33, 6)
-    
-    def to_signed16(high, low):
-        value = (high << 8) | low
-        return value - 65536 if value > 32767 else value
-    
-    # Convert accelerometer raw values
-    accel_x_raw = to_signed16(accel_data[0], accel_data[1])
-    accel_y_raw = to_signed16(accel_data[2], accel_data[3])
-    accel_z_raw = to_signed16(accel_data[4], accel_data[5])
-    
-    # Convert gyroscope raw values
-    gyro_x_raw = to_signed16(gyro_data[0], gyro_data[1])
-    gyro_y_raw = to_signed16(gyro_data[2], gyro_data[3])
-    gyro_z_raw = to_signed16(gyro_data[4], gyro_data[5])
+def read_sensors_ned(imu):
+    """Read sensors in one burst and apply NED transformation"""
+    sample = imu.read_all_raw()
     
     # Convert to physical units
-    accel_scale = 2.0 / 32768.0  # ±2g scale
-    gyro_scale = 250.0 / 32768.0  # ±250°/s scale
-    
-    accel_x_sensor = accel_x_raw * accel_scale
-    accel_y_sensor = accel_y_raw * accel_scale
-    accel_z_sensor = accel_z_raw * accel_scale
-    
-    gyro_x_sensor = gyro_x_raw * gyro_scale
-    gyro_y_sensor = gyro_y_raw * gyro_scale
-    gyro_z_sensor = gyro_z_raw * gyro_scale
+    accel_sensor = tuple(x * imu.accel_scale for x in sample.accel)
+    gyro_sensor = tuple(x * imu.gyro_scale for x in sample.gyro)
     
     # Apply NED transformation: X=North, Y=East, Z=Down
-    accel_x_ned = +accel_y_sensor  # FORWARD → North (X-axis in NED)
-    accel_y_ned = +accel_x_sensor  # RIGHT → East (Y-axis in NED)
-    accel_z_ned = -accel_z_sensor  # UP → Down (Z-axis in NED, negated)
-    
-    gyro_x_ned = +gyro_y_sensor    # FORWARD rotation → North (X-axis in NED)
-    gyro_y_ned = +gyro_x_sensor    # RIGHT rotation → East (Y-axis in NED)
-    gyro_z_ned = -gyro_z_sensor    # UP rotation → Down (Z-axis in NED, negated)
-    
     return {
-        'accel_sensor': (accel_x_sensor, accel_y_sensor, accel_z_sensor),
-        'accel_ned': (accel_x_ned, accel_y_ned, accel_z_ned),
-        'gyro_sensor': (gyro_x_sensor, gyro_y_sensor, gyro_z_sensor),
-        'gyro_ned': (gyro_x_ned, gyro_y_ned, gyro_z_ned)
+        'accel_sensor': accel_sensor,
+        'accel_ned': imu.accel_raw_to_ned(sample.accel),
+        'gyro_sensor': gyro_sensor,
+        'gyro_ned': imu.gyro_raw_to_ned(sample.gyro)
     }
 
 def determine_orientation_ned(accel_ned):
@@ -141,7 +81,7 @@ def interactive_orientation_test():
     print()
     
     try:
-        bus = setup_icm20948()
+        imu = setup_icm20948()
         print("✓ ICM20948 initialized")
         print()
         
@@ -188,7 +128,7 @@ def interactive_orientation_test():
             
             # Take measurement
             time.sleep(0.5)  # Allow sensor to stabilize
-            data = read_sensors_ned(bus)
+            data = read_sensors_ned(imu)
             accel_ned = data['accel_ned']
             orientation = determine_orientation_ned(accel_ned)
             
@@ -244,14 +184,14 @@ def continuous_monitoring_mode():
     print()
     
     try:
-        bus = setup_icm20948()
+        imu = setup_icm20948()
         
         print("Accelerometer (g)     Gyroscope (°/s)      Orientation")
         print("N      E      D       N      E      D")
         print("-" * 60)
         
         while True:
-            data = read_sensors_ned(bus)
+            data = read_sensors_ned(imu)
             accel_ned = data['accel_ned']
             gyro_ned = data['gyro_ned']
             orientation = determine_orientation_ned(accel_ned)
@@ -25,8 +25,8 @@ except ImportError:
 class CalibratedOrientationCalculator:
     """Calculate orientation using properly calibrated sensor data"""
     
-    def __init__(self, calibration_file="icm20948_raw_calibration.json"):
-        self.imu = None
+    def __init__(self, calibration_file="icm20948_raw_calibration.json", imu=None):
+        self.imu = imu  # Pre-configured ICM20948_NED_Corrected, or None to create one
         self.calibration_data = None
         self.calibration_file = calibration_file
         
@@ -36,6 +36,7 @@ class CalibratedOrientationCalculator:
         self.gyro_yaw = 0.0
         self.last_time = None
         self.gyro_initialized = False
+        self.display_interval = 0.1           # Seconds between terminal updates
         
         # Magnetic declination (adjust for your location)
         # Example: For most of US, declination is between -20° to +20°
@@ -47,7 +48,8 @@ class CalibratedOrientationCalculator:
         
         # Initialize sensor
         try:
-            self.imu = ICM20948_NED_Corrected()
+            if self.imu is None:
+                self.imu = ICM20948_NED_Corrected()
             print("✅ ICM20948 initialized")
         except Exception as e:
             print(f"❌ Failed to initialize sensor: {e}")
@@ -80,9 +82,11 @@ class CalibratedOrientationCalculator:
         """Read raw sensors, apply calibration, transform to NED"""
         
         # Step 1: Read RAW sensor data
-        accel_raw = self.imu.read_accelerometer_raw()
-        gyro_raw = self.imu.read_gyroscope_raw()
-        mag_raw_x, mag_raw_y, mag_raw_z, mag_valid = self.imu.read_magnetometer_raw()
+        sample = self.imu.read_all_raw()  # Accel + gyro + mag in one burst
+        accel_raw = sample.accel
+        gyro_raw = sample.gyro
+        mag_raw_x, mag_raw_y, mag_raw_z = sample.mag
+        mag_valid = sample.mag_valid
         
         # Step 2: Convert to physical units
         accel_raw_g = [x * self.imu.accel_scale for x in accel_raw]
@@ -350,6 +354,7 @@ class CalibratedOrientationCalculator:
         print("-" * 70)
         
         self.last_time = time.time()
+        last_display = 0.0
         
         try:
             while True:
@@ -395,13 +400,15 @@ class CalibratedOrientationCalculator:
                     print(f"\n❓ Unknown command: '{user_input}'. Type 'h' for help.\n")
                     continue
                 
-                # Display results
-                print(f"{accel_roll:+5.1f} {accel_pitch:+5.1f}           "
-                      f"{mag_yaw_str}              "
-                      f"{gyro_roll:+5.1f} {gyro_pitch:+5.1f} {gyro_yaw:6.1f}", 
-                      end="\r")
+                # Display results at display_interval; with an interrupt the loop runs at the ODR
+                if current_time - last_display >= self.display_interval:
+                    last_display = current_time
+                    print(f"{accel_roll:+5.1f} {accel_pitch:+5.1f}           "
+                          f"{mag_yaw_str}              "
+                          f"{gyro_roll:+5.1f} {gyro_pitch:+5.1f} {gyro_yaw:6.1f}", 
+                          end="\r")
                 
-                time.sleep(0.1)  # 10Hz update rate
+                self.imu.wait_for_data(0.1)  # DATA_RDY interrupt, or 10Hz polling
                 
         except KeyboardInterrupt:
             print("\n\n🎯 Orientation calculation stopped!")
@@ -5,68 +5,20 @@ Simple script to verify accelerometer and gyroscope orientation
 """
 
 import time
-import sys
 import math
 
-try:
-    import smbus
-except ImportError:
-    print("ERROR: smbus not found. Install with: sudo apt-get install python3-smbus")
-    sys.exit(1)
-
-# ICM20948 Configuration
-ICM20948_ADDRESS = 0x69  # Your device address
-I2C_BUS = 1
+from icm20948_ned_corrected import ICM20948_NED_Corrected
 
 def setup_icm20948():
-    """Basic ICM20948 setup"""
-    bus = smbus.SMBus(I2C_BUS)
-    
-    # Set bank 0
-    bus.write_byte_data(ICM20948_ADDRESS, 0x7F, 0x00)
-    time.sleep(0.01)
-    
-    # Wake up device
-    bus.write_byte_data(ICM20948_ADDRESS, 0x06, 0x01)
-    time.sleep(0.01)
-    
-    # Enable accel and gyro
-    bus.write_byte_data(ICM20948_ADDRESS, 0x07, 0x00)
-    time.sleep(0.01)
-    
-    return bus
+    """Basic ICM20948 setup (shared driver core)"""
+    return ICM20948_NED_Corrected()
 
-def read_sensors(bus):
-    """Read accelerometer and gyroscope data"""
-    # Set bank 0
-    bus.write_byte_data(ICM20948_ADDRESS, 0x7F, 0x00)
-    time.sleep(0.001)
-    
-    # Read accel data (6 bytes starting at 0x2D)
-    accel_data = bus.read_i2c_block_data(ICM20948_ADDRESS, 0x2D, 6)
-    
-    # Read gyro data (6 bytes starting at 0x33)
-    gyro_data = bus.read_i2c_block_data(ICM20948_ADDRESS, 0x33, 6)
-    
-    # Convert to signed 16-bit values
-    def to_signed16(high, low):
-        value = (high << 8) | low
-        return value - 65536 if value > 32767 else value
-    
-    accel_x = to_signed16(accel_data[0], accel_data[1])
-    accel_y = to_signed16(accel_data[2], accel_data[3])
-    accel_z = to_signed16(accel_data[4], accel_data[5])
-    
-    gyro_x = to_signed16(gyro_data[0], gyro_data[1])
-    gyro_y = to_signed16(gyro_data[2], gyro_data[3])
-    gyro_z = to_signed16(gyro_data[4], gyro_data[5])
-    
-    # Convert to physical units
-    accel_scale = 2.0 / 32768.0  # ±2g range
-    gyro_scale = 250.0 / 32768.0  # ±250°/s range
+def read_sensors(imu):
+    """Read accelerometer and gyroscope data (sensor frame) in one burst"""
+    sample = imu.read_all_raw()
     
-    accel_g = (accel_x * accel_scale, accel_y * accel_scale, accel_z * accel_scale)
-    gyro_dps = (gyro_x * gyro_scale, gyro_y * gyro_scale, gyro_z * gyro_scale)
+    accel_g = tuple(x * imu.accel_scale for x in sample.accel)
+    gyro_dps = tuple(x * imu.gyro_scale for x in sample.gyro)
     
     return accel_g, gyro_dps
 
@@ -105,7 +57,7 @@ def main():
     
     try:
         # Setup sensor
-        bus = setup_icm20948()
+        imu = setup_icm20948()
         print("✓ ICM20948 initialized")
         
         print("\nTEST INSTRUCTIONS (NED Coordinate System):")
@@ -122,7 +74,7 @@ def main():
         
         while True:
             # Read sensor data
-            accel_g, gyro_dps = read_sensors(bus)
+            accel_g, gyro_dps = read_sensors(imu)
             
             # Calculate total acceleration magnitude
             accel_magnitude = math.sqrt(sum(x*x for x in accel_g))
@@ -0,0 +1,46 @@
+"""BatchedEKF against a loop of ICM20948_EKF objects"""
+
+import numpy as np
+
+from icm20948_batch import BatchedEKF
+from icm20948_ekf import ICM20948_EKF
+from icm20948_emulator import SimulatedI2CBus
+from icm20948_ned_corrected import ICM20948_NED_Corrected
+
+def make_filters(imu, n):
+    """Initialized filters with varied tuning; the last one has a previous timestamp"""
+    filters = []
+    for i in range(n):
+        ekf = ICM20948_EKF(imu=imu, checkpoint_file=None)
+        ekf.Q[0:3, 0:3] *= 1.0 + i
+        ekf.initialize_state(np.array([0.0, 0.0, 1.0]), np.array([20.0, 0.0, 40.0]), True)
+        filters.append(ekf)
+    filters[-1].last_sample_ns = 10**12 - 5_000_000
+    return filters
+
+def test_batch_matches_single_filters():
+    imu = ICM20948_NED_Corrected(bus=SimulatedI2CBus())
+    n, samples = 3, 20
+    rng = np.random.default_rng(0)
+
+    singles = make_filters(imu, n)
+    bank = BatchedEKF.from_filters(make_filters(imu, n))
+
+    start_ns = 10**12
+    for batch in range(5):
+        timestamps = start_ns + np.arange(samples, dtype=np.int64) * 888_889
+        timestamps = np.tile(timestamps, (n, 1))
+        accel = np.array([0.0, 0.0, 1.0]) + rng.normal(0.0, 0.01, (n, samples, 3))
+        gyro = rng.normal(0.0, 0.2, (n, samples, 3))
+        mag = np.array([20.0, 1.0, 40.0]) + rng.normal(0.0, 0.5, (n, 3))
+        mag_valid = np.array([True, batch % 2 == 0, True])
+
+        bank.process_batch(timestamps, accel, gyro, mag, mag_valid)
+        for i, ekf in enumerate(singles):
+            ekf.process_batch(timestamps[i], accel[i], gyro[i], mag[i], bool(mag_valid[i]))
+        start_ns = int(timestamps[0, -1]) + 888_889
+
+    for i, ekf in enumerate(singles):
+        np.testing.assert_allclose(bank.state[i], ekf.state, atol=1e-9)
+        np.testing.assert_allclose(bank.P[i], ekf.P, atol=1e-12)
+        assert bank.last_sample_ns[i] == ekf.last_sample_ns
@@ -0,0 +1,40 @@
+"""Driver behaviour against the simulated ICM20948/AK09916"""
+
+import math
+import time
+
+from icm20948_emulator import SimulatedI2CBus, SimulatedICM20948, yaw_rotation_motion
+from icm20948_ned_corrected import ICM20948_NED_Corrected
+
+def test_fifo_streams_after_magnetometer_reinit():
+    imu = ICM20948_NED_Corrected(bus=SimulatedI2CBus())
+    imu.enable_fifo()
+    assert imu.reinitialize_magnetometer()
+
+    # The first drain may report the overflow from the slow re-init
+    counts = []
+    for _ in range(3):
+        time.sleep(0.02)
+        counts.append(len(imu.read_fifo_raw()))
+    assert counts[-1] > 0
+    assert imu._read_register(0, 0x03) & 0x40      # USER_CTRL.FIFO_EN
+
+def test_magnetometer_follows_gyro_under_rotation():
+    # A clock far from zero, like time.monotonic() on a machine that has been up a while
+    rate_dps = 90.0
+    device = SimulatedICM20948(motion=yaw_rotation_motion(rate_dps), mag_noise_ut=0.0,
+                               clock=lambda: time.monotonic() + 4300.0)
+    imu = ICM20948_NED_Corrected(bus=SimulatedI2CBus({0x69: device}))
+    assert imu.mag_initialized
+
+    time.sleep(0.3)
+    now = device.clock()
+    data = device.magnetometer.read(0x11, 6, now)
+    mag_x = int.from_bytes(data[0:2], 'little', signed=True)
+    mag_y = int.from_bytes(data[2:4], 'little', signed=True)
+
+    # Heading of the sensor-frame field vs the yaw the constant gyro rate integrates to
+    heading = math.degrees(math.atan2(mag_y, -mag_x))
+    expected = rate_dps * (now - device.motion_origin)
+    error = (heading - expected + 180.0) % 360.0 - 180.0
+    assert abs(error) < rate_dps / imu.mag_odr + 1.0
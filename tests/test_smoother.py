@@ -0,0 +1,55 @@
+"""RTSSmoother results must not depend on how the log is chunked"""
+
+import json
+
+import numpy as np
+
+from icm20948_acquisition import SAMPLE_DTYPE
+from icm20948_smoother import RTSSmoother
+
+ACCEL_SCALE = 1.0 / 16384.0      # g per LSB at ±2g
+GYRO_SCALE = 250.0 / 32768.0     # °/s per LSB at ±250°/s
+MAG_SCALE = 4912.0 / 32752.0     # µT per LSB
+SAMPLE_RATE_HZ = 1125.0
+
+def write_log(path, samples=4000, seed=0):
+    """Synthetic SampleLogger file: level sensor turning slowly, noisy, with gyro bias"""
+    rng = np.random.default_rng(seed)
+    records = np.zeros(samples, dtype=SAMPLE_DTYPE)
+    records['timestamp_ns'] = 10**12 + np.arange(samples, dtype=np.int64) * int(1e9 / SAMPLE_RATE_HZ)
+
+    accel = np.array([0.0, 0.0, -1.0]) + rng.normal(0.0, 0.01, (samples, 3))
+    records['accel'] = np.round(accel / ACCEL_SCALE)
+    gyro = np.array([0.5, -0.3, 5.0]) + rng.normal(0.0, 0.1, (samples, 3))
+    records['gyro'] = np.round(gyro / GYRO_SCALE)
+    records['temperature'] = 1335
+
+    yaw = np.radians(5.0 * np.arange(samples) / SAMPLE_RATE_HZ)
+    mag = np.stack((-20.0 * np.cos(yaw), 20.0 * np.sin(yaw), np.full(samples, -40.0)), axis=1)
+    records['mag'] = np.round((mag + rng.normal(0.0, 0.3, (samples, 3))) / MAG_SCALE)
+    records['mag_valid'] = np.arange(samples) % 22 == 0
+
+    records.tofile(path)
+    with open(path + '.json', 'w') as f:
+        json.dump({'dtype': SAMPLE_DTYPE.descr, 'accel_scale': ACCEL_SCALE, 'gyro_scale': GYRO_SCALE,
+                   'mag_scale': MAG_SCALE, 'sample_rate_hz': SAMPLE_RATE_HZ}, f)
+
+def test_smoother_is_chunk_size_invariant(tmp_path):
+    calibration_file = str(tmp_path / 'calibration.json')
+    with open(calibration_file, 'w') as f:
+        json.dump({'coordinate_system': 'raw_sensor_coordinates'}, f)
+    log_path = str(tmp_path / 'session.bin')
+    write_log(log_path)
+
+    results = {}
+    for chunk_size in (65536, 500, 37):
+        smoother = RTSSmoother(calibration_file, chunk_size=chunk_size)
+        tracks = smoother.smooth(log_path, output_path=str(tmp_path / f'smoothed_{chunk_size}.npy'))
+        results[chunk_size] = np.array(tracks)
+
+    reference = results[65536]
+    assert len(reference) == smoother.stats['epochs']
+    for chunk_size in (500, 37):
+        np.testing.assert_array_equal(results[chunk_size]['timestamp_ns'], reference['timestamp_ns'])
+        np.testing.assert_allclose(results[chunk_size]['state'], reference['state'], atol=1e-12)
+        np.testing.assert_allclose(results[chunk_size]['std'], reference['std'], atol=1e-12)